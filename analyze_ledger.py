@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Офлайн-анализ журнала запросов (output/tmp/request_ledger.jsonl).
+
+Группирует запросы по endpoint, zoom, размеру bbox и параметрам обхода
+(grid_size_deg, min_cluster_size) и показывает, какие настройки дают больше
+всего объектов на запрос.
+
+Использование:
+    python3 analyze_ledger.py                               # Все запросы
+    python3 analyze_ledger.py --endpoint discovery          # Только /objects/discovery
+    python3 analyze_ledger.py --city polygon-184332         # Только один город
+    python3 analyze_ledger.py --by zoom stage               # Свои поля группировки
+"""
+
+import argparse
+import math
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from yandex_parser.request_ledger import read_ledger, DEFAULT_LEDGER_PATH
+
+DEFAULT_GROUP_BY = ['endpoint', 'zoom', 'area_bucket', 'grid_size_deg', 'min_cluster_size']
+
+
+def area_bucket(area_km2):
+    """Логарифмическая корзина площади bbox: '1-2 км²', '2-4 км²', ..."""
+    if not area_km2 or area_km2 <= 0:
+        return '—'
+    low = 2 ** math.floor(math.log2(area_km2))
+    return f'{low:g}-{low * 2:g} км²'
+
+
+def short_endpoint(endpoint):
+    return (endpoint or '?').rstrip('/').split('/')[-1]
+
+
+def group_key(entry, fields):
+    values = []
+    for field in fields:
+        if field == 'area_bucket':
+            values.append(area_bucket(entry.get('area_km2')))
+        elif field == 'endpoint':
+            values.append(short_endpoint(entry.get('endpoint')))
+        else:
+            values.append(entry.get(field, '—'))
+    return tuple(values)
+
+
+def summarize(entries, fields):
+    """Агрегаты по группам: запросы, доля успешных, объектов на запрос, задержка, отброшено у краёв."""
+    groups = defaultdict(list)
+    for entry in entries:
+        groups[group_key(entry, fields)].append(entry)
+
+    rows = []
+    for key, items in groups.items():
+        cached = sum(1 for e in items if e.get('cached'))
+        # Задержка и объём - только по запросам, ушедшим в сеть
+        network = [e for e in items if not e.get('cached')] or items
+        ok = [e for e in items if e.get('status') == 200]
+        objects = [e.get('objects_total', 0) for e in ok]
+        edge = [e['edge_dropped_est'] for e in ok if e.get('edge_dropped_est') is not None]
+        area = sum(e.get('area_km2') or 0 for e in ok)
+        rows.append({
+            'key': key,
+            'requests': len(items),
+            'ok_share': len(ok) / len(items),
+            'objects_per_request': sum(objects) / len(ok) if ok else 0,
+            'objects_per_km2': sum(objects) / area if area else 0,
+            'cached_share': cached / len(items),
+            'latency': sum(e.get('latency', 0) for e in network) / len(network),
+            'kbytes': sum(e.get('bytes', 0) for e in network) / len(network) / 1024,
+            'edge_dropped': sum(edge) / len(edge) if edge else None
+        })
+
+    rows.sort(key=lambda r: r['objects_per_request'], reverse=True)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Анализ журнала запросов к API')
+    parser.add_argument('--ledger', type=str, default=str(DEFAULT_LEDGER_PATH),
+                        help='Путь к журналу (по умолчанию: output/tmp/request_ledger.jsonl)')
+    parser.add_argument('--endpoint', type=str, help='Фильтр по подстроке endpoint (discovery, polygons, offers)')
+    parser.add_argument('--city', type=str, help='Фильтр по city_id')
+    parser.add_argument('--script', type=str, help='Фильтр по скрипту (fetch_scooters, fetch_zones, ...)')
+    parser.add_argument('--by', nargs='+', default=DEFAULT_GROUP_BY,
+                        help=f'Поля группировки (по умолчанию: {" ".join(DEFAULT_GROUP_BY)})')
+    args = parser.parse_args()
+
+    entries = read_ledger(Path(args.ledger))
+    if not entries:
+        print(f"❌ Журнал пуст или не найден: {args.ledger}")
+        sys.exit(1)
+
+    if args.endpoint:
+        entries = [e for e in entries if args.endpoint in (e.get('endpoint') or '')]
+    if args.city:
+        entries = [e for e in entries if e.get('city_id') == args.city]
+    if args.script:
+        entries = [e for e in entries if e.get('script') == args.script]
+
+    if not entries:
+        print("⚠️  Нет запросов, подходящих под фильтры")
+        return
+
+    rows = summarize(entries, args.by)
+
+    print(f"📒 Журнал: {args.ledger}")
+    print(f"   Запросов: {len(entries):,}, групп: {len(rows)}")
+    print()
+
+    header = ' | '.join(args.by)
+    print(f"{header}")
+    print(f"{'запросов':>9} {'успешно':>8} {'из кэша':>8} {'объект/запр':>12} {'объект/км²':>11} "
+          f"{'задержка':>9} {'KB':>8} {'у краёв':>8}")
+    print('─' * 80)
+    for row in rows:
+        key = ' | '.join(str(v) for v in row['key'])
+        edge = f"{row['edge_dropped']:.1f}" if row['edge_dropped'] is not None else '—'
+        print(key)
+        print(f"{row['requests']:>9,} {row['ok_share'] * 100:>7.0f}% {row['cached_share'] * 100:>7.0f}% "
+              f"{row['objects_per_request']:>12.1f} {row['objects_per_km2']:>11.1f} {row['latency']:>8.2f}s {row['kbytes']:>8.1f} {edge:>8}")
+
+
+if __name__ == "__main__":
+    main()
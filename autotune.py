@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Автоподбор параметров обхода для каждого города по журналу запросов.
+
+fetch_city_scooters по умолчанию использует одинаковые для всех городов
+сетку 0.02°, zoom 17 и bbox раскрытия 0.005°, не учитывая ни плотность
+самокатов, ни широту (градус долготы сужается к полюсу). Тюнер читает
+output/tmp/request_ledger.jsonl и для каждого города подбирает:
+- cell_size_m      - размер ячейки горячих зон в метрах;
+- detail_zoom      - zoom детальных запросов;
+- min_cluster_size - порог раскрытия кластеров;
+- expansion_box_m  - полуразмер bbox раскрытия в метрах.
+
+Цель - минимум запросов при заданной полноте (--target-recall, доля
+самокатов, которые попадают в результат по отдельности):
+- ячейка подбирается так, чтобы детальный запрос возвращал
+  ~TARGET_OBJECTS_PER_REQUEST объектов, и уменьшается, если у краёв bbox
+  теряется больше MAX_EDGE_LOSS объектов;
+- порог раскрытия - наибольший, при котором в нераскрытых кластерах
+  остаётся не больше (1 - target_recall) самокатов детальных ответов.
+
+Подбор идёт только по записям, сделанным с текущими параметрами города:
+шаги zoom и bbox раскрытия отсчитываются от параметров, с которыми эти
+записи получены, поэтому повторный запуск на том же журнале ничего не
+меняет - новые параметры уточняются после обхода с ними.
+
+Параметры хранятся рядом со справочником городов в city_params.json и
+используются fetch_scooters.py по умолчанию (--no-autotune - отключить).
+
+Использование:
+    python3 autotune.py                     # Пересчитать параметры для всех городов из журнала
+    python3 autotune.py --city-id polygon-184332
+"""
+
+import argparse
+import json
+import math
+import time
+from datetime import datetime
+from pathlib import Path
+
+from yandex_parser.request_ledger import read_ledger, DEFAULT_LEDGER_PATH
+
+# Файл параметров (рядом с cities_list.csv)
+CITY_PARAMS_PATH = Path(__file__).parent / 'city_params.json'
+
+# Значения по умолчанию для города без подобранных параметров.
+# Сторона квадратной ячейки горячих зон: по площади близка к исходной ячейке
+# 0.02° × 0.02°, которая на широте ~55° вытянута (≈1280 × 2210 м)
+DEFAULT_CELL_SIZE_M = 1800
+DEFAULT_DETAIL_ZOOM = 17
+DEFAULT_MIN_CLUSTER_SIZE = 50
+# Полуразмер bbox раскрытия (исходные ±0.005° на широте ~55° - ≈320 × 550 м)
+DEFAULT_EXPANSION_BOX_M = 500
+
+# Границы подбора
+CELL_SIZE_RANGE_M = (600, 5000)
+DETAIL_ZOOM_RANGE = (16, 18)
+MIN_CLUSTER_RANGE = (10, 200)
+EXPANSION_BOX_RANGE_M = (250, 1500)
+
+# Целевые показатели
+TARGET_OBJECTS_PER_REQUEST = 250
+TARGET_RECALL = 0.98  # доля самокатов, найденных по отдельности (не в нераскрытых кластерах)
+MAX_EDGE_LOSS = 0.05  # доля объектов, допустимо теряемых у краёв
+MIN_REQUESTS_FOR_TUNING = 5
+
+DISCOVERY_ENDPOINT = '/4.0/eboks/scooters/v1/objects/discovery'
+
+
+def default_params():
+    return {
+        'cell_size_m': DEFAULT_CELL_SIZE_M,
+        'detail_zoom': DEFAULT_DETAIL_ZOOM,
+        'min_cluster_size': DEFAULT_MIN_CLUSTER_SIZE,
+        'expansion_box_m': DEFAULT_EXPANSION_BOX_M
+    }
+
+
+def load_city_params(city_id, path=CITY_PARAMS_PATH):
+    """Подобранные параметры города или None, если город ещё не тюнился."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data.get(city_id)
+
+
+def save_city_params(params_by_city, path=CITY_PARAMS_PATH):
+    """Сохранение параметров (объединяется с уже сохранёнными городами)."""
+    path = Path(path)
+    data = {}
+    if path.exists():
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+    data.update(params_by_city)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def _clamp(value, bounds):
+    return max(bounds[0], min(bounds[1], value))
+
+
+def _made_with(entry, current):
+    """Запись журнала сделана с параметрами current (None - без подобранных параметров)?"""
+    if current is None:
+        return entry.get('cell_size_m') is None
+    return all(entry.get(key) == current.get(key) for key in ('cell_size_m', 'detail_zoom', 'expansion_box_m'))
+
+
+def recall_threshold(cluster_sizes, scooters, target_recall=TARGET_RECALL):
+    """
+    Наибольший порог раскрытия, при котором в нераскрытых кластерах (меньше
+    порога) остаётся не больше (1 - target_recall) самокатов.
+
+    Args:
+        cluster_sizes: размеры кластеров детальных ответов
+        scooters: самокатов, найденных в тех же ответах по отдельности
+    """
+    total = scooters + sum(cluster_sizes)
+    budget = (1 - target_recall) * total
+    left = 0
+    for size in sorted(cluster_sizes):
+        if left + size > budget:
+            return size
+        left += size
+    return MIN_CLUSTER_RANGE[1]
+
+
+def tune_city(entries, current=None, target_recall=TARGET_RECALL):
+    """
+    Подбор параметров города по записям журнала, сделанным с текущими параметрами.
+
+    Args:
+        entries: list записей журнала для одного города
+        current: dict текущих параметров (или None - значения по умолчанию)
+        target_recall: доля самокатов, которые должны попасть в результат по отдельности
+
+    Returns:
+        dict параметров с полями статистики или None, если записей с текущими
+        параметрами мало
+    """
+    params = dict(default_params(), **(current or {}))
+    ok = [e for e in entries
+          if e.get('endpoint') == DISCOVERY_ENDPOINT and e.get('status') == 200 and e.get('area_km2')
+          and _made_with(e, current)]
+
+    detail = [e for e in ok if e.get('stage') == 'detail']
+    expansion = [e for e in ok if e.get('stage') == 'expansion']
+
+    if len(detail) < MIN_REQUESTS_FOR_TUNING:
+        return None
+
+    # Размер ячейки: плотность объектов -> ячейка на TARGET_OBJECTS_PER_REQUEST объектов
+    objects = sum(e.get('objects_total', 0) for e in detail)
+    area_km2 = sum(e['area_km2'] for e in detail)
+    density = objects / area_km2 if area_km2 else 0
+    if density > 0:
+        cell_size_m = math.sqrt(TARGET_OBJECTS_PER_REQUEST / density) * 1000
+    else:
+        cell_size_m = CELL_SIZE_RANGE_M[1]
+
+    # Потери у краёв: уменьшаем ячейку, чтобы полоса у края была меньше доли запроса
+    edge_dropped = sum(e.get('edge_dropped_est') or 0 for e in detail)
+    edge_loss = edge_dropped / (objects + edge_dropped) if objects + edge_dropped else 0
+    if edge_loss > MAX_EDGE_LOSS:
+        cell_size_m *= math.sqrt(MAX_EDGE_LOSS / edge_loss)
+    params['cell_size_m'] = int(round(_clamp(cell_size_m, CELL_SIZE_RANGE_M), -1))
+
+    # Zoom: много кластеров в детальных ответах -> детальнее (шаг от zoom этих записей)
+    clusters = sum(e.get('objects', {}).get('cluster', 0) for e in detail)
+    scooters = sum(e.get('objects', {}).get('scooter', 0) for e in detail)
+    cluster_share = clusters / (clusters + scooters) if clusters + scooters else 0
+    zoom = params['detail_zoom']
+    if cluster_share > 0.4:
+        zoom += 1
+    elif cluster_share < 0.05 and expansion == []:
+        zoom -= 1
+    params['detail_zoom'] = int(_clamp(zoom, DETAIL_ZOOM_RANGE))
+
+    # Порог раскрытия: по размерам кластеров - под целевую полноту
+    cluster_sizes = [size for e in detail for size in e.get('cluster_sizes', [])]
+    if cluster_sizes or clusters == 0:
+        threshold = recall_threshold(cluster_sizes, scooters, target_recall)
+        params['min_cluster_size'] = int(_clamp(threshold, MIN_CLUSTER_RANGE))
+        recall = 1 - sum(size for size in cluster_sizes if size < params['min_cluster_size']) / \
+            max(scooters + sum(cluster_sizes), 1)
+    else:
+        # Журнал без размеров кластеров: шаг от порога, с которым сделаны записи
+        recall = None
+        if expansion:
+            gained = sum(e.get('objects', {}).get('scooter', 0) for e in expansion) / len(expansion)
+            used = sorted(e.get('min_cluster_size', params['min_cluster_size']) for e in detail)
+            threshold = used[len(used) // 2]
+            if gained < 5:
+                threshold *= 1.5
+            elif gained > 30:
+                threshold *= 0.75
+            params['min_cluster_size'] = int(_clamp(threshold, MIN_CLUSTER_RANGE))
+
+    # Bbox раскрытия: потери у краёв -> больше box (шаг от box этих записей)
+    if expansion:
+        exp_objects = sum(e.get('objects_total', 0) for e in expansion)
+        exp_dropped = sum(e.get('edge_dropped_est') or 0 for e in expansion)
+        exp_loss = exp_dropped / (exp_objects + exp_dropped) if exp_objects + exp_dropped else 0
+        box = params['expansion_box_m']
+        if exp_loss > MAX_EDGE_LOSS:
+            box *= 1.25
+        elif exp_loss == 0:
+            box *= 0.9
+        params['expansion_box_m'] = int(round(_clamp(box, EXPANSION_BOX_RANGE_M), -1))
+
+    params.update({
+        'density_per_km2': round(density, 2),
+        'edge_loss': round(edge_loss, 4),
+        'cluster_share': round(cluster_share, 4),
+        'recall_est': round(recall, 4) if recall is not None else None,
+        'target_recall': target_recall,
+        'requests_analyzed': len(ok),
+        'updated_at': datetime.now().isoformat(timespec='seconds')
+    })
+    return params
+
+
+def tune_from_ledger(ledger_path=DEFAULT_LEDGER_PATH, city_ids=None, max_age_days=30,
+                     target_recall=TARGET_RECALL):
+    """
+    Подбор параметров для городов из журнала.
+
+    Returns:
+        dict city_id -> params (только для городов с достаточным объёмом
+        данных, собранных с текущими параметрами)
+    """
+    cutoff = time.time() - max_age_days * 86400
+    by_city = {}
+    for entry in read_ledger(ledger_path):
+        city_id = entry.get('city_id')
+        # Ответы из кэша повторяют уже записанные запросы
+        if not city_id or entry.get('ts', 0) < cutoff or entry.get('cached'):
+            continue
+        if city_ids and city_id not in city_ids:
+            continue
+        by_city.setdefault(city_id, []).append(entry)
+
+    tuned = {}
+    for city_id, entries in by_city.items():
+        params = tune_city(entries, load_city_params(city_id), target_recall)
+        if params:
+            tuned[city_id] = params
+    return tuned
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Автоподбор параметров обхода городов по журналу запросов')
+    parser.add_argument('--ledger', type=str, default=str(DEFAULT_LEDGER_PATH),
+                        help='Путь к журналу (по умолчанию: output/tmp/request_ledger.jsonl)')
+    parser.add_argument('--city-id', type=str, nargs='+', help='Только указанные city_id')
+    parser.add_argument('--max-age-days', type=float, default=30,
+                        help='Учитывать записи не старше N дней (по умолчанию: 30)')
+    parser.add_argument('--target-recall', type=float, default=TARGET_RECALL,
+                        help='Доля самокатов, которые должны найтись по отдельности, а не в нераскрытых '
+                             f'кластерах (по умолчанию: {TARGET_RECALL})')
+    args = parser.parse_args()
+
+    tuned = tune_from_ledger(Path(args.ledger), args.city_id, args.max_age_days, args.target_recall)
+
+    if not tuned:
+        print(f"⚠️  Недостаточно данных в журнале (нужно ≥ {MIN_REQUESTS_FOR_TUNING} детальных запросов "
+              f"на город, сделанных с его текущими параметрами)")
+        return
+
+    save_city_params(tuned)
+
+    print(f"🎛️  Подобраны параметры для {len(tuned)} городов → {CITY_PARAMS_PATH.name}")
+    for city_id, params in sorted(tuned.items()):
+        print(f"   {city_id}: ячейка {params['cell_size_m']} м, zoom {params['detail_zoom']}, "
+              f"порог {params['min_cluster_size']}, раскрытие {params['expansion_box_m']} м "
+              f"(плотность {params['density_per_km2']}/км², потери у краёв {params['edge_loss'] * 100:.1f}%"
+              + (f", полнота {params['recall_est'] * 100:.1f}%" if params['recall_est'] is not None else '') + ")")
+
+
+if __name__ == "__main__":
+    main()
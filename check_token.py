@@ -11,35 +11,10 @@
 """
 
 import json
-import base64
 from datetime import datetime, timedelta
 from pathlib import Path
 
-
-def decode_jwt_payload(jwt_token):
-    """Декодирует payload JWT токена."""
-    try:
-        # JWT состоит из 3 частей: header.payload.signature
-        parts = jwt_token.split('.')
-        if len(parts) != 3:
-            return None, "Неверный формат JWT (должно быть 3 части)"
-        
-        # Декодируем payload (вторая часть)
-        payload = parts[1]
-        
-        # Добавляем padding если нужно
-        padding = len(payload) % 4
-        if padding:
-            payload += '=' * (4 - padding)
-        
-        # Декодируем base64url
-        decoded_bytes = base64.urlsafe_b64decode(payload)
-        payload_data = json.loads(decoded_bytes.decode('utf-8'))
-        
-        return payload_data, None
-        
-    except Exception as e:
-        return None, f"Ошибка декодирования: {e}"
+from yandex_parser import decode_jwt_payload
 
 
 def format_timedelta(td):
@@ -87,10 +62,10 @@ def check_token():
     print()
     
     # Декодируем payload
-    payload, error = decode_jwt_payload(jwt_token)
-    
-    if error:
-        print(f"❌ {error}")
+    try:
+        payload = decode_jwt_payload(jwt_token)
+    except ValueError as e:
+        print(f"❌ {e}")
         return
     
     # Извлекаем данные
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Экспорт самокатов, парковок и зон в пирамиду векторных тайлов (MVT).
+
+Карта запрашивает только видимые тайлы вместо целых GeoJSON. Повторный
+запуск перестраивает только тайлы, которых касаются изменившиеся объекты
+(манифест output/tiles.manifest.json).
+
+Использование:
+    python3 export_tiles.py                          # output/tiles/{z}/{x}/{y}.pbf
+    python3 export_tiles.py -o output/tiles.mbtiles  # один файл MBTiles
+    python3 export_tiles.py --min-zoom 6 --max-zoom 15 --full
+    python3 export_tiles.py --scooters output/city_scooters/минск_*.geojson --no-parkings
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from yandex_parser.paths import OUTPUT_DIR
+from yandex_parser.snapshot import latest_scooter_files, scooter_paths
+from yandex_parser.vector_tiles import (
+    DEFAULT_MIN_ZOOM, DEFAULT_MAX_ZOOM, DEFAULT_SIMPLIFY, DEFAULT_THIN_CELL, build_tiles, manifest_path_for
+)
+
+
+def load_features(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('features', [])
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Пирамида векторных тайлов из результатов обхода')
+    parser.add_argument('-o', '--output', type=str, default=str(OUTPUT_DIR / 'tiles'),
+                        help='Каталог {z}/{x}/{y}.pbf или файл .mbtiles (по умолчанию: output/tiles)')
+    parser.add_argument('--scooters', nargs='+', metavar='PATH',
+                        help='Файлы самокатов (по умолчанию: output/city_scooters/*.geojson и '
+                             'output/scooters_full_info*.geojson, самый новый для каждого города)')
+    parser.add_argument('--parkings', type=str, default=str(OUTPUT_DIR / 'parkings.geojson'),
+                        help='Файл парковок (по умолчанию: output/parkings.geojson)')
+    parser.add_argument('--zones', type=str, default=str(OUTPUT_DIR / 'zones.geojson'),
+                        help='Файл зон (по умолчанию: output/zones.geojson)')
+    parser.add_argument('--no-scooters', action='store_true', help='Без слоя самокатов')
+    parser.add_argument('--no-parkings', action='store_true', help='Без слоя парковок')
+    parser.add_argument('--no-zones', action='store_true', help='Без слоя зон')
+    parser.add_argument('--min-zoom', type=int, default=DEFAULT_MIN_ZOOM,
+                        help=f'Минимальный зум (по умолчанию: {DEFAULT_MIN_ZOOM})')
+    parser.add_argument('--max-zoom', type=int, default=DEFAULT_MAX_ZOOM,
+                        help=f'Максимальный зум (по умолчанию: {DEFAULT_MAX_ZOOM})')
+    parser.add_argument('--simplify', type=float, default=DEFAULT_SIMPLIFY,
+                        help=f'Допуск упрощения полигонов в единицах тайла 4096 (по умолчанию: {DEFAULT_SIMPLIFY})')
+    parser.add_argument('--thin-cell', type=int, default=DEFAULT_THIN_CELL,
+                        help='Ячейка прореживания точек ниже max-zoom в единицах тайла 4096 '
+                             f'(по умолчанию: {DEFAULT_THIN_CELL})')
+    parser.add_argument('--full', action='store_true',
+                        help='Перестроить все тайлы, не используя манифест')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+
+    print("🧱 Экспорт векторных тайлов")
+    print("=" * 80)
+
+    # Слои в порядке отрисовки: зоны под точками
+    layers = {}
+    if not args.no_zones:
+        zones_path = Path(args.zones)
+        if zones_path.exists():
+            layers['zones'] = load_features(zones_path)
+            print(f"   🗺️  Зоны: {len(layers['zones']):,} ({zones_path.name})")
+        else:
+            print(f"   ⚠️  Нет файла зон {zones_path} - слой пропущен")
+    if not args.no_parkings:
+        parkings_path = Path(args.parkings)
+        if parkings_path.exists():
+            layers['parkings'] = load_features(parkings_path)
+            print(f"   🅿️  Парковки: {len(layers['parkings']):,} ({parkings_path.name})")
+        else:
+            print(f"   ⚠️  Нет файла парковок {parkings_path} - слой пропущен")
+    if not args.no_scooters:
+        paths = [Path(path) for path in args.scooters] if args.scooters else scooter_paths(OUTPUT_DIR)
+        cities = latest_scooter_files(paths)
+        if cities:
+            layers['scooters'] = [feature for _, features in cities.values() for feature in features]
+            print(f"   🛴 Самокаты: {len(layers['scooters']):,} (городов: {len(cities)})")
+        else:
+            print("   ⚠️  Нет файлов самокатов - слой пропущен")
+
+    if not layers:
+        print("❌ Ошибка: нет данных для экспорта")
+        sys.exit(1)
+
+    start = time.time()
+    stats = build_tiles(layers, args.output, min_zoom=args.min_zoom, max_zoom=args.max_zoom,
+                        simplify=args.simplify, thin_cell=args.thin_cell, full=args.full)
+    elapsed = time.time() - start
+
+    print()
+    print(f"✅ Объектов: {stats['features']:,}, изменилось: {stats['changed']:,}")
+    for z, zoom_stats in stats['zooms'].items():
+        print(f"   z{z}: перестроено тайлов {zoom_stats['rebuilt']:,}, записано {zoom_stats['written']:,}")
+    if not stats['zooms']:
+        print("   Изменений нет - тайлы не перестраивались")
+    print(f"   💾 Записано тайлов: {stats['tiles_written']:,} ({stats['bytes'] / 1024 / 1024:.1f} MB), "
+          f"удалено: {stats['tiles_deleted']:,}")
+    print(f"   ⏱️  {elapsed:.1f}с")
+    print(f"   📁 {args.output} (манифест: {manifest_path_for(args.output).name})")
+
+
+if __name__ == '__main__':
+    main()
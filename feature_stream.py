@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Потоковый вывод объектов в NDJSON (одна строка - один GeoJSON Feature).
+
+Объект пишется сразу, как только обход впервые добавил его в результат, -
+рендер карты или алертинг получают данные через секунды, а не после
+сохранения всего города. Последняя строка - итоговая запись
+{"type": "Summary", ...}. Цель - stdout ('-') или путь, в том числе FIFO
+(mkfifo): открытие FIFO ждёт, пока читатель не подключится.
+
+    python3 fetch_scooters.py --city Минск --stream | jq -c 'select(.type == "Feature")'
+"""
+
+import json
+import sys
+import threading
+from datetime import datetime
+
+
+class FeatureStream:
+    """NDJSON-поток Feature с дедупликацией по id (потокобезопасный)."""
+
+    def __init__(self, target='-'):
+        self.target = target
+        self.to_stdout = target == '-'
+        self._file = sys.stdout if self.to_stdout else open(target, 'w', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._seen = set()
+        self.closed = False
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self.closed:
+                return
+            try:
+                self._file.write(line)
+                self._file.flush()
+            except BrokenPipeError:
+                # Читатель отключился - обход продолжается, результат сохранится в файл
+                self.closed = True
+                print("⚠️  Читатель потока отключился, потоковый вывод остановлен", file=sys.stderr)
+
+    def feature(self, feature):
+        """Запись Feature, если объект с таким id ещё не выводился."""
+        with self._lock:
+            if feature['id'] in self._seen:
+                return
+            self._seen.add(feature['id'])
+        self._write(feature)
+
+    def summary(self, **fields):
+        """Итоговая запись: количество выведенных объектов и переданные поля."""
+        self._write({
+            'type': 'Summary',
+            'generated_at': datetime.now().isoformat(),
+            'features': len(self._seen),
+            **fields
+        })
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            if not self.to_stdout:
+                self._file.close()
+
+
+def add_stream_argument(parser):
+    """Добавляет в argparse общий флаг --stream [PATH]."""
+    parser.add_argument('--stream', nargs='?', const='-', metavar='PATH',
+                        help='Выводить объекты по мере обнаружения как NDJSON (GeoJSON Feature на строку) '
+                             'в stdout или в PATH (файл или FIFO); в конце - запись {"type": "Summary"}. '
+                             'При выводе в stdout ход парсинга печатается в stderr')
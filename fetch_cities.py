@@ -30,6 +30,14 @@ from pathlib import Path
 import requests
 from datetime import datetime
 
+from yandex_parser.response_cache import ResponseCache
+from yandex_parser.metrics import registry as metrics, count_response_objects
+from yandex_parser.profiling import profiler, add_profile_argument
+from yandex_parser.request_ledger import ledger, add_ledger_argument, DEFAULT_LEDGER_PATH
+from yandex_parser import YandexParserError
+from yandex_parser.simplify import add_simplify_arguments, simplifier_from_args
+from yandex_parser.tokens import TokenManager, token_expires_at, add_token_argument
+
 BASE_URL = "https://tc.mobile.yandex.net"
 
 def load_config():
@@ -38,7 +46,7 @@ def load_config():
         config = json.load(f)
     return config.get('yandex_headers')
 
-def fetch_cities_in_region(bbox, headers, verbose=False):
+def fetch_cities_in_region(bbox, headers, verbose=False, response_cache=None):
     """
     Запрашивает зоны самокатов для указанного bbox.
     
@@ -46,11 +54,13 @@ def fetch_cities_in_region(bbox, headers, verbose=False):
         bbox: [min_lon, min_lat, max_lon, max_lat]
         headers: заголовки запроса с JWT токеном
         verbose: выводить ли детальную информацию
+        response_cache: ResponseCache или None (кэш сырых ответов)
     
     Returns:
         (list of features, error_message or None)
     """
-    url = f"{BASE_URL}/4.0/layers/v1/polygons"
+    endpoint = "/4.0/layers/v1/polygons"
+    url = f"{BASE_URL}{endpoint}"
     params = {
         "mobcf": "russia%25go_ru_by_geo_hosts_2%25default",
         "mobpr": "go_ru_by_geo_hosts_2_TAXI_V4_0"
@@ -78,14 +88,37 @@ def fetch_cities_in_region(bbox, headers, verbose=False):
     }
     
     try:
-        response = requests.post(url, headers=headers, json=data, params=params, timeout=15)
-        
-        # Проверка на HTTP 405 = истёк JWT токен
-        if response.status_code == 405:
-            return [], "❌ HTTP 405: JWT токен истёк! Обновите X-Yandex-Jws в config.json"
-        
-        response.raise_for_status()
-        result = response.json()
+        result = None
+        if response_cache is not None:
+            result = response_cache.get(endpoint, bbox, 8.0, mode='scooters')
+            if result is not None:
+                metrics.observe_request(endpoint, 200, 0.0, cached=True)
+                ledger.record(endpoint, bbox, 8.0, 200, 0.0, data=result, cached=True)
+        
+        if result is None:
+            request_start = time.time()
+            try:
+                response = requests.post(url, headers=headers, json=data, params=params, timeout=15)
+            except requests.exceptions.RequestException:
+                metrics.observe_request(endpoint, 'error', time.time() - request_start)
+                ledger.record(endpoint, bbox, 8.0, 'error', time.time() - request_start)
+                raise
+            latency = time.time() - request_start
+            metrics.observe_request(endpoint, response.status_code, latency, len(response.content))
+            if not response.ok:
+                ledger.record(endpoint, bbox, 8.0, response.status_code, latency, len(response.content))
+            
+            # Проверка на HTTP 405 = истёк JWT токен
+            if response.status_code == 405:
+                return [], "❌ HTTP 405: JWT токен истёк! Обновите X-Yandex-Jws в config.json"
+            
+            response.raise_for_status()
+            result = response.json()
+            metrics.observe_objects(endpoint, count_response_objects(result))
+            ledger.record(endpoint, bbox, 8.0, response.status_code, latency, len(response.content), result)
+            
+            if response_cache is not None:
+                response_cache.put(endpoint, bbox, 8.0, result, mode='scooters')
         
         # Проверяем структуру ответа
         if verbose and 'features' not in result:
@@ -131,34 +164,27 @@ def simplify_polygon_feature(feature):
 
 def check_token_expiry(headers):
     """Проверяет время до истечения JWT токена."""
-    try:
-        import base64
-        jwt_token = headers.get('X-Yandex-Jws', '')
-        if not jwt_token:
-            return None
-        
-        # Декодируем payload (вторая часть JWT)
-        parts = jwt_token.split('.')
-        if len(parts) < 2:
-            return None
-        
-        payload = parts[1]
-        # Добавляем padding если нужно
-        padding = 4 - len(payload) % 4
-        if padding != 4:
-            payload += '=' * padding
-        
-        decoded = base64.urlsafe_b64decode(payload)
-        data = json.loads(decoded)
-        
-        expires_at_ms = data.get('expires_at_ms', 0)
-        expires_at = expires_at_ms / 1000  # в секунды
-        now = time.time()
-        remaining = expires_at - now
-        
-        return remaining
-    except:
+    expires_at = token_expires_at(headers)
+    if expires_at is None:
         return None
+    return expires_at - time.time()
+
+
+def fetch_with_token(tokens, bbox, verbose=False, response_cache=None):
+    """
+    fetch_cities_in_region с учётом срока токена: перед истечением и после
+    HTTP 405 ждёт нового токена в config.json вместо остановки сканирования.
+    Если новый токен не появился, возвращается ошибка HTTP 405 - по ней
+    сканирование останавливается.
+    """
+    tokens.ensure_valid()
+    version = tokens.version
+    polygons, error = fetch_cities_in_region(bbox, tokens.headers, verbose=verbose,
+                                             response_cache=response_cache)
+    if error and "HTTP 405" in error and tokens.wait_for_refresh(version):
+        polygons, error = fetch_cities_in_region(bbox, tokens.headers, verbose=verbose,
+                                                 response_cache=response_cache)
+    return polygons, error
 
 def load_city_names():
     """Загружает справочник названий городов из cities_list.csv"""
@@ -179,8 +205,11 @@ def load_city_names():
     
     return city_names
 
-def save_results(all_polygons, stage_name, timestamp):
-    """Сохраняет результаты сканирования с обогащением из cities_list.csv"""
+def save_results(all_polygons, stage_name, timestamp, simplifier=None):
+    """
+    Сохраняет результаты сканирования с обогащением из cities_list.csv.
+    simplifier: GeometrySimplifier для полигонов cities.geojson (сырые данные не упрощаются)
+    """
     Path('output/tmp').mkdir(parents=True, exist_ok=True)
     
     # Загружаем справочник названий городов
@@ -208,6 +237,10 @@ def save_results(all_polygons, stage_name, timestamp):
         
         simplified_features.append(feature)
     
+    if simplifier is not None:
+        simplifier.features(simplified_features)
+        print(f"   📉 Упрощение: {simplifier.summary()}")
+    
     simplified_geojson = {'type': 'FeatureCollection', 'features': simplified_features}
     with open('output/cities.geojson', 'w', encoding='utf-8') as f:
         json.dump(simplified_geojson, f, indent=2, ensure_ascii=False)
@@ -327,6 +360,23 @@ def parse_arguments():
         help='Искать новые города в неизвестных квадратах (долгое сканирование). По умолчанию обрабатываются только известные города'
     )
     
+    parser.add_argument(
+        '--metrics-dir',
+        type=str,
+        help='Каталог для метрик: fetch_cities.prom и fetch_cities_summary.json'
+    )
+    
+    parser.add_argument(
+        '--response-cache',
+        action='store_true',
+        help='Кэшировать ответы /layers/v1/polygons на диске (output/cache/responses, TTL 6 ч)'
+    )
+    
+    add_simplify_arguments(parser)
+    add_profile_argument(parser)
+    add_ledger_argument(parser)
+    add_token_argument(parser)
+    
     return parser.parse_args()
 
 def main():
@@ -409,10 +459,17 @@ def main():
         print(f"\n📥 Режим: Обновление известных городов (быстрое)")
         print(f"   💡 Для поиска новых городов запустите скрипт с флагом --search_new")
     
-    headers = load_config()
+    # Токен: пауза на обновление config.json вместо остановки по истечении
+    tokens = TokenManager(wait_timeout=args.token_wait * 60)
+    response_cache = ResponseCache() if args.response_cache else None
+    if response_cache is not None:
+        tokens.on_pause(response_cache.save)
+    metrics.configure(args.metrics_dir, 'fetch_cities')
+    profiler.configure(args.profile, 'fetch_cities')
+    ledger.configure(None if args.no_ledger else DEFAULT_LEDGER_PATH, script='fetch_cities')
     
     # Проверяем токен
-    remaining = check_token_expiry(headers)
+    remaining = tokens.remaining()
     if remaining:
         remaining_min = int(remaining / 60)
         print(f"\n🔐 JWT токен действителен ещё {remaining_min} минут")
@@ -497,6 +554,8 @@ def main():
         print(f"   Квадратов для обработки: {len(known_squares):,}\n")
         
         stage1_start = time.time()
+        profiler.start('stage1_known')
+        ledger.set_context(stage='stage1_known')
         squares_with_polygons = 0
         
         # Начальный прогресс-бар
@@ -514,7 +573,7 @@ def main():
             if verbose:
                 print(f'\r{" " * 150}\r   🔍 Запрос #{idx}: Square #{square_id}...', end='', flush=True)
             
-            polygons, error = fetch_cities_in_region(bbox, headers, verbose=verbose)
+            polygons, error = fetch_with_token(tokens, bbox, verbose=verbose, response_cache=response_cache)
             
             new_polygon_msg = None
             
@@ -585,16 +644,12 @@ def main():
                 print(f'\r{" " * 150}\r   ⏸️  Пауза 10 сек после {idx:,} запросов...', end='', flush=True)
                 time.sleep(10)
                 print(f'\r{" " * 150}\r', end='', flush=True)
-            
-            # Проверка токена каждые 500 запросов
-            if idx % 500 == 0:
-                remaining = check_token_expiry(headers)
-                if remaining and remaining < 300:  # меньше 5 минут
-                    print(f'\r{" " * 150}\r   ⚠️  ВНИМАНИЕ: Токен истекает через {int(remaining/60)} минут!')
         
         print()  # Новая строка после прогресс-бара
         
         stage1_time = time.time() - stage1_start
+        metrics.record_stage('stage1_known', stage1_time)
+        profiler.stop()
         print(f"\n✅ Этап 1 завершён за {stage1_time/60:.1f} минут")
         print(f"   • Обработано квадратов: {idx:,}/{len(known_squares):,}")
         print(f"   • Квадратов с полигонами: {squares_with_polygons:,}")
@@ -603,7 +658,8 @@ def main():
         # Сохраняем результаты этапа 1
         if all_polygons:
             print(f"\n💾 Сохраняю известные города...")
-            raw_file, id_file = save_results(all_polygons, 'stage1_known', timestamp)
+            raw_file, id_file = save_results(all_polygons, 'stage1_known', timestamp,
+                                             simplifier_from_args(args))
             print(f"   ✓ Сохранено {len(all_polygons):,} полигонов")
             print(f"   • output/cities.geojson")
             print(f"   • {raw_file}")
@@ -631,6 +687,8 @@ def main():
         print(f"   Квадратов для обработки: {len(unknown_squares):,}\n")
         
         stage2_start = time.time()
+        profiler.start('stage2_search')
+        ledger.set_context(stage='stage2_search')
         squares_with_polygons_stage2 = 0
         polygons_before_stage2 = len(all_polygons)
         
@@ -646,7 +704,7 @@ def main():
             # Первые 2 запроса - с verbose режимом для диагностики
             verbose = idx <= 2 and len(known_squares) == 0  # Только если этап 1 был пропущен
             
-            polygons, error = fetch_cities_in_region(bbox, headers, verbose=verbose)
+            polygons, error = fetch_with_token(tokens, bbox, verbose=verbose, response_cache=response_cache)
             
             new_polygon_msg = None
             
@@ -714,16 +772,12 @@ def main():
                 print(f'\r{" " * 150}\r   ⏸️  Пауза 10 сек после {idx:,} запросов...', end='', flush=True)
                 time.sleep(10)
                 print(f'\r{" " * 150}\r', end='', flush=True)
-            
-            # Проверка токена каждые 500 запросов
-            if idx % 500 == 0:
-                remaining = check_token_expiry(headers)
-                if remaining and remaining < 300:  # меньше 5 минут
-                    print(f'\r{" " * 150}\r   ⚠️  ВНИМАНИЕ: Токен истекает через {int(remaining/60)} минут!')
         
         print()  # Новая строка после прогресс-бара
         
         stage2_time = time.time() - stage2_start
+        metrics.record_stage('stage2_search', stage2_time)
+        profiler.stop()
         new_polygons_found = len(all_polygons) - polygons_before_stage2
         
         print(f"\n✅ Этап 2 завершён за {stage2_time/60:.1f} минут")
@@ -735,7 +789,8 @@ def main():
         # Сохраняем результаты этапа 2 (если были найдены новые)
         if new_polygons_found > 0:
             print(f"\n💾 Сохраняю обновлённые результаты с новыми городами...")
-            raw_file, id_file = save_results(all_polygons, 'stage2_complete', timestamp)
+            raw_file, id_file = save_results(all_polygons, 'stage2_complete', timestamp,
+                                             simplifier_from_args(args))
             print(f"   ✓ Сохранено {len(all_polygons):,} полигонов (+{new_polygons_found} новых)")
             print(f"   • output/cities.geojson")
             print(f"   • {raw_file}")
@@ -775,6 +830,18 @@ def main():
         print(f"   • Этап 2 (поиск новых) был пропущен")
         print(f"   • Для поиска новых используйте: --search_new")
     
+    if response_cache is not None:
+        response_cache.save()
+        print(f"   • Кэш ответов: {response_cache.summary()}")
+    
+    metrics.set_gauge('polygons_found', len(all_polygons))
+    summary_path = metrics.write_summary()
+    if summary_path:
+        print(f"   • Метрики: {summary_path}")
+    profile_report = profiler.finish()
+    if profile_report:
+        print(f"   • Профиль: {profile_report}")
+    
     # Отчёт об ошибках
     if errors:
         print(f"\n⚠️  Ошибок при запросах: {len(errors)}")
@@ -815,4 +882,8 @@ def main():
     print(f"   • {log_file} (лог выполнения)")
     
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except YandexParserError as e:
+        print(f"\n❌ {e}")
+        sys.exit(1)
@@ -1,178 +1,86 @@
 #!/usr/bin/env python3
 """
 Скрипт для парсинга парковок Yandex Go (только cluster и cluster_empty).
-Использует те же функции что и fetch_scooters.py, но фильтрует только парковки.
+Использует тот же обход, что и fetch_scooters.py (пакет yandex_parser), но сохраняет только парковки.
 
 Использование:
     python3 fetch_parkings.py --bbox 39.6,43.4,39.9,43.7
     python3 fetch_parkings.py --city "Сочи"
 """
 
-# Импортируем всё из fetch_scooters
 import sys
-from pathlib import Path
-
-# Добавляем текущую директорию в путь
-sys.path.insert(0, str(Path(__file__).parent))
-
-# Импортируем функции из fetch_scooters
-from fetch_scooters import (
-    load_config, load_city_polygon, get_polygon_bbox,
-    fetch_scooters, extract_points_from_response, simple_cluster_points,
-    shrink_bbox_around_point
-)
-
 import json
 import time
-import csv
 import argparse
+from pathlib import Path
 from datetime import datetime
 
-def find_cities_by_name(city_name):
-    """
-    Ищет все зоны города по названию в cities_list.csv.
-    Возвращает список словарей с полями: id, name, country, bbox
-    """
-    cities_csv = Path(__file__).parent / 'cities_list.csv'
-    
-    if not cities_csv.exists():
-        print("❌ Ошибка: файл cities_list.csv не найден!")
-        print("Сначала запустите: python3 fetch_cities.py")
-        sys.exit(1)
-    
-    matching_cities = []
-    
-    with open(cities_csv, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row['name'].lower() == city_name.lower():
-                matching_cities.append({
-                    'id': row['id'],
-                    'name': row['name'],
-                    'country': row['country'],
-                    'bbox': [float(x) for x in row['bbox'].split(',')]
-                })
-    
-    if not matching_cities:
-        print(f"❌ Город '{city_name}' не найден в cities_list.csv")
-        print("\nДоступные города:")
-        
-        # Показать первые 10 городов для справки
-        with open(cities_csv, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            seen_names = set()
-            count = 0
-            for row in reader:
-                if row['name'] not in seen_names:
-                    print(f"  • {row['name']} ({row['country']})")
-                    seen_names.add(row['name'])
-                    count += 1
-                    if count >= 10:
-                        print("  ...")
-                        break
-        sys.exit(1)
-    
-    return matching_cities
+from yandex_parser.response_cache import ResponseCache
+from yandex_parser.metrics import registry as metrics
+from yandex_parser.profiling import profiler, add_profile_argument
+from yandex_parser.request_ledger import ledger, add_ledger_argument, DEFAULT_LEDGER_PATH
+from feature_stream import FeatureStream, add_stream_argument
+from yandex_parser import (
+    YandexClient, YandexParserError, find_cities_by_name, load_city_polygon,
+    crawl_city_parkings
+)
+from yandex_parser.geometry import add_area_arguments, area_from_args, geometry_bounds
+from yandex_parser.zone_index import load_zone_index
+from yandex_parser.tokens import add_token_argument
 
-def extract_parkings_only(data):
-    """Извлекает только парковки из ответа API."""
-    parkings = []
-    objects = data.get('objects', {})
-    
-    for obj_type in objects.get('objects_by_type', []):
-        type_name = obj_type.get('type')
-        if type_name in ['cluster', 'cluster_empty']:
-            for obj in obj_type.get('objects', []):
-                if isinstance(obj, dict):
-                    parkings.append(obj)
-    
-    return parkings
+def parking_feature(obj_id, obj, city_id):
+    """GeoJSON Feature парковки; None - нет координат."""
+    geo = obj.get('geo')
+    if not geo:
+        return None
+    
+    obj_type = obj_id.split('_')[0]
+    properties = {"id": obj_id, "city_id": city_id, "type": obj_type}
+    
+    if obj_type == 'cluster':
+        properties["objects_count"] = obj.get('payload', {}).get('objects_count', 0)
+    
+    return {
+        "type": "Feature",
+        "id": obj_id,
+        "geometry": {"type": "Point", "coordinates": geo},
+        "properties": properties
+    }
 
-def fetch_city_parkings(city_bbox, city_id, headers, delay=0.1):
-    """Парсинг парковок города."""
-    print(f"\n🅿️  Парсинг парковок города: {city_id}")
-    print("="*80)
-    
-    center_lon = (city_bbox[0] + city_bbox[2]) / 2
-    center_lat = (city_bbox[1] + city_bbox[3]) / 2
-    user_location = [center_lon, center_lat]
-    
-    # Этап 1: Обзор
-    print(f"\n📡 Этап 1: Обзорный запрос (zoom 12)")
-    overview_data = fetch_scooters(city_bbox, user_location, zoom=12, headers=headers, delay=delay)
-    
-    if not overview_data:
-        return {}
-    
-    all_points = extract_points_from_response(overview_data)
-    print(f"   Найдено точек: {len(all_points)}")
-    
-    if len(all_points) == 0:
-        return {}
-    
-    # Этап 2: Кластеризация
-    print(f"\n🔥 Этап 2: Кластеризация (сетка 0.02°)")
-    hot_zones = simple_cluster_points(all_points, grid_size_deg=0.02)
-    print(f"   Горячих зон: {len(hot_zones)}")
-    
-    # Этап 3: Детальные запросы
-    print(f"\n�� Этап 3: Детальные запросы (zoom 17)")
+
+def stream_callback(stream, city_id):
+    """on_object для crawl_city_parkings: Feature в поток --stream (None без потока)."""
+    if stream is None:
+        return None
     
-    all_parkings = {}
+    def on_object(obj_id, obj):
+        feature = parking_feature(obj_id, obj, city_id)
+        if feature is not None:
+            stream.feature(feature)
     
-    for i, zone in enumerate(hot_zones, 1):
-        zone_bbox = zone['bbox']
-        zone_center = [
-            (zone_bbox[0] + zone_bbox[2]) / 2,
-            (zone_bbox[1] + zone_bbox[3]) / 2
-        ]
-        
-        print(f"   [{i}/{len(hot_zones)}] Зона...", end=' ')
-        
-        detail_data = fetch_scooters(zone_bbox, zone_center, zoom=17, headers=headers, delay=delay)
-        
-        if not detail_data:
-            print("⚠️")
-            continue
-        
-        parkings = extract_parkings_only(detail_data)
-        
-        for parking in parkings:
-            parking_id = parking.get('id')
-            if parking_id:
-                all_parkings[parking_id] = parking
-        
-        print(f"✓ {len(parkings)} парковок")
-    
-    return all_parkings
+    return on_object
+
 
-def save_geojson(parkings_dict, output_path, city_id):
-    """Сохранение парковок в GeoJSON."""
+def save_geojson(parkings_dict, output_path, city_id, zone_index=None):
+    """Сохранение парковок в GeoJSON; zone_index - пометить парковки зонами ограничений."""
     features = []
     stats = {'cluster': 0, 'cluster_empty': 0, 'total_scooters': 0}
     
     for obj_id, obj in parkings_dict.items():
-        geo = obj.get('geo')
-        if not geo:
+        feature = parking_feature(obj_id, obj, city_id)
+        if feature is None:
             continue
         
-        obj_type = obj_id.split('_')[0]
-        properties = {"id": obj_id, "city_id": city_id, "type": obj_type}
-        
-        if obj_type == 'cluster':
-            count = obj.get('payload', {}).get('objects_count', 0)
-            properties["objects_count"] = count
+        properties = feature['properties']
+        if properties['type'] == 'cluster':
             stats['cluster'] += 1
-            stats['total_scooters'] += count
+            stats['total_scooters'] += properties['objects_count']
         else:
             stats['cluster_empty'] += 1
         
-        features.append({
-            "type": "Feature",
-            "id": obj_id,
-            "geometry": {"type": "Point", "coordinates": geo},
-            "properties": properties
-        })
+        features.append(feature)
+    
+    zone_counts = zone_index.tag_features(features) if zone_index is not None else None
     
     geojson = {
         "type": "FeatureCollection",
@@ -185,6 +93,8 @@ def save_geojson(parkings_dict, output_path, city_id):
             "total_scooters_on_parkings": stats['total_scooters']
         }
     }
+    if zone_counts is not None:
+        geojson['metadata']['objects_in_zones'] = zone_counts
     
     output_path.parent.mkdir(parents=True, exist_ok=True)
     with open(output_path, 'w', encoding='utf-8') as f:
@@ -198,9 +108,34 @@ def main():
     parser.add_argument('--bbox', type=str, help='Custom bbox: min_lon,min_lat,max_lon,max_lat')
     parser.add_argument('--city', type=str, help='Название города из cities_list.csv')
     parser.add_argument('--delay', type=float, default=0.1, help='Задержка между запросами')
+    parser.add_argument('--response-cache', action='store_true',
+                        help='Кэшировать ответы /objects/discovery на диске (output/cache/responses)')
+    parser.add_argument('--metrics-dir', type=str,
+                        help='Каталог для метрик: fetch_parkings.prom и fetch_parkings_summary.json')
+    add_area_arguments(parser)
+    parser.add_argument('--no-zone-tags', action='store_true',
+                        help='Не помечать парковки зонами ограничений из output/zones.geojson')
+    add_profile_argument(parser)
+    add_ledger_argument(parser)
+    add_token_argument(parser)
+    add_stream_argument(parser)
     args = parser.parse_args()
     
-    headers, _ = load_config()  # load_config возвращает (headers, payment_methods)
+    metrics.configure(args.metrics_dir, 'fetch_parkings')
+    profiler.configure(args.profile, 'fetch_parkings')
+    ledger.configure(None if args.no_ledger else DEFAULT_LEDGER_PATH, script='fetch_parkings')
+    
+    # Потоковый вывод парковок (NDJSON)
+    stream = FeatureStream(args.stream) if args.stream else None
+    if stream is not None and stream.to_stdout:
+        # stdout занят потоком - ход парсинга печатаем в stderr
+        sys.stdout = sys.stderr
+    
+    response_cache = ResponseCache() if args.response_cache else None
+    client = YandexClient.from_config(delay=args.delay, response_cache=response_cache,
+                                      token_wait=args.token_wait * 60)
+    
+    zone_index = None if args.no_zone_tags else load_zone_index()
     
     # Обработка --city
     if args.city:
@@ -220,7 +155,9 @@ def main():
             
             zone_start = time.time()
             
-            parkings = fetch_city_parkings(zone['bbox'], zone['id'], headers, delay=args.delay)
+            parkings = crawl_city_parkings(client, zone['bbox'], zone['id'],
+                                           on_object=stream_callback(stream, args.city),
+                                           area=area_from_args(args, zone['id']))
             
             zone_time = time.time() - zone_start
             total_time += zone_time
@@ -230,9 +167,18 @@ def main():
             if len(city_zones) > 1:
                 print(f"   ✓ Зона {idx}: {len(parkings):,} парковок за {zone_time/60:.1f} мин")
         
+        client.close()
+        
         # Сохранение объединённых результатов
         output_path = Path(__file__).parent / 'output' / 'parkings.geojson'
-        stats = save_geojson(all_parkings, output_path, args.city)
+        stats = save_geojson(all_parkings, output_path, args.city, zone_index)
+        metrics.set_gauge('parkings_found', stats['cluster'] + stats['cluster_empty'])
+        metrics.write_summary()
+        profiler.finish()
+        if stream is not None:
+            stream.summary(city_id=args.city, zones=len(city_zones), output=str(output_path),
+                           elapsed_seconds=round(total_time, 1), **stats)
+            stream.close()
         
         print(f"\n{'=' * 80}")
         print(f"✅ Парсинг завершён!")
@@ -253,21 +199,34 @@ def main():
         city_id = f"custom_{int(time.time())}"
     elif args.city_id:
         city_feature = load_city_polygon(args.city_id)
-        city_bbox = get_polygon_bbox(city_feature['geometry']['coordinates'])
+        city_bbox = geometry_bounds(city_feature['geometry'])
         city_id = args.city_id
     else:
         print("❌ Укажите city_id, --city или --bbox")
         sys.exit(1)
     
     start_time = time.time()
-    parkings = fetch_city_parkings(city_bbox, city_id, headers, delay=args.delay)
+    parkings = crawl_city_parkings(client, city_bbox, city_id, on_object=stream_callback(stream, city_id),
+                                   area=area_from_args(args, None if args.bbox else city_id))
+    
+    client.close()
     
     if not parkings:
         print("\n❌ Парковки не найдены")
+        if stream is not None:
+            stream.summary(city_id=city_id, cluster=0, cluster_empty=0, total_scooters=0)
+            stream.close()
         sys.exit(0)
     
     output_path = Path(__file__).parent / 'output' / 'parkings.geojson'
-    stats = save_geojson(parkings, output_path, city_id)
+    stats = save_geojson(parkings, output_path, city_id, zone_index)
+    metrics.set_gauge('parkings_found', stats['cluster'] + stats['cluster_empty'])
+    metrics.write_summary()
+    profiler.finish()
+    if stream is not None:
+        stream.summary(city_id=city_id, output=str(output_path),
+                       elapsed_seconds=round(time.time() - start_time, 1), **stats)
+        stream.close()
     
     print("\n✅ ГОТОВО!")
     print(f"📄 {output_path}")
@@ -277,4 +236,8 @@ def main():
     print(f"   Самокатов на парковках: {stats['total_scooters']}")
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except YandexParserError as e:
+        print(f"\n❌ {e}")
+        sys.exit(1)
@@ -11,597 +11,126 @@
     python3 fetch_scooters.py --bbox 39.6,43.4,39.9,43.7  # По custom bbox
     python3 fetch_scooters.py --city "Минск"  # По названию города из cities_list.csv
     python3 fetch_scooters.py --city "Омск" --with-full-info --delay 0.3  # С полной информацией
+    python3 fetch_scooters.py --batch --country Беларусь --workers 8  # Все города страны параллельно
 """
 
 import json
-import os
 import sys
 import argparse
 import time
-import csv
 from pathlib import Path
 from datetime import datetime
-from collections import defaultdict
-import requests
 
-# Базовый URL API Yandex
-BASE_URL = "https://tc.mobile.yandex.net"
-
-
-def load_config():
-    """Загрузка заголовков и payment_methods из config.json."""
-    config_path = Path(__file__).parent / 'config.json'
-    
-    if not config_path.exists():
-        print("❌ Ошибка: файл config.json не найден!")
-        sys.exit(1)
-    
-    with open(config_path, 'r', encoding='utf-8') as f:
-        config = json.load(f)
-    
-    headers = config.get('headers') or config.get('yandex_headers')
-    
-    if not headers:
-        print("❌ Ошибка: заголовки не найдены в config.json!")
-        sys.exit(1)
-    
-    payment_methods = config.get('payment_methods', [{"type": "card"}])
-    
-    return headers, payment_methods
-
-
-def find_cities_by_name(city_name):
-    """
-    Ищет все зоны города по названию в cities_list.csv.
-    Возвращает список словарей с полями: id, name, country, bbox
-    """
-    cities_csv = Path(__file__).parent / 'cities_list.csv'
-    
-    if not cities_csv.exists():
-        print("❌ Ошибка: файл cities_list.csv не найден!")
-        print("Сначала запустите: python3 fetch_cities.py")
-        sys.exit(1)
-    
-    matching_cities = []
-    
-    with open(cities_csv, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row['name'].lower() == city_name.lower():
-                matching_cities.append({
-                    'id': row['id'],
-                    'name': row['name'],
-                    'country': row['country'],
-                    'bbox': [float(x) for x in row['bbox'].split(',')]
-                })
-    
-    if not matching_cities:
-        print(f"❌ Город '{city_name}' не найден в cities_list.csv")
-        print("\nДоступные города:")
-        
-        # Показать первые 10 городов для справки
-        with open(cities_csv, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            seen_names = set()
-            count = 0
-            for row in reader:
-                if row['name'] not in seen_names:
-                    print(f"  • {row['name']} ({row['country']})")
-                    seen_names.add(row['name'])
-                    count += 1
-                    if count >= 10:
-                        print("  ...")
-                        break
-        sys.exit(1)
-    
-    return matching_cities
-
-
-def load_city_polygon(city_id):
-    """Загрузка полигона города из cities.geojson."""
-    cities_path = Path(__file__).parent / 'output' / 'cities.geojson'
-    
-    if not cities_path.exists():
-        print("❌ Ошибка: файл output/cities.geojson не найден!")
-        print("Сначала запустите: python3 fetch_cities.py")
-        sys.exit(1)
-    
-    with open(cities_path, 'r', encoding='utf-8') as f:
-        cities = json.load(f)
-    
-    for feature in cities['features']:
-        if feature['id'] == city_id:
-            return feature
-    
-    print(f"❌ Город {city_id} не найден в cities.geojson")
-    sys.exit(1)
-
-
-def get_polygon_bbox(polygon_coords):
-    """Вычисление bbox для полигона."""
-    all_coords = []
-    
-    if isinstance(polygon_coords[0][0], list):
-        # Polygon
-        for ring in polygon_coords:
-            all_coords.extend(ring)
-    else:
-        # Simple ring
-        all_coords = polygon_coords
-    
-    lons = [c[0] for c in all_coords]
-    lats = [c[1] for c in all_coords]
-    
-    return [min(lons), min(lats), max(lons), max(lats)]
-
-
-def fetch_scooters(bbox, user_location, zoom, headers, delay=0.1):
-    """Запрос самокатов для заданной области."""
-    endpoint = "/4.0/eboks/scooters/v1/objects/discovery"
-    url = f"{BASE_URL}{endpoint}"
-    
-    params = {
-        "mobcf": "russia%25go_ru_by_geo_hosts_2%25default",
-        "mobpr": "go_ru_by_geo_hosts_2_TAXI_V4_0"
-    }
-    
-    data = {
-        "actions": [],
-        "bbox": bbox,
-        "user_location": user_location,
-        "zoom": zoom
-    }
-    
-    try:
-        response = requests.post(url, headers=headers, json=data, params=params, timeout=30)
-        
-        if response.status_code == 405:
-            print("❌ Ошибка 405: JWT токен истёк!")
-            sys.exit(1)
-        elif response.status_code in [401, 403]:
-            print(f"❌ Ошибка {response.status_code}: Токен недействителен!")
-            sys.exit(1)
-        
-        response.raise_for_status()
-        
-        if delay > 0:
-            time.sleep(delay)
-        
-        return response.json()
-        
-    except requests.exceptions.RequestException as e:
-        print(f"⚠️  Ошибка запроса: {e}")
-        return None
-
-
-def fetch_scooter_full_info(scooter_number, location, headers, payment_methods, delay=0.2):
-    """
-    Получение полной информации о самокате через /offers/create.
-    Возвращает данные о батарее, ценах, страховке и т.д.
-    """
-    url = f"{BASE_URL}/4.0/scooters/v1/offers/create"
-    
-    data = {
-        "maas_client_version": "6.101.0",
-        "payment_methods": payment_methods,
-        "user_position": location,
-        "vehicle_numbers": [scooter_number]
-    }
-    
-    try:
-        response = requests.post(url, headers=headers, json=data, timeout=30)
-        
-        if response.status_code not in [200, 201]:
-            return None
-        
-        if delay > 0:
-            time.sleep(delay)
-        
-        return response.json()
-        
-    except requests.exceptions.RequestException:
+from yandex_parser.full_info_cache import FullInfoCache, CityMetadataCache, DEFAULT_STATIC_TTL, DEFAULT_VOLATILE_TTL
+from yandex_parser.response_cache import ResponseCache
+from yandex_parser.metrics import registry as metrics
+from yandex_parser.profiling import profiler, add_profile_argument
+from yandex_parser.request_ledger import ledger, add_ledger_argument, DEFAULT_LEDGER_PATH
+from autotune import load_city_params, tune_from_ledger, save_city_params
+from yandex_parser.full_info_sampling import DEFAULT_SAMPLE_CELL_DEG
+from feature_stream import FeatureStream, add_stream_argument
+from yandex_parser import (
+    YandexClient, YandexParserError, DataNotFoundError, TokenExpiredError, CrawlJournal, find_cities_by_name,
+    load_city_polygon, load_city_zones, crawl_city_metadata, crawl_city_scooters,
+    crawl_zones_batch
+)
+from yandex_parser.geometry import add_area_arguments, area_from_args, geometry_bounds
+from yandex_parser.zone_index import load_zone_index
+from yandex_parser.tokens import add_token_argument
+
+
+def scooter_feature(obj_id, obj, city_id, full_info_mode=False):
+    """GeoJSON Feature самоката или кластера; None - объект не выводится."""
+    geo = obj.get('geo')
+    if not geo:
         return None
-
-
-def extract_full_info_from_offer(offer_data):
-    """
-    Извлечение всей полезной информации из ответа /offers/create.
-    Возвращает dict с батареей, ценами, страховкой, оператором, подписками.
-    """
-    result = {
-        'vehicle': {},
-        'pricing': {},
-        'insurance': {},
-        'operator': {},
-        'subscription': {},
-        'currency': {}
-    }
     
-    # Информация о самокате
-    vehicles = offer_data.get('vehicles', [])
-    if vehicles:
-        vehicle = vehicles[0]
-        result['vehicle'] = {
-            'uuid': vehicle.get('id'),
-            'model': vehicle.get('model'),
-            'vendor': vehicle.get('vendor'),
-            'image_tag': vehicle.get('image'),
-            'type': vehicle.get('type'),
-            'charge_level': vehicle.get('status', {}).get('charge_level'),
-            'remaining_distance': vehicle.get('status', {}).get('remaining_distance'),
-            'remaining_time': vehicle.get('status', {}).get('remaining_time')
-        }
+    obj_type = obj_id.split('_')[0]
     
-    # Ценовая информация
-    offers = offer_data.get('offers', [])
-    if offers:
-        offer = offers[0]
-        prices = offer.get('prices', {})
-        surge = offer.get('surge', {})
-        
-        result['pricing'] = {
-            'offer_id': offer.get('offer_id'),
-            'offer_type': offer.get('type'),
-            'unlock_price': prices.get('unlock'),
-            'riding_price': prices.get('riding'),
-            'parking_price': prices.get('parking'),
-            'surge_balance': surge.get('balance', 0.0),
-            'surge_unlock_balance': surge.get('unlock_balance', 0.0),
-            'surge_info_balance': surge.get('info_balance', 0.0),
-            'tariff_name': offer.get('name'),
-            'tariff_subname': offer.get('subname'),
-            'tariff_short_name': offer.get('short_name')
-        }
-        
-        # Страховка
-        insurance = offer.get('insurance', {})
-        full_insurance = insurance.get('full_insurance_prices', {})
-        
-        result['insurance'] = {
-            'type': insurance.get('type'),
-            'immutable': insurance.get('is_immutable'),
-            'price': full_insurance.get('fixed_price'),
-            'coverage': full_insurance.get('coverage')
-        }
-        
-        # Парсинг информации об операторе из offer_details
-        offer_details = offer.get('texts', {}).get('offer_details', '')
-        if 'ОГРН' in offer_details:
-            # Простой парсинг (можно улучшить регулярками)
-            lines = offer_details.split('\n')
-            for i, line in enumerate(lines):
-                if 'ОГРН' in line:
-                    result['operator']['ogrn'] = line.split(':')[-1].strip()
-                if i == 0 and ('ООО' in line or 'ИП' in line or 'АО' in line):
-                    result['operator']['name'] = line.strip()
-    
-    # Подписки
-    passes = offer_data.get('passes', {})
-    super_passes = passes.get('super_passes', {})
-    purchase_window = super_passes.get('purchase_window', {})
-    
-    result['subscription'] = {
-        'title': purchase_window.get('title'),
-        'subtitle': purchase_window.get('subtitle'),
-        'packages': []
-    }
-    
-    pass_elements = purchase_window.get('pass_elements', [])
-    for element in pass_elements:
-        package = {
-            'pass_id': element.get('pass_id'),
-            'name': element.get('name'),
-            'description': element.get('description')
-        }
-        result['subscription']['packages'].append(package)
-    
-    # Валюта
-    currency_rules = offer_data.get('currency_rules', {})
-    result['currency'] = {
-        'code': currency_rules.get('code'),
-        'sign': currency_rules.get('sign'),
-        'text': currency_rules.get('text'),
-        'template': currency_rules.get('template')
+    properties = {
+        "id": obj_id,
+        "city_id": city_id
     }
     
-    return result
-
-
-def extract_points_from_response(data):
-    """
-    Извлечение всех координат из ответа (любой формат).
-    Возвращает list of [lon, lat].
-    """
-    points = []
-    
-    # objects формат (детальный)
-    objects = data.get('objects', {})
-    for obj_type in objects.get('objects_by_type', []):
-        for obj in obj_type.get('objects', []):
-            if isinstance(obj, dict) and 'geo' in obj:
-                points.append(obj['geo'])
-            elif isinstance(obj, list) and len(obj) >= 2:
-                points.append(obj)
-    
-    # rowan формат (упрощенный)
-    rowan = data.get('rowan', {})
-    for obj_type in rowan.get('objects_by_type', []):
-        for coords in obj_type.get('objects', []):
-            if coords and len(coords) >= 2:
-                points.append(coords)
-    
-    return points
-
-
-def extract_detailed_objects(data):
-    """
-    Извлечение детальных объектов из objects формата.
-    Возвращает dict: {scooters: [...], clusters: [...]}
-    """
-    result = {
-        'scooters': [],
-        'clusters': [],
-        'cluster_empty': []
-    }
-    
-    objects = data.get('objects', {})
-    for obj_type in objects.get('objects_by_type', []):
-        type_name = obj_type.get('type')
-        objects_list = obj_type.get('objects', [])
-        
-        if type_name == 'scooter':
-            result['scooters'].extend(objects_list)
-        elif type_name == 'cluster':
-            result['clusters'].extend(objects_list)
-        elif type_name == 'cluster_empty':
-            result['cluster_empty'].extend(objects_list)
-    
-    return result
-
-
-def simple_cluster_points(points, grid_size_deg=0.02):
-    """
-    Простая кластеризация точек в сетку.
-    Возвращает list of bboxes для "горячих" зон.
-    """
-    if not points:
-        return []
-    
-    # Находим общий bbox
-    lons = [p[0] for p in points]
-    lats = [p[1] for p in points]
-    min_lon, max_lon = min(lons), max(lons)
-    min_lat, max_lat = min(lats), max(lats)
-    
-    # Создаём сетку
-    grid = defaultdict(list)
-    
-    for point in points:
-        lon, lat = point
-        grid_x = int((lon - min_lon) / grid_size_deg)
-        grid_y = int((lat - min_lat) / grid_size_deg)
-        grid[(grid_x, grid_y)].append(point)
-    
-    # Создаём bbox для непустых ячеек
-    hot_zones = []
-    for (grid_x, grid_y), cell_points in grid.items():
-        if len(cell_points) > 0:  # Любое количество точек
-            cell_min_lon = min_lon + grid_x * grid_size_deg
-            cell_min_lat = min_lat + grid_y * grid_size_deg
-            cell_max_lon = cell_min_lon + grid_size_deg
-            cell_max_lat = cell_min_lat + grid_size_deg
+    # Определяем тип и добавляем свойства
+    if obj_type == 'scooter':
+        properties["type"] = "scooter"
+        properties["number"] = obj.get('payload', {}).get('number')
+        
+        # Если есть полная информация - добавляем её
+        full_info = obj.get('full_info')
+        if full_info:
+            vehicle = full_info.get('vehicle', {})
+            pricing = full_info.get('pricing', {})
+            insurance = full_info.get('insurance', {})
             
-            hot_zones.append({
-                'bbox': [cell_min_lon, cell_min_lat, cell_max_lon, cell_max_lat],
-                'points_count': len(cell_points)
+            # Базовая информация о самокате
+            properties.update({
+                'uuid': vehicle.get('uuid'),
+                'model': vehicle.get('model'),
+                'vendor': vehicle.get('vendor'),
+                'image_tag': vehicle.get('image_tag')
             })
-    
-    return hot_zones
-
-
-def shrink_bbox_around_point(point, size_deg=0.005):
-    """Создание маленького bbox вокруг точки."""
-    lon, lat = point
-    return [
-        lon - size_deg,
-        lat - size_deg,
-        lon + size_deg,
-        lat + size_deg
-    ]
-
-
-def fetch_city_scooters(city_bbox, city_id, headers, payment_methods, min_cluster_size=50, delay=0.1, with_full_info=False):
-    """
-    Комбинированный подход для полного парсинга города.
-    
-    Параметры:
-        with_full_info: если True, для каждого самоката будет запрошена полная информация
-                       (батарея, цены, страховка) через /offers/create
-    """
-    print(f"\n🚀 Парсинг города: {city_id}")
-    print("="*80)
-    
-    if with_full_info:
-        print("ℹ️  Режим: полная информация (батарея, цены, страховка)")
-        print("⚠️  Это увеличит время парсинга в ~N раз (N = количество самокатов)")
-    
-    # Вычисляем центр bbox для user_location
-    center_lon = (city_bbox[0] + city_bbox[2]) / 2
-    center_lat = (city_bbox[1] + city_bbox[3]) / 2
-    user_location = [center_lon, center_lat]
-    
-    # Этап 1: Обзорный запрос с низким zoom
-    print(f"\n📡 Этап 1: Обзорный запрос (zoom 12)")
-    print(f"   Bbox: {city_bbox}")
-    
-    overview_data = fetch_scooters(city_bbox, user_location, zoom=12, headers=headers, delay=delay)
-    
-    if not overview_data:
-        print("❌ Не удалось получить обзорные данные")
-        return {}
-    
-    # Извлекаем все точки
-    all_points = extract_points_from_response(overview_data)
-    print(f"   Найдено точек: {len(all_points)}")
-    
-    if len(all_points) == 0:
-        print("   ℹ️  В городе нет самокатов")
-        return {}
-    
-    # Этап 2: Кластеризация в горячие зоны
-    print(f"\n🔥 Этап 2: Кластеризация точек (сетка 0.02°)")
-    hot_zones = simple_cluster_points(all_points, grid_size_deg=0.02)
-    print(f"   Горячих зон: {len(hot_zones)}")
-    
-    # Этап 3: Детальные запросы для горячих зон
-    print(f"\n📥 Этап 3: Детальные запросы (zoom 17)")
-    
-    all_scooters = {}
-    all_clusters_to_process = []
-    
-    for i, zone in enumerate(hot_zones, 1):
-        zone_bbox = zone['bbox']
-        zone_center = [
-            (zone_bbox[0] + zone_bbox[2]) / 2,
-            (zone_bbox[1] + zone_bbox[3]) / 2
-        ]
-        
-        print(f"   [{i}/{len(hot_zones)}] Зона с {zone['points_count']} точками...", end=' ')
-        
-        detail_data = fetch_scooters(zone_bbox, zone_center, zoom=17, headers=headers, delay=delay)
-        
-        if not detail_data:
-            print("⚠️  Ошибка")
-            continue
-        
-        objects = extract_detailed_objects(detail_data)
-        
-        # Сохраняем самокаты
-        for scooter in objects['scooters']:
-            scooter_id = scooter.get('id')
-            if scooter_id:
-                all_scooters[scooter_id] = scooter
-        
-        # Собираем большие кластеры для дальнейшей обработки
-        for cluster in objects['clusters']:
-            count = cluster.get('payload', {}).get('objects_count', 0)
-            if count >= min_cluster_size:
-                all_clusters_to_process.append(cluster)
-            else:
-                # Маленькие кластеры сохраняем как есть
-                cluster_id = cluster.get('id')
-                if cluster_id:
-                    all_scooters[cluster_id] = cluster
-        
-        print(f"✓ {len(objects['scooters'])} самокатов, {len(objects['clusters'])} кластеров")
-    
-    # Этап 4: Рекурсивное раскрытие больших кластеров
-    if all_clusters_to_process:
-        print(f"\n🔍 Этап 4: Раскрытие больших кластеров (zoom 19)")
-        print(f"   Кластеров для обработки: {len(all_clusters_to_process)}")
-        
-        for i, cluster in enumerate(all_clusters_to_process, 1):
-            count = cluster.get('payload', {}).get('objects_count', 0)
-            geo = cluster.get('geo')
-            
-            print(f"   [{i}/{len(all_clusters_to_process)}] Кластер с {count} самокатами...", end=' ')
             
-            if not geo:
-                print("⚠️  Нет координат")
-                continue
-            
-            # Уменьшаем bbox вокруг кластера
-            small_bbox = shrink_bbox_around_point(geo, size_deg=0.005)
-            
-            detail_data = fetch_scooters(small_bbox, geo, zoom=19, headers=headers, delay=delay)
-            
-            if not detail_data:
-                print("⚠️  Ошибка")
-                # Сохраняем кластер как есть
-                cluster_id = cluster.get('id')
-                if cluster_id:
-                    all_scooters[cluster_id] = cluster
-                continue
+            # Статус батареи
+            properties.update({
+                'charge_level': vehicle.get('charge_level'),
+                'remaining_distance': vehicle.get('remaining_distance'),
+                'remaining_time': vehicle.get('remaining_time')
+            })
             
-            objects = extract_detailed_objects(detail_data)
+            # Цены (могут различаться по самокатам)
+            properties.update({
+                'unlock_price': pricing.get('unlock_price'),
+                'riding_price': pricing.get('riding_price'),
+                'parking_price': pricing.get('parking_price'),
+                'surge_balance': pricing.get('surge_balance'),
+                'offer_id': pricing.get('offer_id'),
+                'offer_type': pricing.get('offer_type')
+            })
             
-            # Сохраняем раскрытые самокаты
-            new_scooters = 0
-            for scooter in objects['scooters']:
-                scooter_id = scooter.get('id')
-                if scooter_id and scooter_id not in all_scooters:
-                    all_scooters[scooter_id] = scooter
-                    new_scooters += 1
+            # Страховка (обычно одинакова)
+            properties.update({
+                'insurance_price': insurance.get('price'),
+                'insurance_coverage': insurance.get('coverage')
+            })
             
-            # Если остались кластеры - сохраняем их
-            for sub_cluster in objects['clusters']:
-                cluster_id = sub_cluster.get('id')
-                if cluster_id:
-                    all_scooters[cluster_id] = sub_cluster
+            # Цены оценены по выборке соседних самокатов
+            if full_info.get('estimated'):
+                properties['estimated'] = True
             
-            print(f"✓ Раскрыто {new_scooters}/{count}")
+            # Заряд и цены взяты из кэша - их возраст
+            if full_info.get('cached_at') is not None:
+                properties['full_info_age_min'] = round((time.time() - full_info['cached_at']) / 60, 1)
     
-    # Этап 5 (опционально): Сбор полной информации через /offers/create
-    if with_full_info:
-        scooter_list = [s for s in all_scooters.values() if s.get('id', '').startswith('scooter_')]
-        
-        if scooter_list:
-            print(f"\n💎 Этап 5: Сбор полной информации")
-            print(f"   Самокатов для обработки: {len(scooter_list)}")
-            print(f"   ⚠️  Это займёт ~{len(scooter_list) * delay:.0f} секунд")
-            
-            # Собираем метаданные города (operator, subscription, currency)
-            # Берём данные из первого самоката
-            city_metadata = {
-                'operator': {},
-                'subscription': {},
-                'currency': {}
-            }
-            metadata_collected = False
-            
-            # Прогресс-бар
-            bar_width = 50
-            
-            for i, scooter in enumerate(scooter_list, 1):
-                scooter_number = scooter.get('payload', {}).get('number')
-                scooter_geo = scooter.get('geo')
-                
-                if not scooter_number or not scooter_geo:
-                    continue
-                
-                # Запрашиваем полную информацию
-                offer_data = fetch_scooter_full_info(scooter_number, scooter_geo, headers, payment_methods, delay)
-                
-                if offer_data:
-                    full_info = extract_full_info_from_offer(offer_data)
-                    
-                    # Добавляем информацию к самокату
-                    scooter['full_info'] = full_info
-                    
-                    # Собираем метаданные города (один раз)
-                    if not metadata_collected:
-                        city_metadata['operator'] = full_info['operator']
-                        city_metadata['subscription'] = full_info['subscription']
-                        city_metadata['currency'] = full_info['currency']
-                        metadata_collected = True
-                
-                # Обновляем прогресс-бар
-                progress = i / len(scooter_list)
-                filled = int(bar_width * progress)
-                bar = '█' * filled + '░' * (bar_width - filled)
-                percent = int(progress * 100)
-                print(f'\r   [{bar}] {percent}% ({i}/{len(scooter_list)})', end='', flush=True)
-            
-            print(f"\n   ✓ Полная информация собрана")
+    elif obj_type == 'cluster':
+        # В режиме full_info отбрасываем кластеры (парковки)
+        if full_info_mode:
+            return None
             
-            # Добавляем метаданные в результат
-            all_scooters['__metadata__'] = city_metadata
-    
-    return all_scooters
+        properties["type"] = "cluster"
+        count = obj.get('payload', {}).get('objects_count', 0)
+        properties["objects_count"] = count
+        properties["overlay_text"] = obj.get('overlay_text')
+    
+    return {
+        "type": "Feature",
+        "id": obj_id,
+        "geometry": {
+            "type": "Point",
+            "coordinates": geo
+        },
+        "properties": properties
+    }
 
 
-def save_geojson(scooters_dict, output_path, city_id, full_info_mode=False):
-    """Сохранение результатов в GeoJSON с metadata (Вариант C)."""
+def save_geojson(scooters_dict, output_path, city_id, full_info_mode=False, zone_index=None):
+    """
+    Сохранение результатов в GeoJSON с metadata (Вариант C).
+    
+    zone_index: ZoneIndex или None - пометить объекты зонами ограничений
+    (zones, zone_types, speed_limit)
+    """
     features = []
     
     stats = {
@@ -614,86 +143,21 @@ def save_geojson(scooters_dict, output_path, city_id, full_info_mode=False):
     city_metadata = scooters_dict.pop('__metadata__', None)
     
     for obj_id, obj in scooters_dict.items():
-        geo = obj.get('geo')
-        if not geo:
+        feature = scooter_feature(obj_id, obj, city_id, full_info_mode)
+        if feature is None:
             continue
         
-        obj_type = obj_id.split('_')[0]
-        
-        properties = {
-            "id": obj_id,
-            "city_id": city_id
-        }
-        
-        # Определяем тип и добавляем свойства
-        if obj_type == 'scooter':
-            properties["type"] = "scooter"
-            properties["number"] = obj.get('payload', {}).get('number')
-            
-            # Если есть полная информация - добавляем её
-            full_info = obj.get('full_info')
-            if full_info:
-                vehicle = full_info.get('vehicle', {})
-                pricing = full_info.get('pricing', {})
-                insurance = full_info.get('insurance', {})
-                
-                # Базовая информация о самокате
-                properties.update({
-                    'uuid': vehicle.get('uuid'),
-                    'model': vehicle.get('model'),
-                    'vendor': vehicle.get('vendor'),
-                    'image_tag': vehicle.get('image_tag')
-                })
-                
-                # Статус батареи
-                properties.update({
-                    'charge_level': vehicle.get('charge_level'),
-                    'remaining_distance': vehicle.get('remaining_distance'),
-                    'remaining_time': vehicle.get('remaining_time')
-                })
-                
-                # Цены (могут различаться по самокатам)
-                properties.update({
-                    'unlock_price': pricing.get('unlock_price'),
-                    'riding_price': pricing.get('riding_price'),
-                    'parking_price': pricing.get('parking_price'),
-                    'surge_balance': pricing.get('surge_balance'),
-                    'offer_id': pricing.get('offer_id'),
-                    'offer_type': pricing.get('offer_type')
-                })
-                
-                # Страховка (обычно одинакова)
-                properties.update({
-                    'insurance_price': insurance.get('price'),
-                    'insurance_coverage': insurance.get('coverage')
-                })
-            
+        properties = feature['properties']
+        if properties.get('type') == 'scooter':
             stats['scooters'] += 1
-            
-        elif obj_type == 'cluster':
-            # В режиме full_info отбрасываем кластеры (парковки)
-            if full_info_mode:
-                continue
-                
-            properties["type"] = "cluster"
-            count = obj.get('payload', {}).get('objects_count', 0)
-            properties["objects_count"] = count
-            properties["overlay_text"] = obj.get('overlay_text')
+        elif properties.get('type') == 'cluster':
             stats['clusters'] += 1
-            stats['cluster_scooters'] += count
-        
-        feature = {
-            "type": "Feature",
-            "id": obj_id,
-            "geometry": {
-                "type": "Point",
-                "coordinates": geo
-            },
-            "properties": properties
-        }
+            stats['cluster_scooters'] += properties['objects_count']
         
         features.append(feature)
     
+    zone_counts = zone_index.tag_features(features) if zone_index is not None else None
+    
     # Создаём базовые метаданные
     metadata = {
         "city_id": city_id,
@@ -705,12 +169,16 @@ def save_geojson(scooters_dict, output_path, city_id, full_info_mode=False):
         "total_scooters": stats['scooters'] + stats['cluster_scooters'],
         "source": "Yandex Go API (Combined Approach)"
     }
+    if zone_counts is not None:
+        metadata['objects_in_zones'] = zone_counts
     
     # Добавляем метаданные города (operator, subscription, currency)
     if city_metadata:
         metadata['operator'] = city_metadata.get('operator', {})
         metadata['subscription'] = city_metadata.get('subscription', {})
         metadata['currency'] = city_metadata.get('currency', {})
+        if city_metadata.get('fetched_at'):
+            metadata['metadata_fetched_at'] = datetime.fromtimestamp(city_metadata['fetched_at']).isoformat()
     
     geojson = {
         "type": "FeatureCollection",
@@ -726,23 +194,347 @@ def save_geojson(scooters_dict, output_path, city_id, full_info_mode=False):
     return stats
 
 
+def stream_callback(stream, city_id, full_info_mode=False):
+    """on_object для crawl_city_scooters: Feature в поток --stream (None без потока)."""
+    if stream is None:
+        return None
+    
+    def on_object(obj_id, obj):
+        feature = scooter_feature(obj_id, obj, city_id, full_info_mode)
+        if feature is not None:
+            stream.feature(feature)
+    
+    return on_object
+
+
+def finish_stream(stream, **fields):
+    """Итоговая запись потока --stream и его закрытие."""
+    if stream is not None:
+        stream.summary(**fields)
+        stream.close()
+
+
+def open_journal(args, name, city_bbox, crawl_params, min_cluster_size):
+    """Журнал обхода зоны: повторный запуск после истечения токена продолжит с места остановки."""
+    return CrawlJournal.open(name, {
+        'bbox': city_bbox,
+        'with_full_info': args.with_full_info,
+        'sample_per_cell': args.sample_per_cell,
+        'sample_cell_deg': args.sample_cell,
+        'min_cluster_size': min_cluster_size,
+        'crawl_params': crawl_params,
+        'area': args.area,
+        'no_area': args.no_area
+    }, resume=not args.no_resume)
+
+
+def write_run_metrics(stats):
+    """Итоговые gauge (запросов на найденный самокат) и выгрузка метрик запуска."""
+    found = stats['scooters'] + stats['cluster_scooters']
+    metrics.set_gauge('scooters_found', found)
+    if found:
+        metrics.set_gauge('requests_per_scooter', round(metrics.requests_total(cached=False) / found, 4))
+    
+    summary_path = metrics.write_summary()
+    if summary_path:
+        print(f"📈 Метрики: {summary_path}")
+    
+    profile_report = profiler.finish()
+    if profile_report:
+        print(f"🔬 Профиль: {profile_report}")
+
+
+def merge_zone_results(zone_results):
+    """Объединение результатов зон одного города (метаданные - от первой зоны, где они есть)."""
+    scooters_dict = {}
+    city_metadata = None
+    for scooters in zone_results:
+        for scooter_id, scooter_data in scooters.items():
+            if scooter_id != '__metadata__':
+                scooters_dict[scooter_id] = scooter_data
+        if city_metadata is None:
+            city_metadata = scooters.get('__metadata__')
+    if city_metadata:
+        scooters_dict['__metadata__'] = city_metadata
+    return scooters_dict
+
+
+def city_output_path(city_name, with_full_info, timestamp):
+    """Путь к файлу результатов города (режим --city и --batch)."""
+    city_id_safe = city_name.lower().replace(' ', '_')
+    if with_full_info:
+        return Path(__file__).parent / 'output' / f'scooters_full_info_{city_id_safe}_{timestamp}.geojson'
+    return Path(__file__).parent / 'output' / 'city_scooters' / f'{city_id_safe}_{timestamp}.geojson'
+
+
+def run_batch(args, client, stream=None, zone_index=None):
+    """
+    Режим --batch: все города cities_list.csv (или отфильтрованные --country/--cities)
+    на общем пуле из --workers запросов. Каждый город сохраняется в свой файл, как
+    только завершены все его зоны.
+    """
+    zones = load_city_zones(countries=args.country, names=args.cities)
+    if not zones:
+        raise DataNotFoundError("Ошибка: в cities_list.csv нет городов, подходящих под фильтр")
+    
+    pending = {}
+    for zone in zones:
+        pending.setdefault(zone['name'], set()).add(zone['id'])
+    zone_results = {name: [] for name in pending}
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    totals = {'scooters': 0, 'clusters': 0, 'cluster_scooters': 0}
+    done = {'zones': 0, 'cities': 0}
+    journals = {}  # zone_id -> CrawlJournal
+    
+    print(f"🌐 Пакетный режим: {len(pending)} городов, {len(zones)} зон")
+    print(f"   Потоков: {args.workers}, интервал между запросами: {args.delay}с")
+    print("="*80)
+    
+    def zone_kwargs(zone):
+        crawl_params, min_cluster_size = resolve_crawl_params(zone['id'], args)
+        journals[zone['id']] = open_journal(args, zone['id'], zone['bbox'], crawl_params, min_cluster_size)
+        return {
+            'min_cluster_size': min_cluster_size,
+            'with_full_info': args.with_full_info,
+            'sample_per_cell': args.sample_per_cell,
+            'sample_cell_deg': args.sample_cell,
+            'crawl_params': crawl_params,
+            'enrich_workers': args.enrich_workers,
+            'on_object': stream_callback(stream, zone['name'], args.with_full_info),
+            'journal': journals[zone['id']],
+            'area': area_from_args(args, zone['id'])
+        }
+    
+    def on_zone_done(zone, scooters, seconds):
+        name = zone['name']
+        zone_results[name].append(scooters)
+        pending[name].discard(zone['id'])
+        done['zones'] += 1
+        found = sum(1 for sid in scooters if sid.startswith('scooter_'))
+        print(f"   [{done['zones']}/{len(zones)}] {name} / {zone['id']}: {found:,} самокатов за {seconds/60:.1f} мин")
+        
+        if pending[name]:
+            return
+        
+        # Все зоны города готовы - сохраняем город
+        output_path = city_output_path(name, args.with_full_info, timestamp)
+        stats = save_geojson(merge_zone_results(zone_results.pop(name)), output_path, name,
+                             full_info_mode=args.with_full_info, zone_index=zone_index)
+        for key in totals:
+            totals[key] += stats[key]
+        for city_zone in zones:
+            if city_zone['name'] == name:
+                journals.pop(city_zone['id']).remove()
+        done['cities'] += 1
+        print(f"   💾 {name}: {stats['scooters']:,} самокатов → {output_path.name}")
+    
+    start_time = time.time()
+    crawl_zones_batch(client, zones, max_workers=args.workers, zone_kwargs=zone_kwargs,
+                      on_zone_done=on_zone_done)
+    total_time = time.time() - start_time
+    
+    if not args.no_autotune:
+        update_city_params([zone['id'] for zone in zones])
+    
+    client.close()
+    if client.response_cache is not None:
+        print(f"💾 Кэш ответов: {client.response_cache.summary()}")
+    write_run_metrics(totals)
+    finish_stream(stream, cities=done['cities'], zones=done['zones'],
+                  elapsed_seconds=round(total_time, 1), **totals)
+    
+    print(f"\n{'=' * 80}")
+    print(f"✅ Пакетный парсинг завершён!")
+    print(f"   • Городов: {done['cities']}, зон: {done['zones']}")
+    print(f"   • Всего самокатов: {totals['scooters']:,}")
+    if not args.with_full_info:
+        print(f"   • Кластеров: {totals['clusters']:,}")
+    print(f"   • Общее время: {total_time/60:.1f} минут")
+    print(f"{'=' * 80}")
+
+
+def resolve_crawl_params(city_id, args):
+    """
+    Параметры обхода города: подобранные autotune.py (city_params.json), если есть
+    и не указан --no-autotune. Явный --min-cluster имеет приоритет.
+    
+    Returns:
+        (crawl_params или None, min_cluster_size)
+    """
+    crawl_params = None if args.no_autotune else load_city_params(city_id)
+    if args.min_cluster is not None:
+        min_cluster_size = args.min_cluster
+    elif crawl_params:
+        min_cluster_size = crawl_params['min_cluster_size']
+    else:
+        min_cluster_size = 50
+    return crawl_params, min_cluster_size
+
+
+def update_city_params(city_ids):
+    """Пересчёт параметров городов по журналу после запуска."""
+    if not ledger.enabled:
+        return
+    tuned = tune_from_ledger(ledger.path, city_ids=city_ids)
+    if tuned:
+        save_city_params(tuned)
+        for city_id, params in tuned.items():
+            print(f"🎛️  {city_id}: ячейка {params['cell_size_m']} м, zoom {params['detail_zoom']}, "
+                  f"порог {params['min_cluster_size']}, раскрытие {params['expansion_box_m']} м")
+
+
+def refresh_metadata(args, client):
+    """Режим --metadata-only: обновление кэша метаданных без полного парсинга."""
+    if args.city:
+        zones = find_cities_by_name(args.city)
+    elif args.bbox:
+        print("❌ Ошибка: --metadata-only работает только с city_id или --city")
+        sys.exit(1)
+    elif args.city_id:
+        city_feature = load_city_polygon(args.city_id)
+        zones = [{'id': args.city_id, 'bbox': geometry_bounds(city_feature['geometry'])}]
+    else:
+        print("❌ Ошибка: укажите city_id или --city")
+        sys.exit(1)
+    
+    print(f"\n🏷️  Обновление метаданных: {len(zones)} зон")
+    
+    for zone in zones:
+        print(f"   {zone['id']}...", end=' ')
+        metadata = crawl_city_metadata(client, zone['bbox'])
+        if not metadata:
+            print("⚠️  Не удалось получить метаданные")
+            continue
+        
+        changed = client.metadata_cache.store(zone['id'], metadata)
+        operator_name = metadata['operator'].get('name') or '—'
+        print(f"✓ {operator_name}, {metadata['currency'].get('code') or '—'}"
+              f"{' (изменились)' if changed else ''}")
+    
+    client.close()
+    print(f"   💾 Сохранено в: {client.metadata_cache.path}")
+
+
 def main():
     parser = argparse.ArgumentParser(description='Полный парсинг самокатов города')
     parser.add_argument('city_id', nargs='?', help='ID города из cities.geojson (например: polygon-184332)')
     parser.add_argument('--bbox', type=str, help='Custom bbox: min_lon,min_lat,max_lon,max_lat')
     parser.add_argument('--city', type=str, help='Название города из cities_list.csv (например: Минск)')
-    parser.add_argument('--min-cluster', type=int, default=50,
-                       help='Минимальный размер кластера для рекурсии (по умолчанию: 50)')
+    parser.add_argument('--batch', action='store_true',
+                       help='Пакетный режим: все города cities_list.csv (или фильтр --country/--cities) '
+                            'параллельно на общем пуле запросов, каждый город - в свой файл')
+    parser.add_argument('--country', type=str, nargs='+',
+                       help='Для --batch: только города указанных стран (например: Беларусь Грузия)')
+    parser.add_argument('--cities', type=str, nargs='+',
+                       help='Для --batch: только указанные города (например: Минск Гродно)')
+    parser.add_argument('--workers', type=int, default=8,
+                       help='Для --batch: одновременных запросов к API на все города (по умолчанию: 8)')
+    parser.add_argument('--min-cluster', type=int, default=None,
+                       help='Минимальный размер кластера для рекурсии '
+                            '(по умолчанию: из city_params.json или 50)')
+    parser.add_argument('--no-autotune', action='store_true',
+                       help='Не использовать подобранные параметры города (city_params.json): '
+                            'сетка 0.02°, zoom 17, раскрытие 0.005°')
     parser.add_argument('--delay', type=float, default=0.1,
                        help='Задержка между запросами в секундах (по умолчанию: 0.1)')
     parser.add_argument('--with-full-info', action='store_true',
                        help='Запросить полную информацию для каждого самоката (батарея, цены, страховка). '
                             'ВНИМАНИЕ: увеличивает время парсинга в N раз!')
+    parser.add_argument('--enrich-workers', type=int, default=4,
+                       help='Для --with-full-info: потоков /offers/create, работающих параллельно с '
+                            'раскрытием кластеров (по умолчанию: 4, 0 - последовательно после обхода)')
+    parser.add_argument('--sample-per-cell', type=int, default=0,
+                       help='Режим выборки для --with-full-info: запрашивать цены только для N самокатов '
+                            'в каждой ячейке, остальным присвоить оценку (без батареи)')
+    parser.add_argument('--sample-cell', type=float, default=DEFAULT_SAMPLE_CELL_DEG,
+                       help=f'Размер ячейки выборки в градусах (по умолчанию: {DEFAULT_SAMPLE_CELL_DEG})')
+    parser.add_argument('--metadata-only', action='store_true',
+                       help='Только обновить кэш метаданных города (оператор, подписки, валюта) - ~3 запроса на зону')
+    parser.add_argument('--metadata-ttl', type=float, default=72,
+                       help='TTL кэша метаданных города в часах (по умолчанию: 72); действует и с --metadata-only')
+    parser.add_argument('--no-metadata-cache', action='store_true',
+                       help='Не использовать кэш метаданных города (output/cache/city_metadata.json): '
+                            'metadata результата только из полной информации этого запуска')
+    parser.add_argument('--response-cache', action='store_true',
+                       help='Кэшировать ответы /objects/discovery на диске (output/cache/responses, TTL 5 мин)')
+    parser.add_argument('--metrics-dir', type=str,
+                       help='Каталог для метрик: fetch_scooters.prom (Prometheus) и fetch_scooters_summary.json')
+    add_area_arguments(parser)
+    parser.add_argument('--no-zone-tags', action='store_true',
+                       help='Не помечать самокаты зонами ограничений из output/zones.geojson '
+                            '(zones, zone_types, speed_limit)')
+    add_profile_argument(parser)
+    add_ledger_argument(parser)
+    add_token_argument(parser)
+    add_stream_argument(parser)
+    parser.add_argument('--no-resume', action='store_true',
+                       help='Начать обход заново, не продолжая журнал прерванного запуска (output/tmp/journal)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Не использовать кэш полной информации (output/cache/full_info_cache.json); '
+                            'кэш метаданных города отключается отдельно, --no-metadata-cache')
+    parser.add_argument('--cache-static-ttl', type=float, default=DEFAULT_STATIC_TTL / 3600,
+                       help='TTL статических полей (модель, тариф, страховка) в часах (по умолчанию: 168)')
+    parser.add_argument('--cache-volatile-ttl', type=float, default=DEFAULT_VOLATILE_TTL / 60,
+                       help='TTL изменчивых полей (заряд, цены, surge) в минутах (по умолчанию: '
+                            f'{DEFAULT_VOLATILE_TTL // 60}). Цены и surge из кэша могут отставать на это время; '
+                            '15 - актуальные цены ценой запроса почти каждого самоката')
     
     args = parser.parse_args()
     
-    # Загрузка конфигурации
-    headers, payment_methods = load_config()
+    if args.batch and args.profile:
+        print("⚠️  --profile не поддерживается в пакетном режиме (этапы городов идут параллельно), отключено")
+        args.profile = None
+    
+    metrics.configure(args.metrics_dir, 'fetch_scooters')
+    profiler.configure(args.profile, 'fetch_scooters')
+    ledger.configure(None if args.no_ledger else DEFAULT_LEDGER_PATH, script='fetch_scooters')
+    
+    # Потоковый вывод объектов (NDJSON)
+    stream = None
+    if args.stream and not args.metadata_only:
+        stream = FeatureStream(args.stream)
+        if stream.to_stdout:
+            # stdout занят потоком - ход парсинга печатаем в stderr
+            sys.stdout = sys.stderr
+    
+    # Кэш полной информации
+    full_info_cache = None
+    if args.with_full_info and not args.no_cache:
+        full_info_cache = FullInfoCache(
+            static_ttl=args.cache_static_ttl * 3600,
+            volatile_ttl=args.cache_volatile_ttl * 60
+        ).load()
+        full_info_cache.prune()
+    
+    # Кэш метаданных города (--metadata-only только его и заполняет)
+    if args.metadata_only and args.no_metadata_cache:
+        print("⚠️  --no-metadata-cache не действует с --metadata-only: режим обновляет этот кэш")
+    metadata_cache = None
+    if args.metadata_only or not args.no_metadata_cache:
+        metadata_cache = CityMetadataCache(ttl=args.metadata_ttl * 3600).load()
+    
+    # Кэш ответов API
+    response_cache = ResponseCache() if args.response_cache else None
+    
+    # Клиент API: конфиг, HTTP-сессия и кэши на весь запуск
+    client = YandexClient.from_config(
+        delay=args.delay,
+        token_wait=args.token_wait * 60,
+        response_cache=response_cache,
+        full_info_cache=full_info_cache,
+        metadata_cache=metadata_cache
+    )
+    
+    if args.metadata_only:
+        refresh_metadata(args, client)
+        return
+    
+    # Индекс зон ограничений для пометки объектов при сохранении
+    zone_index = None if args.no_zone_tags else load_zone_index()
+    
+    if args.batch:
+        run_batch(args, client, stream, zone_index)
+        return
     
     # Определение bbox и city_id
     if args.city:
@@ -752,7 +544,8 @@ def main():
         if len(city_zones) > 1:
             print(f"🌍 Город '{args.city}' содержит {len(city_zones)} зон, обрабатываю последовательно...")
         
-        all_scooters = []
+        zone_results = []
+        journals = []
         total_time = 0
         
         for idx, zone in enumerate(city_zones, 1):
@@ -762,47 +555,55 @@ def main():
                 print(f"{'=' * 80}")
             
             zone_start = time.time()
+            crawl_params, min_cluster_size = resolve_crawl_params(zone['id'], args)
+            journals.append(open_journal(args, zone['id'], zone['bbox'], crawl_params, min_cluster_size))
             
-            scooters = fetch_city_scooters(
+            scooters = crawl_city_scooters(
+                client,
                 zone['bbox'],
                 zone['id'],
-                headers,
-                payment_methods,
-                min_cluster_size=args.min_cluster,
-                delay=args.delay,
-                with_full_info=args.with_full_info
+                min_cluster_size=min_cluster_size,
+                with_full_info=args.with_full_info,
+                sample_per_cell=args.sample_per_cell,
+                sample_cell_deg=args.sample_cell,
+                crawl_params=crawl_params,
+                enrich_workers=args.enrich_workers,
+                on_object=stream_callback(stream, args.city, args.with_full_info),
+                journal=journals[-1],
+                area=area_from_args(args, zone['id'])
             )
             
             zone_time = time.time() - zone_start
             total_time += zone_time
             
-            # Объединяем результаты
-            for scooter_id, scooter_data in scooters.items():
-                if scooter_id != '__metadata__':
-                    all_scooters.append((scooter_id, scooter_data))
+            zone_results.append(scooters)
             
             if len(city_zones) > 1:
                 # Подсчёт самокатов (исключая кластеры в режиме full-info)
-                zone_scooters = sum(1 for sid, _ in all_scooters if sid.startswith('scooter_'))
+                zone_scooters = sum(1 for sid in scooters if sid.startswith('scooter_'))
                 print(f"   ✓ Зона {idx}: {zone_scooters:,} самокатов за {zone_time/60:.1f} мин")
         
-        # Преобразуем обратно в словарь для save_geojson
-        scooters_dict = dict(all_scooters)
+        if not args.no_autotune:
+            update_city_params([zone['id'] for zone in city_zones])
+        
+        client.close()
+        if response_cache is not None:
+            print(f"💾 Кэш ответов: {response_cache.summary()}")
         
         # Сохранение объединённых результатов
+        scooters_dict = merge_zone_results(zone_results)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        city_id_safe = args.city.lower().replace(' ', '_')
-        
-        if args.with_full_info:
-            output_dir = Path(__file__).parent / 'output'
-            output_filename = f'scooters_full_info_{city_id_safe}_{timestamp}.geojson'
-        else:
-            output_dir = Path(__file__).parent / 'output' / 'city_scooters'
-            output_filename = f'{city_id_safe}_{timestamp}.geojson'
-        
-        output_path = output_dir / output_filename
-        
-        stats = save_geojson(scooters_dict, output_path, args.city, full_info_mode=args.with_full_info)
+        output_path = city_output_path(args.city, args.with_full_info, timestamp)
+        
+        profiler.start('save')
+        stats = save_geojson(scooters_dict, output_path, args.city, full_info_mode=args.with_full_info,
+                             zone_index=zone_index)
+        profiler.stop()
+        for journal in journals:
+            journal.remove()
+        write_run_metrics(stats)
+        finish_stream(stream, city_id=args.city, zones=len(city_zones), output=str(output_path),
+                      elapsed_seconds=round(total_time, 1), **stats)
         
         print(f"\n{'=' * 80}")
         print(f"✅ Парсинг завершён!")
@@ -826,7 +627,7 @@ def main():
         city_id = f"custom_{int(time.time())}"
     elif args.city_id:
         city_feature = load_city_polygon(args.city_id)
-        city_bbox = get_polygon_bbox(city_feature['geometry']['coordinates'])
+        city_bbox = geometry_bounds(city_feature['geometry'])
         city_id = args.city_id
     else:
         print("❌ Ошибка: укажите city_id, --city или --bbox")
@@ -835,19 +636,37 @@ def main():
     
     # Парсинг города
     start_time = time.time()
+    crawl_params, min_cluster_size = resolve_crawl_params(city_id, args)
+    journal = open_journal(args, f"bbox_{args.bbox}" if args.bbox else city_id, city_bbox,
+                           crawl_params, min_cluster_size)
     
-    scooters = fetch_city_scooters(
+    scooters = crawl_city_scooters(
+        client,
         city_bbox,
         city_id,
-        headers,
-        payment_methods,
-        min_cluster_size=args.min_cluster,
-        delay=args.delay,
-        with_full_info=args.with_full_info
+        min_cluster_size=min_cluster_size,
+        with_full_info=args.with_full_info,
+        sample_per_cell=args.sample_per_cell,
+        sample_cell_deg=args.sample_cell,
+        crawl_params=crawl_params,
+        enrich_workers=args.enrich_workers,
+        on_object=stream_callback(stream, city_id, args.with_full_info),
+        journal=journal,
+        area=area_from_args(args, None if args.bbox else city_id)
     )
     
+    if not args.no_autotune and not args.bbox:
+        update_city_params([city_id])
+    client.close()
+    if response_cache is not None:
+        print(f"💾 Кэш ответов: {response_cache.summary()}")
+    
     if not scooters:
         print("\n❌ Самокаты не найдены")
+        journal.remove()
+        metrics.write_summary()
+        finish_stream(stream, city_id=city_id, elapsed_seconds=round(time.time() - start_time, 1),
+                      scooters=0, clusters=0, cluster_scooters=0)
         sys.exit(0)
     
     # Сохранение результатов
@@ -865,9 +684,15 @@ def main():
     
     output_path = output_dir / output_filename
     
-    stats = save_geojson(scooters, output_path, city_id, full_info_mode=args.with_full_info)
+    profiler.start('save')
+    stats = save_geojson(scooters, output_path, city_id, full_info_mode=args.with_full_info,
+                         zone_index=zone_index)
+    profiler.stop()
+    journal.remove()
+    write_run_metrics(stats)
     
     elapsed = time.time() - start_time
+    finish_stream(stream, city_id=city_id, output=str(output_path), elapsed_seconds=round(elapsed, 1), **stats)
     
     print("\n" + "="*80)
     print("✅ ГОТОВО!")
@@ -888,4 +713,12 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except TokenExpiredError as e:
+        print(f"\n❌ {e}")
+        print("   Обновите токен в config.json и повторите команду - обход продолжится по журналу")
+        sys.exit(1)
+    except YandexParserError as e:
+        print(f"\n❌ {e}")
+        sys.exit(1)
@@ -16,128 +16,21 @@ import os
 import sys
 import argparse
 import time
-import csv
 from pathlib import Path
 from datetime import datetime
-import requests
 
-# Базовый URL API Yandex
-BASE_URL = "https://tc.mobile.yandex.net"
-
-
-def load_config():
-    """Загрузка заголовков из config.json."""
-    config_path = Path(__file__).parent / 'config.json'
-    
-    if not config_path.exists():
-        print("❌ Ошибка: файл config.json не найден!")
-        sys.exit(1)
-    
-    with open(config_path, 'r', encoding='utf-8') as f:
-        config = json.load(f)
-    
-    headers = config.get('yandex_headers')
-    
-    if not headers:
-        print("❌ Ошибка: заголовки не найдены в config.json!")
-        sys.exit(1)
-    
-    return headers
-
-
-def find_cities_by_name(city_name):
-    """
-    Ищет все зоны города по названию в cities_list.csv.
-    Возвращает список словарей с полями: id, name, country, bbox
-    """
-    cities_csv = Path(__file__).parent / 'cities_list.csv'
-    
-    if not cities_csv.exists():
-        print("❌ Ошибка: файл cities_list.csv не найден!")
-        print("Сначала запустите: python3 fetch_cities.py")
-        sys.exit(1)
-    
-    matching_cities = []
-    
-    with open(cities_csv, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row['name'].lower() == city_name.lower():
-                matching_cities.append({
-                    'id': row['id'],
-                    'name': row['name'],
-                    'country': row['country'],
-                    'bbox': [float(x) for x in row['bbox'].split(',')]
-                })
-    
-    if not matching_cities:
-        print(f"❌ Город '{city_name}' не найден в cities_list.csv")
-        print("\nДоступные города:")
-        
-        # Показать первые 10 городов для справки
-        with open(cities_csv, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            seen_names = set()
-            count = 0
-            for row in reader:
-                if row['name'] not in seen_names:
-                    print(f"  • {row['name']} ({row['country']})")
-                    seen_names.add(row['name'])
-                    count += 1
-                    if count >= 10:
-                        print("  ...")
-                        break
-        sys.exit(1)
-    
-    return matching_cities
-
-
-def calculate_polygon_bounds(coordinates):
-    """
-    Вычисление границ полигона (bbox).
-    
-    Args:
-        coordinates: массив координат полигона [[lon, lat], ...]
-    
-    Returns:
-        list: [min_lon, min_lat, max_lon, max_lat]
-    """
-    # Полигон может быть многоуровневым (с дырками)
-    # Берём первое кольцо (внешний контур)
-    if isinstance(coordinates[0][0], list):
-        # MultiPolygon или Polygon с дырками
-        ring = coordinates[0]
-    else:
-        ring = coordinates
-    
-    lons = [coord[0] for coord in ring]
-    lats = [coord[1] for coord in ring]
-    
-    return [min(lons), min(lats), max(lons), max(lats)]
-
-
-def calculate_polygon_centroid(coordinates):
-    """
-    Вычисление центроида полигона (упрощённый метод - среднее координат).
-    
-    Args:
-        coordinates: массив координат полигона [[lon, lat], ...]
-    
-    Returns:
-        list: [lon, lat]
-    """
-    # Берём первое кольцо (внешний контур)
-    if isinstance(coordinates[0][0], list):
-        ring = coordinates[0]
-    else:
-        ring = coordinates
-    
-    lons = [coord[0] for coord in ring]
-    lats = [coord[1] for coord in ring]
-    
-    # Простой центроид - среднее арифметическое
-    # Для более точного расчёта нужен weighted centroid, но для наших целей достаточно
-    return [sum(lons) / len(lons), sum(lats) / len(lats)]
+from yandex_parser.response_cache import ResponseCache
+from zone_merge import merge_city_zones
+from yandex_parser.metrics import registry as metrics
+from yandex_parser.profiling import profiler, add_profile_argument
+from yandex_parser.request_ledger import ledger, add_ledger_argument, DEFAULT_LEDGER_PATH
+from yandex_parser import YandexClient, YandexParserError, TokenExpiredError, find_cities_by_name
+from yandex_parser.geometry import collection_stats
+from yandex_parser.zone_plan import plan_zone_requests, split_zones_by_city
+from yandex_parser.zone_tiles import DEFAULT_TILE_ZOOM, DEFAULT_TILE_WORKERS, fetch_zones_tiled
+from yandex_parser import topojson
+from yandex_parser.simplify import DEFAULT_PRECISION, add_simplify_arguments, simplifier_from_args
+from yandex_parser.tokens import add_token_argument
 
 
 def simplify_zone_feature(feature, city_polygon_id):
@@ -203,7 +96,7 @@ def load_city_polygons(geojson_path):
     Загрузка полигонов городов из cities.geojson.
     
     Returns:
-        list of dict: [{id, geometry, bbox, centroid}, ...]
+        list of dict: [{id, geometry, bbox, centroid, area_m2}, ...]
     """
     if not geojson_path.exists():
         print(f"❌ Ошибка: файл {geojson_path} не найден!")
@@ -213,104 +106,51 @@ def load_city_polygons(geojson_path):
     with open(geojson_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
     
-    cities = []
-    
-    for feature in data.get('features', []):
-        polygon_id = feature.get('id')
-        geometry = feature.get('geometry')
-        
-        if not geometry or geometry.get('type') != 'Polygon':
-            continue
-        
-        coordinates = geometry.get('coordinates')
-        if not coordinates:
-            continue
-        
-        try:
-            bbox = calculate_polygon_bounds(coordinates)
-            centroid = calculate_polygon_centroid(coordinates)
-            
-            cities.append({
-                'id': polygon_id,
-                'geometry': geometry,
-                'bbox': bbox,  # [min_lon, min_lat, max_lon, max_lat]
-                'centroid': centroid  # [lon, lat]
-            })
-        except Exception as e:
-            print(f"⚠️  Пропущен полигон {polygon_id}: {e}")
-            continue
-    
-    return cities
+    # bbox, центроид и площадь - по всем кольцам Polygon/MultiPolygon
+    return [{
+        'id': feature.get('id'),
+        'geometry': feature['geometry'],
+        'bbox': stats['bbox'],  # [min_lon, min_lat, max_lon, max_lat]
+        'centroid': stats['centroid'],  # [lon, lat], взвешенный по площади
+        'area_m2': stats['area_m2']
+    } for feature, stats in collection_stats(data)]
 
 
-def fetch_city_zones(city_id, location, bbox, zoom=16.7, headers=None):
+def fetch_city_zones(client, city_id, location, bbox, zoom=16.7, tile_zoom=DEFAULT_TILE_ZOOM,
+                     tile_workers=DEFAULT_TILE_WORKERS):
     """
     Загрузка детальных зон для города.
     
+    Большой bbox загружается по тайлам сетки tile_zoom параллельно
+    (yandex_parser.zone_tiles), зоны с одинаковым id объединяются.
+    
     Args:
+        client: YandexClient
         city_id: str, ID полигона города
         location: list [lon, lat]
         bbox: list [min_lon, min_lat, max_lon, max_lat]
         zoom: float
-        headers: dict
+        tile_zoom: зум сетки тайлов или None - одним запросом
+        tile_workers: одновременных запросов тайлов
     
     Returns:
         dict с GeoJSON FeatureCollection или None при ошибке
-    """
-    endpoint = "/4.0/layers/v1/polygons"
-    url = f"{BASE_URL}{endpoint}"
-    
-    params = {
-        "mobcf": "russia%25go_ru_by_geo_hosts_2%25default",
-        "mobpr": "go_ru_by_geo_hosts_2_TAXI_V4_0"
-    }
-    
-    data = {
-        "state": {
-            "location": location,
-            "bbox": bbox,
-            "zoom": zoom,
-            "night_mode": False,  # КРИТИЧНО! Без этого может вернуть пустой ответ
-            "screen": "discovery",
-            "mode": "scooters",
-            "known_orders_info": [],
-            "multiclass_options": {"selected": False},
-            "scooters": {"autoselect": False},
-            "known_orders": []
-        },
-        "known_versions": {}
-    }
     
-    try:
-        response = requests.post(url, headers=headers, json=data, params=params, timeout=30)
-        
-        if response.status_code == 405:
-            print(f"      ❌ HTTP 405: JWT токен истёк!")
-            return None
-        elif response.status_code == 401:
-            print(f"      ❌ HTTP 401: Не авторизован")
-            return None
-        elif response.status_code == 403:
-            print(f"      ❌ HTTP 403: Доступ запрещен")
-            return None
-        
-        response.raise_for_status()
-        result = response.json()
-        
-        # Проверяем, что вернулся GeoJSON
-        if result.get('type') != 'FeatureCollection':
-            print(f"      ⚠️  Неожиданная структура ответа")
-            return None
-        
-        return result
-        
-    except requests.exceptions.RequestException as e:
-        print(f"      ❌ Ошибка запроса: {e}")
-        return None
+    Raises:
+        TokenExpiredError, AuthError: токен недействителен
+    """
+    ledger.set_context(city_id=city_id)
+    if tile_zoom is None:
+        return client.polygons(bbox, zoom, location)
+    return fetch_zones_tiled(client, bbox, zoom, location, tile_zoom=tile_zoom, max_workers=tile_workers,
+                             log=print)
 
 
-def save_city_zones(city_id, zones_data, output_dir):
-    """Сохранение зон города в отдельный файл с упрощением структуры."""
+def save_city_zones(city_id, zones_data, output_dir, simplifier=None):
+    """
+    Сохранение зон города в отдельный файл с упрощением структуры
+    (и геометрии, если передан GeometrySimplifier).
+    """
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # Упрощаем структуру всех зон
@@ -319,6 +159,9 @@ def save_city_zones(city_id, zones_data, output_dir):
         simplified = simplify_zone_feature(feature, city_id)
         simplified_features.append(simplified)
     
+    if simplifier is not None:
+        simplifier.features(simplified_features)
+    
     simplified_geojson = {
         'type': 'FeatureCollection',
         'features': simplified_features
@@ -335,93 +178,72 @@ def save_city_zones(city_id, zones_data, output_dir):
     return filepath
 
 
-def merge_all_city_zones(city_zones_dir, output_path):
+def merge_all_city_zones(city_zones_dir, output_path, simplifier=None, topojson_path=None, full=False):
     """
     Объединение всех файлов зон городов в один GeoJSON.
     
+    Разбираются только файлы, изменившиеся с прошлого объединения (манифест
+    zones.manifest.json, см. zone_merge.py); зоны остальных копируются из
+    прежнего zones.geojson.
+    
     Args:
         city_zones_dir: Path, директория с файлами городов
         output_path: Path, путь для сохранения объединённого файла
+        simplifier: GeometrySimplifier или None - упростить геометрию (файлы,
+                    сохранённые без упрощения или с меньшим допуском)
+        topojson_path: Path или None - дополнительно сохранить TopoJSON с общими дугами
+        full: True - полное объединение без манифеста
     
     Returns:
-        dict с статистикой: {cities_count, total_features, zone_types}
+        dict с статистикой: {cities_count, total_features, zone_types, duplicates, parsed, copied}
     """
     if not city_zones_dir.exists():
         print("⚠️  Директория с зонами городов не найдена")
         return None
     
-    # Собираем все GeoJSON файлы
-    geojson_files = list(city_zones_dir.glob('*.geojson'))
-    
-    if not geojson_files:
-        print("⚠️  Файлы с зонами не найдены")
-        return None
-    
     print()
     print("🔗 Объединяю все зоны в один файл...")
-    print(f"   Найдено файлов: {len(geojson_files)}")
-    
-    # Используем dict для дедупликации по id
-    unique_features = {}
-    zone_types_total = {}
-    cities_processed = 0
-    duplicates_found = 0
     
-    for geojson_file in geojson_files:
-        try:
-            with open(geojson_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            features = data.get('features', [])
-            cities_processed += 1
-            
-            for feature in features:
-                feature_id = feature.get('id')
-                
-                # Дедупликация: если зона уже есть, пропускаем
-                if feature_id in unique_features:
-                    duplicates_found += 1
-                    continue
-                
-                unique_features[feature_id] = feature
-                
-                # Подсчёт типов зон
-                zone_type = feature.get('properties', {}).get('type')
-                if zone_type:
-                    zone_types_total[zone_type] = zone_types_total.get(zone_type, 0) + 1
-            
-        except Exception as e:
-            print(f"   ⚠️  Ошибка при чтении {geojson_file.name}: {e}")
-            continue
-    
-    # Создаём объединённый GeoJSON из уникальных зон
-    all_features = list(unique_features.values())
-    merged_geojson = {
-        "type": "FeatureCollection",
-        "features": all_features
-    }
-    
-    # Сохраняем
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(merged_geojson, f, ensure_ascii=False, indent=2)
+    stats = merge_city_zones(city_zones_dir, output_path, simplifier, full=full)
+    if stats is None:
+        print("⚠️  Файлы с зонами не найдены")
+        return None
     
     file_size_mb = output_path.stat().st_size / 1024 / 1024
     
-    print(f"   ✅ Объединено городов: {cities_processed}")
-    print(f"   ✅ Всего зон: {len(all_features)}")
-    if duplicates_found > 0:
-        print(f"   🔄 Дубликатов удалено: {duplicates_found}")
+    print(f"   ✅ Объединено городов: {stats['cities_count']} "
+          f"(разобрано файлов: {stats['parsed']}, без изменений: {stats['copied']})")
+    print(f"   ✅ Всего зон: {stats['total_features']}")
+    if stats['duplicates'] > 0:
+        print(f"   🔄 Дубликатов удалено: {stats['duplicates']}")
     print(f"   📊 Типы зон:")
-    for zt, count in sorted(zone_types_total.items()):
+    for zt, count in sorted(stats['zone_types'].items()):
         print(f"      {zt}: {count}")
+    if simplifier is not None and simplifier.vertices_before:
+        print(f"   📉 Упрощение: {simplifier.summary()}")
     print(f"   💾 Размер файла: {file_size_mb:.1f} MB")
     print(f"   📁 Сохранено: {output_path}")
     
-    return {
-        'cities_count': cities_processed,
-        'total_features': len(all_features),
-        'zone_types': zone_types_total
-    }
+    if topojson_path is not None:
+        with open(output_path, 'r', encoding='utf-8') as f:
+            all_features = json.load(f)['features']
+        save_topojson(all_features, topojson_path, simplifier.precision if simplifier else DEFAULT_PRECISION)
+    
+    return stats
+
+
+def save_topojson(features, topojson_path, precision):
+    """Сохранение зон в TopoJSON (общие границы - одна дуга) с отчётом о размере."""
+    topology = topojson.encode(features, precision=precision)
+    with open(topojson_path, 'w', encoding='utf-8') as f:
+        json.dump(topology, f, ensure_ascii=False, separators=(',', ':'))
+    
+    geojson_size = len(json.dumps({'type': 'FeatureCollection', 'features': features},
+                                  ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    topojson_size = topojson_path.stat().st_size
+    print(f"   🧩 TopoJSON: {len(topology['arcs']):,} дуг, {topojson_size / 1024 / 1024:.1f} MB "
+          f"(компактный GeoJSON - {geojson_size / 1024 / 1024:.1f} MB, в {geojson_size / topojson_size:.1f} раза больше)")
+    print(f"   📁 Сохранено: {topojson_path}")
 
 
 def parse_arguments():
@@ -449,6 +271,35 @@ def parse_arguments():
     parser.add_argument('--delay', type=float, default=0.15,
                        help='Задержка между запросами в секундах (по умолчанию: 0.15)')
     
+    parser.add_argument('--tile-zoom', type=int, default=DEFAULT_TILE_ZOOM, metavar='Z',
+                       help='Большие bbox загружать по тайлам сетки Z параллельно '
+                            f'(по умолчанию: {DEFAULT_TILE_ZOOM}, ~10 км на широте 55-60°)')
+    
+    parser.add_argument('--tile-workers', type=int, default=DEFAULT_TILE_WORKERS, metavar='N',
+                       help=f'Одновременных запросов тайлов (по умолчанию: {DEFAULT_TILE_WORKERS})')
+    
+    parser.add_argument('--no-tiles', action='store_true',
+                       help='Загружать bbox города одним запросом, без тайлов')
+    
+    parser.add_argument('--response-cache', action='store_true',
+                       help='Кэшировать ответы /layers/v1/polygons на диске (output/cache/responses, TTL 6 ч)')
+    
+    parser.add_argument('--metrics-dir', type=str,
+                       help='Каталог для метрик: fetch_zones.prom и fetch_zones_summary.json')
+    
+    parser.add_argument('--full-merge', action='store_true',
+                       help='Объединить zones.geojson заново из всех файлов городов, '
+                            'не используя манифест (zones.manifest.json)')
+    
+    parser.add_argument('--topojson', action='store_true',
+                       help='Дополнительно сохранить output/zones.topojson: общие границы зон '
+                            'хранятся один раз (чтение - yandex_parser.topojson.decode)')
+    
+    add_simplify_arguments(parser)
+    add_profile_argument(parser)
+    add_ledger_argument(parser)
+    add_token_argument(parser)
+    
     return parser.parse_args()
 
 
@@ -458,14 +309,25 @@ def main():
     print("🚀 Загрузка детальных зон для всех городов")
     print("="*80)
     
-    # Загрузка конфигурации
-    headers = load_config()
+    # Кэш ответов API и метрики
+    response_cache = ResponseCache() if args.response_cache else None
+    client = YandexClient.from_config(delay=args.delay, response_cache=response_cache,
+                                      token_wait=args.token_wait * 60)
+    metrics.configure(args.metrics_dir, 'fetch_zones')
+    profiler.configure(args.profile, 'fetch_zones')
+    ledger.configure(None if args.no_ledger else DEFAULT_LEDGER_PATH, script='fetch_zones')
     
     # Пути к файлам
     base_dir = Path(__file__).parent
     cities_geojson = base_dir / 'output' / 'cities.geojson'
     output_dir = base_dir / 'output' / 'city_zones'
     
+    # Упрощение полигонов и округление координат при сохранении
+    simplifier = simplifier_from_args(args)
+    
+    # Сетка тайлов для больших bbox
+    tile_zoom = None if args.no_tiles else args.tile_zoom
+    
     # Если указан --city, обрабатываем только этот город
     if args.city:
         city_zones = find_cities_by_name(args.city)
@@ -476,45 +338,75 @@ def main():
         print()
         
         # Обработка всех зон города
+        profiler.start('zones')
         total_zones = 0
-        for idx, zone in enumerate(city_zones, 1):
-            if len(city_zones) > 1:
-                print(f"\n{'=' * 80}")
-                print(f"📍 Зона {idx}/{len(city_zones)}: {zone['id']}")
-                print(f"{'=' * 80}")
-            
-            bbox = zone['bbox']
-            location = [(bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2]
+        idx = 0
+        
+        # Перекрывающиеся зоны города - одним запросом
+        plan = plan_zone_requests(city_zones)
+        if len(plan) < len(city_zones):
+            print(f"🧩 Перекрывающиеся bbox объединены: {len(plan)} запросов вместо {len(city_zones)}")
+        
+        for group in plan:
+            bbox = group['bbox']
+            location = group['location']
             
+            print(f"\n📡 Запрос зон: {', '.join(zone['id'] for zone in group['cities'])}")
             print(f"   📍 Bbox: {bbox}")
             print(f"   📍 Center: {location}")
             
             # Загрузка зон
-            zones = fetch_city_zones(zone['id'], location, bbox, args.zoom, headers)
-            
-            if zones:
-                # Сохранение
-                output_path = save_city_zones(zone['id'], zones, output_dir)
-                print(f"   ✅ Сохранено {len(zones)} зон → {output_path.name}")
-                total_zones += len(zones)
-            else:
-                print(f"   ⚠️  Зоны не найдены")
+            zones = fetch_city_zones(client, group['cities'][0]['id'], location, bbox, args.zoom,
+                                     tile_zoom, args.tile_workers)
+            per_city = split_zones_by_city(zones, group['cities']) if zones else {}
             
-            # Задержка между запросами
-            if idx < len(city_zones):
-                time.sleep(args.delay)
+            for zone in group['cities']:
+                idx += 1
+                if len(city_zones) > 1:
+                    print(f"\n{'=' * 80}")
+                    print(f"📍 Зона {idx}/{len(city_zones)}: {zone['id']}")
+                    print(f"{'=' * 80}")
+                
+                city_zones_data = per_city.get(zone['id'])
+                if city_zones_data and city_zones_data['features']:
+                    # Сохранение
+                    features_count = len(city_zones_data['features'])
+                    output_path = save_city_zones(zone['id'], city_zones_data, output_dir, simplifier)
+                    print(f"   ✅ Сохранено {features_count} зон → {output_path.name}")
+                    total_zones += features_count
+                else:
+                    print(f"   ⚠️  Зоны не найдены")
+        
+        client.close()
+        
+        # Обновление zones.geojson: разбираются только изменённые файлы городов
+        if total_zones > 0:
+            merged_file = base_dir / 'output' / 'zones.geojson'
+            profiler.start('merge')
+            with metrics.stage('merge'):
+                merge_all_city_zones(output_dir, merged_file, simplifier_from_args(args),
+                                     merged_file.with_suffix('.topojson') if args.topojson else None,
+                                     full=args.full_merge)
+            profiler.stop()
+        
+        metrics.set_gauge('zones_found', total_zones)
+        metrics.write_summary()
+        profiler.finish()
         
         print(f"\n{'=' * 80}")
         print(f"✅ Город '{args.city}' обработан!")
         print(f"   • Обработано зон города: {len(city_zones)}")
         print(f"   • Найдено зон API: {total_zones}")
+        print(f"   • Упрощение: {simplifier.summary()}")
         print(f"{'=' * 80}")
         
         return
     
     # Загрузка городов
     print(f"📥 Загружаю список городов из {cities_geojson.name}...")
+    profiler.start('load_cities')
     cities = load_city_polygons(cities_geojson)
+    profiler.stop()
     print(f"✅ Найдено городов: {len(cities)}")
     print()
     
@@ -535,6 +427,8 @@ def main():
     print(f"📊 Параметры:")
     print(f"   Городов для обработки: {len(cities_to_process)}")
     print(f"   Zoom: {args.zoom}")
+    if tile_zoom is not None:
+        print(f"   Тайлы: z{tile_zoom}, потоков: {args.tile_workers}")
     print(f"   Задержка между запросами: {args.delay}с")
     print()
     
@@ -546,81 +440,104 @@ def main():
     total_zones = 0
     
     start_time = time.time()
+    profiler.start('zones')
     
     print("="*80)
     print()
     
+    # Города с перекрывающимися bbox - одним запросом
+    plan = plan_zone_requests(cities_to_process)
+    if len(plan) < total_cities:
+        print(f"🧩 Перекрывающиеся bbox объединены: {len(plan)} запросов вместо {total_cities}")
+        print()
+    
     # Обработка городов
-    for idx, city in enumerate(cities_to_process, start=1):
-        city_id = city['id']
-        bbox = city['bbox']
-        location = city['centroid']
-        
-        # Глобальный индекс (если используется --continue_from)
-        global_idx = cities.index(city) + 1
+    idx = 0
+    for group in plan:
+        group_cities = group['cities']
+        bbox = group['bbox']
+        location = group['location']
         
-        print(f"[{idx}/{total_cities}] Город #{global_idx}: {city_id}")
-        print(f"   📍 Bbox: {bbox}")
-        print(f"   📍 Center: {location}")
+        if len(group_cities) > 1:
+            print(f"📡 Общий запрос для {len(group_cities)} городов: {', '.join(c['id'] for c in group_cities)}")
+            print(f"   📍 Bbox: {bbox}")
+            print(f"   📍 Center: {location}")
+            print()
         
         # Загрузка зон
-        zones = fetch_city_zones(city_id, location, bbox, args.zoom, headers)
+        try:
+            zones = fetch_city_zones(client, group_cities[0]['id'], location, bbox, args.zoom,
+                                     tile_zoom, args.tile_workers)
+        except TokenExpiredError as e:
+            # При HTTP 405 останавливаемся
+            print(f"   ❌ {e}")
+            failed += len(group_cities)
+            print()
+            print("⚠️  Истёк JWT токен. Остановка.")
+            print(f"   Для продолжения обновите токен и используйте:")
+            print(f"   python3 fetch_zones.py --continue_from {min(cities.index(c) for c in group_cities) + 1}")
+            break
+        
+        per_city = split_zones_by_city(zones, group_cities) if zones is not None else {}
         
-        if zones is None:
-            print(f"   ❌ Не удалось загрузить зоны")
-            failed += 1
+        for city in group_cities:
+            idx += 1
+            city_id = city['id']
             
-            # При HTTP 405 останавливаемся
-            if failed > 0 and idx > 1:
+            # Глобальный индекс (если используется --continue_from)
+            global_idx = cities.index(city) + 1
+            
+            print(f"[{idx}/{total_cities}] Город #{global_idx}: {city_id}")
+            print(f"   📍 Bbox: {city['bbox']}")
+            print(f"   📍 Center: {city['centroid']}")
+            
+            if zones is None:
+                print(f"   ❌ Не удалось загрузить зоны")
+                failed += 1
                 print()
-                print("⚠️  Возможно истёк JWT токен. Остановка.")
-                print(f"   Для продолжения обновите токен и используйте:")
-                print(f"   python3 fetch_zones.py --continue_from {global_idx}")
-                break
+                continue
             
-            time.sleep(args.delay)
-            continue
-        
-        features_count = len(zones.get('features', []))
-        
-        if features_count == 0:
-            print(f"   ⚠️  Зоны не найдены (0 полигонов)")
-            empty += 1
-        else:
-            # Подсчёт типов зон (безопасный вариант)
-            zone_types = {}
-            for feature in zones.get('features', []):
-                options = feature.get('properties', {}).get('options', [])
-                zone_type = None
-                for opt in options:
-                    for action in opt.get('actions', []):
-                        zone_type = action.get('zone_type')
+            city_zones = per_city[city_id]
+            features_count = len(city_zones.get('features', []))
+            
+            if features_count == 0:
+                print(f"   ⚠️  Зоны не найдены (0 полигонов)")
+                empty += 1
+            else:
+                # Подсчёт типов зон (безопасный вариант)
+                zone_types = {}
+                for feature in city_zones.get('features', []):
+                    options = feature.get('properties', {}).get('options', [])
+                    zone_type = None
+                    for opt in options:
+                        for action in opt.get('actions', []):
+                            zone_type = action.get('zone_type')
+                            if zone_type:
+                                break
                         if zone_type:
                             break
                     if zone_type:
-                        break
-                if zone_type:
-                    zone_types[zone_type] = zone_types.get(zone_type, 0) + 1
-            
-            zone_summary = ', '.join([f"{zt}: {cnt}" for zt, cnt in zone_types.items()]) if zone_types else 'границы'
-            
-            print(f"   ✅ Загружено зон: {features_count} ({zone_summary})")
-            
-            # Сохранение
-            filepath = save_city_zones(city_id, zones, output_dir)
-            print(f"   💾 Сохранено: {filepath.name}")
+                        zone_types[zone_type] = zone_types.get(zone_type, 0) + 1
+                
+                zone_summary = ', '.join([f"{zt}: {cnt}" for zt, cnt in zone_types.items()]) if zone_types else 'границы'
+                
+                print(f"   ✅ Загружено зон: {features_count} ({zone_summary})")
+                
+                # Сохранение
+                filepath = save_city_zones(city_id, city_zones, output_dir, simplifier)
+                print(f"   💾 Сохранено: {filepath.name}")
+                
+                successful += 1
+                total_zones += features_count
             
-            successful += 1
-            total_zones += features_count
-        
-        print()
-        
-        # Задержка между запросами
-        if idx < total_cities:
-            time.sleep(args.delay)
+            print()
+    
+    client.close()
     
     # Итоговая статистика
     elapsed_time = time.time() - start_time
+    metrics.record_stage('zones', elapsed_time)
+    profiler.stop()
     minutes = int(elapsed_time // 60)
     seconds = int(elapsed_time % 60)
     
@@ -633,13 +550,29 @@ def main():
     print(f"   ❌ Ошибки: {failed}")
     print(f"   📍 Всего зон загружено: {total_zones}")
     print(f"   ⏱️  Время выполнения: {minutes}м {seconds}с")
+    print(f"   📉 Упрощение: {simplifier.summary()}")
+    if response_cache is not None:
+        print(f"   💾 Кэш ответов: {response_cache.summary()}")
     print()
     print(f"📁 Отдельные файлы сохранены в: {output_dir}")
     
     # Объединение всех файлов в один
     if successful > 0:
         merged_file = base_dir / 'output' / 'zones.geojson'
-        merge_all_city_zones(output_dir, merged_file)
+        profiler.start('merge')
+        with metrics.stage('merge'):
+            merge_all_city_zones(output_dir, merged_file, simplifier_from_args(args),
+                                 merged_file.with_suffix('.topojson') if args.topojson else None,
+                                 full=args.full_merge)
+        profiler.stop()
+    
+    metrics.set_gauge('zones_found', total_zones)
+    summary_path = metrics.write_summary()
+    if summary_path:
+        print(f"📈 Метрики: {summary_path}")
+    profile_report = profiler.finish()
+    if profile_report:
+        print(f"🔬 Профиль: {profile_report}")
     
     print()
     print("="*80)
@@ -647,4 +580,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except YandexParserError as e:
+        print(f"\n❌ {e}")
+        sys.exit(1)
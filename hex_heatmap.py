@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Тепловые карты парка самокатов по шестиугольной сетке из одного или многих снимков.
+
+Каждый файл самокатов - снимок на момент metadata.generated_at. Самокаты
+раскладываются по ячейкам самого мелкого уровня один раз, крупные уровни
+сворачиваются из него (yandex_parser.hexgrid). Для каждой ячейки: среднее
+и максимум самокатов за интервал, доля интервалов с самокатами (из
+интервалов со снимками городов ячейки), средний
+заряд (файлы --with-full-info), ряд по времени.
+
+Использование:
+    python3 hex_heatmap.py                      # все снимки output/city_scooters и scooters_full_info*
+    python3 hex_heatmap.py output/city_scooters/минск_*.geojson --levels 5 --bucket 30
+    python3 hex_heatmap.py --cell-size 50 -o output/heatmap_50m
+
+Результат: output/heatmap/hex_{уровень}.geojson и hex_series.csv (уровень,
+ячейка, интервал, самокаты, заряд) для ноутбуков.
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from yandex_parser.hexgrid import (
+    DEFAULT_BUCKET_S, DEFAULT_CELL_SIZE_M, DEFAULT_LEVELS, HexAggregator, HexGrid, cell_id, latest_per_bucket
+)
+from yandex_parser.snapshot import OUTPUT_DIR, scooter_paths
+
+
+def load_snapshots(paths):
+    """(city_id, timestamp, features) для каждого файла самокатов."""
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        metadata = data.get('metadata') or {}
+        generated_at = metadata.get('generated_at')
+        timestamp = datetime.fromisoformat(generated_at).timestamp() if generated_at else path.stat().st_mtime
+        yield metadata.get('city_id') or path.stem, timestamp, data.get('features', [])
+
+
+def write_series_csv(path, levels):
+    """Длинная таблица: уровень, ячейка, начало интервала, самокаты, кластеры, средний заряд."""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['level', 'cell', 'bucket', 'scooters', 'cluster_scooters', 'mean_charge'])
+        for level, cells in enumerate(levels):
+            for cell in sorted(cells):
+                for bucket in sorted(cells[cell]):
+                    scooters, charge_sum, charge_count, cluster_scooters = cells[cell][bucket]
+                    writer.writerow([level, cell_id(level, cell), datetime.fromtimestamp(bucket).isoformat(),
+                                     scooters, cluster_scooters,
+                                     round(charge_sum / charge_count, 1) if charge_count else ''])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Тепловые карты самокатов по шестиугольной сетке')
+    parser.add_argument('inputs', nargs='*', metavar='PATH',
+                        help='Файлы самокатов (по умолчанию: output/city_scooters/*.geojson и '
+                             'output/scooters_full_info*.geojson)')
+    parser.add_argument('-o', '--output-dir', type=str, default=str(OUTPUT_DIR / 'heatmap'),
+                        help='Каталог результатов (по умолчанию: output/heatmap)')
+    parser.add_argument('--cell-size', type=float, default=DEFAULT_CELL_SIZE_M,
+                        help='Радиус ячейки уровня 0, метров Web Mercator '
+                             f'(по умолчанию: {DEFAULT_CELL_SIZE_M}, ~57 м на широте 55°)')
+    parser.add_argument('--levels', type=int, default=DEFAULT_LEVELS,
+                        help=f'Уровней сетки, площадь ×7 на уровень (по умолчанию: {DEFAULT_LEVELS})')
+    parser.add_argument('--bucket', type=float, default=DEFAULT_BUCKET_S / 60,
+                        help=f'Интервал времени, минут (по умолчанию: {DEFAULT_BUCKET_S // 60})')
+    parser.add_argument('--no-csv', action='store_true', help='Не писать hex_series.csv')
+    args = parser.parse_args()
+
+    paths = [Path(path) for path in args.inputs] if args.inputs else scooter_paths(OUTPUT_DIR)
+    if not paths:
+        print("❌ Ошибка: нет файлов самокатов")
+        print("   Сначала запустите: python3 fetch_scooters.py")
+        sys.exit(1)
+
+    print("🔥 Тепловые карты по шестиугольной сетке")
+    print("=" * 80)
+
+    bucket_s = int(args.bucket * 60)
+    snapshots = latest_per_bucket(load_snapshots(paths), bucket_s)
+    print(f"   📂 Файлов: {len(paths)}, снимков после отбора (город × интервал): {len(snapshots)}")
+
+    # Один проход по точкам - уровень 0
+    start = time.time()
+    aggregator = HexAggregator(HexGrid(args.cell_size), bucket_s)
+    for city_id, timestamp, features in snapshots:
+        aggregator.add_snapshot(features, timestamp, city_id)
+    binned = time.time() - start
+
+    # Крупные уровни - свёртка ячеек
+    start = time.time()
+    levels = aggregator.levels(args.levels)
+    rolled = time.time() - start
+    print(f"   🛴 Самокатов: {aggregator.points:,}, интервалов: {len(aggregator.buckets)}")
+    print(f"   ⏱️  Раскладка: {binned:.2f}с, свёртка {args.levels - 1} уровней: {rolled:.3f}с")
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for level, cells in enumerate(levels):
+        geojson = aggregator.to_geojson(level, cells)
+        path = output_dir / f'hex_{level}.geojson'
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(geojson, f, ensure_ascii=False, separators=(',', ':'))
+        print(f"   💾 Уровень {level} (радиус {geojson['metadata']['cell_size_m']:,.0f} м): "
+              f"{len(cells):,} ячеек → {path.name}")
+
+    if not args.no_csv:
+        csv_path = output_dir / 'hex_series.csv'
+        write_series_csv(csv_path, levels)
+        print(f"   📈 Ряды по времени → {csv_path.name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Локальный сервис пространственных запросов к последнему снимку обхода.
+
+Самокаты, парковки и зоны загружаются в память (yandex_parser.snapshot) один
+раз, запросы отвечают из индексов без чтения GeoJSON. Фоновый поток следит
+за output/ и, когда появляется новый результат fetch_scooters (или меняются
+парковки и зоны), строит новый снимок и подменяет его целиком - запросы
+в это время обслуживает прежний.
+
+Использование:
+    python3 query_server.py                       # http://127.0.0.1:8765
+    python3 query_server.py --socket /tmp/yandex_parser.sock
+
+Запросы (GET, ответ JSON):
+    /bbox?bbox=27.5,53.9,27.6,54.0&layer=scooters&limit=1000
+    /radius?lon=27.56&lat=53.90&r=300&layer=parkings
+    /nearest?lon=27.56&lat=53.90&k=5
+    /zone?lon=27.56&lat=53.90
+    /status
+
+    curl --unix-socket /tmp/yandex_parser.sock 'http://localhost/nearest?lon=27.56&lat=53.90'
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from urllib.parse import parse_qs, urlparse
+
+from yandex_parser.snapshot import OUTPUT_DIR, Snapshot, snapshot_signature
+
+DEFAULT_PORT = 8765
+
+# Период проверки output/ на новые файлы, секунд
+DEFAULT_WATCH_INTERVAL = 2.0
+
+# Объектов в ответе bbox/radius по умолчанию
+DEFAULT_LIMIT = 1000
+
+
+class SnapshotHolder:
+    """Текущий снимок и фоновая подмена при изменении файлов output/."""
+
+    def __init__(self, output_dir=OUTPUT_DIR, interval=DEFAULT_WATCH_INTERVAL):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.snapshot = Snapshot.load(output_dir)
+        self.swaps = 0
+        self._stop = threading.Event()
+
+    def reload_if_changed(self):
+        """Новый снимок, если подпись файлов изменилась; True - снимок подменён."""
+        if snapshot_signature(self.output_dir) == self.snapshot.signature:
+            return False
+        snapshot = Snapshot.load(self.output_dir)
+        # Подмена одной ссылкой: запросы берут снимок один раз и дорабатывают на прежнем
+        self.snapshot = snapshot
+        self.swaps += 1
+        return True
+
+    def watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if self.reload_if_changed():
+                    status = self.snapshot.status()
+                    print(f"🔄 Новый снимок: {status['scooters']:,} самокатов, {status['parkings']:,} парковок, "
+                          f"{status['zones']:,} зон ({status['build_seconds']:.2f}с)")
+            except (OSError, ValueError) as e:
+                # Файл ещё дописывается - попробуем на следующей проверке
+                print(f"⚠️  Снимок не обновлён: {e}")
+
+    def start(self):
+        threading.Thread(target=self.watch, name='snapshot-watch', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def _float(query, name, default=None):
+    if name not in query:
+        if default is None:
+            raise ValueError(f"Нужен параметр {name}")
+        return default
+    return float(query[name][0])
+
+
+def _int(query, name, default):
+    return int(query[name][0]) if name in query else default
+
+
+def _with_distance(feature, distance):
+    return {**feature, 'properties': {**(feature.get('properties') or {}), 'distance_m': round(distance, 1)}}
+
+
+def handle_query(snapshot, path, query):
+    """Ответ на запрос path с параметрами query (parse_qs); ValueError - неверные параметры."""
+    if path == '/status':
+        return snapshot.status()
+    if path == '/zone':
+        lon, lat = _float(query, 'lon'), _float(query, 'lat')
+        return {'lon': lon, 'lat': lat, **snapshot.zones.lookup(lon, lat), 'zones_detail': snapshot.zones.query(lon, lat)}
+
+    index = snapshot.layer(query.get('layer', ['scooters'])[0])
+    if path == '/bbox':
+        bbox = [float(value) for value in query.get('bbox', [''])[0].split(',') if value]
+        if len(bbox) != 4:
+            raise ValueError("bbox: min_lon,min_lat,max_lon,max_lat")
+        features = index.bbox(bbox, limit=_int(query, 'limit', DEFAULT_LIMIT))
+    elif path == '/radius':
+        found = index.radius(_float(query, 'lon'), _float(query, 'lat'), _float(query, 'r'),
+                             limit=_int(query, 'limit', DEFAULT_LIMIT))
+        features = [_with_distance(feature, distance) for distance, feature in found]
+    elif path == '/nearest':
+        max_distance = _float(query, 'max_distance', 0.0) or None
+        found = index.nearest(_float(query, 'lon'), _float(query, 'lat'), k=_int(query, 'k', 1),
+                              max_distance_m=max_distance)
+        features = [_with_distance(feature, distance) for distance, feature in found]
+    else:
+        return None
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def make_handler(holder, verbose=False):
+    class QueryHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            snapshot = holder.snapshot
+            start = time.perf_counter()
+            try:
+                result = handle_query(snapshot, url.path, parse_qs(url.query))
+            except ValueError as e:
+                return self._send(400, {'error': str(e)})
+            if result is None:
+                return self._send(404, {'error': f"Неизвестный запрос: {url.path}"})
+            result['took_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            self._send(200, result)
+
+        def _send(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            if verbose:
+                super().log_message(format, *args)
+
+    return QueryHandler
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    """HTTP поверх Unix-сокета (для BaseHTTPRequestHandler адрес клиента - заглушка)."""
+
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ('unix', 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Локальный сервис пространственных запросов к снимку обхода')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Адрес (по умолчанию: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Порт (по умолчанию: {DEFAULT_PORT})')
+    parser.add_argument('--socket', type=str, metavar='PATH', help='Unix-сокет вместо TCP')
+    parser.add_argument('--output-dir', type=str, default=str(OUTPUT_DIR),
+                        help='Каталог результатов (по умолчанию: output)')
+    parser.add_argument('--interval', type=float, default=DEFAULT_WATCH_INTERVAL,
+                        help=f'Проверка новых файлов, секунд (по умолчанию: {DEFAULT_WATCH_INTERVAL})')
+    parser.add_argument('--verbose', action='store_true', help='Логировать каждый запрос')
+    args = parser.parse_args()
+
+    print("🛰️  Сервис пространственных запросов")
+    print("=" * 80)
+    holder = SnapshotHolder(args.output_dir, args.interval)
+    status = holder.snapshot.status()
+    print(f"   🛴 Самокатов: {status['scooters']:,} (файлов: {len(status['scooter_files'])})")
+    print(f"   🅿️  Парковок: {status['parkings']:,}")
+    print(f"   🗺️  Зон ограничений: {status['zones']:,}")
+    print(f"   ⏱️  Индексы построены за {status['build_seconds']:.2f}с")
+    holder.start()
+
+    handler = make_handler(holder, args.verbose)
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        server = UnixHTTPServer(args.socket, handler)
+        print(f"   📡 unix:{args.socket}")
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), handler)
+        print(f"   📡 http://{args.host}:{args.port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️  Остановка")
+    finally:
+        holder.stop()
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == '__main__':
+    main()
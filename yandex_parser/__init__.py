@@ -0,0 +1,55 @@
+"""
+Библиотека парсинга Yandex Go для встраивания в долгоживущие сервисы.
+
+    from yandex_parser import YandexClient, crawl_city_scooters, find_cities_by_name
+
+    with YandexClient.from_config(delay=0.1) as client:
+        for zone in find_cities_by_name('Минск'):
+            scooters = crawl_city_scooters(client, zone['bbox'], zone['id'])
+
+CLI-скрипты (fetch_scooters.py, fetch_parkings.py, fetch_zones.py) - тонкие
+обёртки над этим пакетом.
+"""
+
+from .errors import (
+    YandexParserError, ConfigError, DataNotFoundError, ApiError, TokenExpiredError, AuthError
+)
+from .config import load_config
+from .client import YandexClient, RateLimiter, BASE_URL
+from .response_cache import ResponseCache
+from .full_info_cache import FullInfoCache, CityMetadataCache
+from .tokens import TokenManager, decode_jwt_payload, token_expires_at
+from .cities import find_cities_by_name, load_city_polygon, load_city_zones
+from .parsing import (
+    get_polygon_bbox, extract_full_info_from_offer, extract_points_from_response,
+    extract_detailed_objects, extract_parkings_only, simple_cluster_points, shrink_bbox_around_point
+)
+from .crawl import crawl_city_metadata, crawl_city_scooters, crawl_city_parkings
+from .journal import CrawlJournal
+from .geometry import (
+    PreparedGeometry, load_area, load_city_area, polygons_of, geometry_bounds, geometry_stats, collection_stats
+)
+from .zone_index import ZoneIndex, load_zone_index
+from .zone_plan import plan_zone_requests, split_zones_by_city
+from .zone_tiles import fetch_zones_tiled, tiles_for_bbox, tile_bbox
+from .point_index import PointIndex
+from .snapshot import Snapshot
+from .hexgrid import HexGrid, HexAggregator
+from .scheduler import FairScheduler
+from .batch import crawl_zones_batch
+
+__all__ = [
+    'YandexParserError', 'ConfigError', 'DataNotFoundError', 'ApiError', 'TokenExpiredError', 'AuthError',
+    'YandexClient', 'RateLimiter', 'load_config', 'BASE_URL',
+    'ResponseCache', 'FullInfoCache', 'CityMetadataCache',
+    'TokenManager', 'decode_jwt_payload', 'token_expires_at',
+    'find_cities_by_name', 'load_city_polygon', 'load_city_zones',
+    'get_polygon_bbox', 'extract_full_info_from_offer', 'extract_points_from_response',
+    'extract_detailed_objects', 'extract_parkings_only', 'simple_cluster_points', 'shrink_bbox_around_point',
+    'crawl_city_metadata', 'crawl_city_scooters', 'crawl_city_parkings', 'CrawlJournal',
+    'PreparedGeometry', 'load_area', 'load_city_area', 'polygons_of', 'geometry_bounds', 'geometry_stats',
+    'collection_stats', 'ZoneIndex', 'load_zone_index', 'plan_zone_requests', 'split_zones_by_city',
+    'fetch_zones_tiled', 'tiles_for_bbox', 'tile_bbox', 'PointIndex', 'Snapshot',
+    'HexGrid', 'HexAggregator',
+    'FairScheduler', 'crawl_zones_batch',
+]
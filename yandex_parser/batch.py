@@ -0,0 +1,79 @@
+"""
+Пакетный обход многих городов на общем бюджете запросов.
+
+Зоны городов обходятся потоками-координаторами (не больше max_cities
+одновременно), а все запросы обхода - обзор, горячие зоны, раскрытие
+кластеров и /offers/create - выполняет один FairScheduler: max_workers
+одновременных запросов, общий RateLimiter клиента и круговая очерёдность
+городов. Координатор только разбирает ответы и ждёт пул, поэтому время
+снимка страны определяется самым большим городом, а не суммой по всем.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+from .client import YandexClient
+from .crawl import crawl_city_scooters
+from .scheduler import FairScheduler
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.time()
+    result = fn(*args, **kwargs)
+    return result, time.time() - start
+
+
+def crawl_zones_batch(client: YandexClient, zones: List[dict], max_workers: int = 8,
+                      max_cities: Optional[int] = None,
+                      zone_kwargs: Optional[Callable[[dict], dict]] = None,
+                      on_zone_done: Optional[Callable[[dict, dict, float], None]] = None) -> Dict[str, dict]:
+    """
+    Параллельный обход зон (результат find_cities_by_name / load_city_zones).
+
+    Args:
+        client: YandexClient (общий для всех потоков)
+        zones: list dict с полями id, bbox
+        max_workers: одновременных запросов к API
+        max_cities: зон в обходе одновременно (по умолчанию 2 * max_workers);
+                   остальные ждут свободного координатора
+        zone_kwargs: callable(zone) -> dict дополнительных аргументов crawl_city_scooters
+                    (min_cluster_size, crawl_params, with_full_info, ...)
+        on_zone_done: callable(zone, scooters, seconds), вызывается в вызывающем
+                     потоке по мере завершения зон
+
+    Returns:
+        dict zone_id -> результат crawl_city_scooters
+
+    Raises:
+        TokenExpiredError, AuthError: оставшиеся запросы отменяются
+    """
+    results = {}
+    if not zones:
+        return results
+
+    scheduler = FairScheduler(max_workers)
+    max_cities = max_cities or 2 * max_workers
+    coordinators = ThreadPoolExecutor(max_workers=min(len(zones), max_cities), thread_name_prefix='city')
+    futures = {}
+    try:
+        for zone in zones:
+            kwargs = zone_kwargs(zone) if zone_kwargs else {}
+            future = coordinators.submit(_timed, crawl_city_scooters, client, zone['bbox'], zone['id'],
+                                         scheduler=scheduler, verbose=False, **kwargs)
+            futures[future] = zone
+
+        for future in as_completed(futures):
+            zone = futures[future]
+            scooters, seconds = future.result()
+            results[zone['id']] = scooters
+            if on_zone_done:
+                on_zone_done(zone, scooters, seconds)
+    except BaseException:
+        scheduler.shutdown(cancel_pending=True)
+        coordinators.shutdown(wait=False, cancel_futures=True)
+        raise
+
+    scheduler.shutdown()
+    coordinators.shutdown()
+    return results
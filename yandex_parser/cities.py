@@ -0,0 +1,112 @@
+"""
+Справочники городов: cities_list.csv (названия и bbox зон) и
+output/cities.geojson (полигоны, результат fetch_cities.py).
+"""
+
+import csv
+import json
+from pathlib import Path
+
+from .errors import DataNotFoundError
+
+from .paths import ROOT_DIR, OUTPUT_DIR
+
+CITIES_CSV_PATH = ROOT_DIR / 'cities_list.csv'
+CITIES_GEOJSON_PATH = OUTPUT_DIR / 'cities.geojson'
+
+
+def find_cities_by_name(city_name, cities_csv=CITIES_CSV_PATH):
+    """
+    Ищет все зоны города по названию в cities_list.csv.
+    Возвращает список словарей с полями: id, name, country, bbox
+
+    Raises:
+        DataNotFoundError: нет cities_list.csv или города в нём
+    """
+    cities_csv = Path(cities_csv)
+
+    if not cities_csv.exists():
+        raise DataNotFoundError("Ошибка: файл cities_list.csv не найден!\n"
+                                "Сначала запустите: python3 fetch_cities.py")
+
+    matching_cities = []
+    seen_names = []
+
+    with open(cities_csv, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            if row['name'].lower() == city_name.lower():
+                matching_cities.append({
+                    'id': row['id'],
+                    'name': row['name'],
+                    'country': row['country'],
+                    'bbox': [float(x) for x in row['bbox'].split(',')]
+                })
+            elif len(seen_names) < 10 and f"{row['name']} ({row['country']})" not in seen_names:
+                seen_names.append(f"{row['name']} ({row['country']})")
+
+    if not matching_cities:
+        # Первые 10 городов для справки
+        available = '\n'.join(f"  • {name}" for name in seen_names)
+        raise DataNotFoundError(f"Город '{city_name}' не найден в cities_list.csv\n\n"
+                                f"Доступные города:\n{available}\n  ...")
+
+    return matching_cities
+
+
+def load_city_polygon(city_id, cities_path=CITIES_GEOJSON_PATH):
+    """
+    Загрузка полигона города из cities.geojson.
+
+    Raises:
+        DataNotFoundError: нет cities.geojson или города в нём
+    """
+    cities_path = Path(cities_path)
+
+    if not cities_path.exists():
+        raise DataNotFoundError("Ошибка: файл output/cities.geojson не найден!\n"
+                                "Сначала запустите: python3 fetch_cities.py")
+
+    with open(cities_path, 'r', encoding='utf-8') as f:
+        cities = json.load(f)
+
+    for feature in cities['features']:
+        if feature['id'] == city_id:
+            return feature
+
+    raise DataNotFoundError(f"Город {city_id} не найден в cities.geojson")
+
+
+def load_city_zones(countries=None, names=None, cities_csv=CITIES_CSV_PATH):
+    """
+    Все зоны из cities_list.csv, с фильтром по странам и/или названиям
+    (без учёта регистра). Формат - как у find_cities_by_name.
+
+    Raises:
+        DataNotFoundError: нет cities_list.csv
+    """
+    cities_csv = Path(cities_csv)
+
+    if not cities_csv.exists():
+        raise DataNotFoundError("Ошибка: файл cities_list.csv не найден!\n"
+                                "Сначала запустите: python3 fetch_cities.py")
+
+    countries = {c.lower() for c in countries} if countries else None
+    names = {n.lower() for n in names} if names else None
+
+    zones = []
+    with open(cities_csv, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            if countries and row['country'].lower() not in countries:
+                continue
+            if names and row['name'].lower() not in names:
+                continue
+            zones.append({
+                'id': row['id'],
+                'name': row['name'],
+                'country': row['country'],
+                'bbox': [float(x) for x in row['bbox'].split(',')]
+            })
+
+    return zones
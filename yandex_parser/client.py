@@ -0,0 +1,302 @@
+"""
+Долгоживущий клиент API Yandex Go.
+
+YandexClient держит заголовки из config.json, HTTP-сессии (keep-alive между
+запросами), ограничитель частоты и кэши. Один клиент можно использовать для
+обхода многих городов подряд - без перезагрузки конфига и прогрева соединений -
+и из нескольких потоков сразу (у каждого потока своя сессия, лимит общий).
+
+Метрики (metrics.registry) и журнал запросов (request_ledger.ledger) -
+глобальные для процесса, общие с CLI-скриптами.
+"""
+
+import threading
+import time
+from typing import List, Optional
+
+import requests
+
+from .config import DEFAULT_CONFIG_PATH
+from .errors import TokenExpiredError, AuthError
+from .metrics import registry as metrics, count_response_objects
+from .request_ledger import ledger
+from .tokens import TokenManager
+
+# Базовый URL API Yandex
+BASE_URL = "https://tc.mobile.yandex.net"
+
+DISCOVERY_ENDPOINT = "/4.0/eboks/scooters/v1/objects/discovery"
+OFFERS_ENDPOINT = "/4.0/scooters/v1/offers/create"
+POLYGONS_ENDPOINT = "/4.0/layers/v1/polygons"
+
+MOBILE_PARAMS = {
+    "mobcf": "russia%25go_ru_by_geo_hosts_2%25default",
+    "mobpr": "go_ru_by_geo_hosts_2_TAXI_V4_0"
+}
+
+
+class RateLimiter:
+    """Минимальный интервал между запросами (потокобезопасный)."""
+
+    def __init__(self, min_interval=0.1):
+        self.min_interval = min_interval
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Ожидание своей очереди на запрос."""
+        if self.min_interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_at)
+            self._next_at = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class YandexClient:
+    """
+    Клиент API: конфиг, HTTP-сессия, ограничитель частоты и кэши.
+
+    Методы discovery/offer/polygons возвращают разобранный JSON или None при
+    разовой ошибке (таймаут, 5xx) и бросают TokenExpiredError/AuthError, когда
+    продолжать без нового токена бессмысленно. С TokenManager истечение токена
+    вызывает паузу до обновления config.json и повтор запроса.
+    """
+
+    def __init__(self, headers, payment_methods=None, delay=0.1, timeout=30,
+                 response_cache=None, full_info_cache=None, metadata_cache=None,
+                 token_manager: Optional[TokenManager] = None):
+        """
+        Args:
+            headers: dict заголовков из config.json
+            payment_methods: list способов оплаты для /offers/create
+            delay: минимальный интервал между запросами в секундах
+            timeout: таймаут HTTP-запроса в секундах
+            response_cache: ResponseCache или None (кэш /objects/discovery и /polygons)
+            full_info_cache: FullInfoCache или None (кэш /offers/create)
+            metadata_cache: CityMetadataCache или None
+            token_manager: TokenManager или None; заголовки обновляются при
+                          загрузке нового токена
+        """
+        self.headers = dict(headers)
+        self.payment_methods = payment_methods or [{"type": "card"}]
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(delay)
+        self.response_cache = response_cache
+        self.full_info_cache = full_info_cache
+        self.metadata_cache = metadata_cache
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()  # список сессий и смена токена
+        self.token_manager = token_manager
+        self._token_version = token_manager.version if token_manager else None
+        if token_manager is not None:
+            token_manager.on_pause(self.save_caches)
+
+    @classmethod
+    def from_config(cls, config_path=DEFAULT_CONFIG_PATH, token_wait=0, **kwargs):
+        """
+        Создание клиента по config.json.
+
+        token_wait: сколько секунд ждать нового токена в config.json, когда
+                   текущий истекает (0 - только подхватить уже обновлённый)
+        """
+        token_manager = TokenManager(config_path, wait_timeout=token_wait)
+        return cls(token_manager.headers, token_manager.payment_methods,
+                   token_manager=token_manager, **kwargs)
+
+    @property
+    def delay(self) -> float:
+        return self.rate_limiter.min_interval
+
+    @property
+    def session(self) -> requests.Session:
+        """HTTP-сессия текущего потока."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def save_caches(self):
+        """
+        Сохранение кэшей на диск (в том числе во время паузы на обновление токена).
+
+        Рабочие потоки, прошедшие проверку токена до паузы, продолжают писать в
+        кэши; каждый кэш сериализует снимок под своей блокировкой.
+        """
+        for cache in (self.response_cache, self.full_info_cache, self.metadata_cache):
+            if cache is not None:
+                cache.save()
+
+    def close(self):
+        """Сохранение кэшей и закрытие HTTP-сессий."""
+        self.save_caches()
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions = []
+        self._local = threading.local()
+
+    def _cache_get(self, endpoint, bbox, zoom, mode=None):
+        """Ответ из кэша; попадание учитывается в метриках и журнале с cached=True."""
+        if self.response_cache is None:
+            return None
+        result = self.response_cache.get(endpoint, bbox, zoom, mode=mode)
+        if result is not None:
+            metrics.observe_request(endpoint, 200, 0.0, cached=True)
+            ledger.record(endpoint, bbox, zoom, 200, 0.0, data=result, cached=True)
+        return result
+
+    def _cache_put(self, endpoint, bbox, zoom, data, mode=None):
+        if self.response_cache is None:
+            return
+        self.response_cache.put(endpoint, bbox, zoom, data, mode=mode)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _check_auth(self, response, endpoint):
+        if response.status_code == 405:
+            raise TokenExpiredError("Ошибка 405: JWT токен истёк!", 405, endpoint)
+        if response.status_code in (401, 403):
+            raise AuthError(f"Ошибка {response.status_code}: Токен недействителен!",
+                            response.status_code, endpoint)
+
+    def _sync_token(self):
+        """
+        Проверка срока токена и перенос нового токена в заголовки HTTP-сессий.
+
+        Returns:
+            версия токена, с которой будет отправлен запрос
+        """
+        token_manager = self.token_manager
+        if token_manager is None:
+            return None
+        token_manager.ensure_valid()
+        if token_manager.version != self._token_version:
+            with self._lock:
+                if token_manager.version != self._token_version:
+                    self.headers = dict(token_manager.headers)
+                    self.payment_methods = token_manager.payment_methods
+                    for session in self._sessions:
+                        session.headers.update(self.headers)
+                    self._token_version = token_manager.version
+        return self._token_version
+
+    def _post(self, endpoint, payload, bbox=None, zoom=None, params=None, quiet=False):
+        """
+        POST с учётом ограничителя частоты, метрик и журнала.
+        quiet=True - не печатать разовые ошибки (массовые запросы /offers/create).
+        С TokenManager после HTTP 405 ждёт нового токена и повторяет запрос.
+
+        Returns:
+            dict ответа или None при разовой ошибке
+        """
+        while True:
+            version = self._sync_token()
+            try:
+                return self._post_once(endpoint, payload, bbox, zoom, params, quiet)
+            except TokenExpiredError:
+                if self.token_manager is None or not self.token_manager.wait_for_refresh(version):
+                    raise
+
+    def _post_once(self, endpoint, payload, bbox, zoom, params, quiet):
+        self.rate_limiter.wait()
+        request_start = time.time()
+        response = None
+        try:
+            response = self.session.post(f"{BASE_URL}{endpoint}", json=payload, params=params,
+                                         timeout=self.timeout)
+            latency = time.time() - request_start
+            metrics.observe_request(endpoint, response.status_code, latency, len(response.content))
+            if not response.ok:
+                ledger.record(endpoint, bbox, zoom, response.status_code, latency, len(response.content))
+
+            self._check_auth(response, endpoint)
+            response.raise_for_status()
+
+            result = response.json()
+            metrics.observe_objects(endpoint, count_response_objects(result))
+            ledger.record(endpoint, bbox, zoom, response.status_code, latency, len(response.content),
+                          result if bbox is not None else None)
+            return result
+
+        except requests.exceptions.RequestException as e:
+            if response is None:
+                metrics.observe_request(endpoint, 'error', time.time() - request_start)
+                ledger.record(endpoint, bbox, zoom, 'error', time.time() - request_start)
+            if not quiet:
+                print(f"⚠️  Ошибка запроса: {e}")
+            return None
+
+    def discovery(self, bbox: List[float], user_location: List[float], zoom: float) -> Optional[dict]:
+        """Самокаты и кластеры в bbox (/objects/discovery), с кэшем ответов."""
+        cached = self._cache_get(DISCOVERY_ENDPOINT, bbox, zoom)
+        if cached is not None:
+            return cached
+
+        payload = {
+            "actions": [],
+            "bbox": bbox,
+            "user_location": user_location,
+            "zoom": zoom
+        }
+        result = self._post(DISCOVERY_ENDPOINT, payload, bbox, zoom, params=MOBILE_PARAMS)
+
+        if result is not None:
+            self._cache_put(DISCOVERY_ENDPOINT, bbox, zoom, result)
+        return result
+
+    def offer(self, scooter_number: str, location: List[float]) -> Optional[dict]:
+        """Полная информация о самокате (/offers/create): батарея, цены, страховка."""
+        payload = {
+            "maas_client_version": "6.101.0",
+            "payment_methods": self.payment_methods,
+            "user_position": location,
+            "vehicle_numbers": [scooter_number]
+        }
+        result = self._post(OFFERS_ENDPOINT, payload, quiet=True)
+        return result
+
+    def polygons(self, bbox: List[float], zoom: float, location: Optional[List[float]] = None) -> Optional[dict]:
+        """Зоны слоя самокатов (/layers/v1/polygons) - GeoJSON FeatureCollection."""
+        cached = self._cache_get(POLYGONS_ENDPOINT, bbox, zoom, mode='scooters')
+        if cached is not None:
+            return cached
+
+        if location is None:
+            location = [(bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2]
+
+        payload = {
+            "state": {
+                "location": location,
+                "bbox": bbox,
+                "zoom": zoom,
+                "night_mode": False,  # КРИТИЧНО! Без этого может вернуть пустой ответ
+                "screen": "discovery",
+                "mode": "scooters",
+                "known_orders_info": [],
+                "multiclass_options": {"selected": False},
+                "scooters": {"autoselect": False},
+                "known_orders": []
+            },
+            "known_versions": {}
+        }
+        result = self._post(POLYGONS_ENDPOINT, payload, bbox, zoom, params=MOBILE_PARAMS)
+
+        if result is not None and result.get('type') != 'FeatureCollection':
+            print("⚠️  Неожиданная структура ответа")
+            return None
+
+        if result is not None:
+            self._cache_put(POLYGONS_ENDPOINT, bbox, zoom, result, mode='scooters')
+        return result
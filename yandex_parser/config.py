@@ -0,0 +1,39 @@
+"""
+Конфигурация: заголовки запросов и способы оплаты из config.json.
+"""
+
+import json
+from pathlib import Path
+
+from .errors import ConfigError
+from .paths import ROOT_DIR
+
+DEFAULT_CONFIG_PATH = ROOT_DIR / 'config.json'
+
+
+def load_config(config_path=DEFAULT_CONFIG_PATH):
+    """
+    Загрузка заголовков и payment_methods из config.json.
+
+    Returns:
+        (headers, payment_methods)
+
+    Raises:
+        ConfigError: файла нет или в нём нет заголовков
+    """
+    config_path = Path(config_path)
+
+    if not config_path.exists():
+        raise ConfigError(f"Ошибка: файл {config_path.name} не найден!")
+
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    headers = config.get('headers') or config.get('yandex_headers')
+
+    if not headers:
+        raise ConfigError(f"Ошибка: заголовки не найдены в {config_path.name}!")
+
+    payment_methods = config.get('payment_methods', [{"type": "card"}])
+
+    return headers, payment_methods
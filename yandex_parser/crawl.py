@@ -0,0 +1,724 @@
+"""
+Обход города: самокаты, метаданные оператора и парковки.
+
+Функции принимают YandexClient и бросают исключения из errors вместо
+завершения процесса - их можно вызывать из сервиса для многих городов подряд.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from .client import YandexClient
+from .full_info_sampling import (
+    DEFAULT_SAMPLE_CELL_DEG, group_by_cell, sample_scooters, estimate_pricing, spread_estimates
+)
+from .geometry import PreparedGeometry, meters_to_degrees
+from .journal import CrawlJournal
+from .metrics import registry as metrics
+from .profiling import profiler
+from .request_ledger import ledger
+from .scheduler import FairScheduler
+from .parsing import (
+    extract_full_info_from_offer, extract_points_from_response, extract_detailed_objects,
+    extract_parkings_only, simple_cluster_points, shrink_bbox_around_point
+)
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+def _discover(client, journal, bbox, location, zoom):
+    """Запрос /objects/discovery; выполненный ранее берётся из журнала обхода."""
+    if journal is None:
+        return client.discovery(bbox, location, zoom)
+    
+    data = journal.discovery(bbox, zoom)
+    if data is None:
+        data = client.discovery(bbox, location, zoom)
+        if data:
+            journal.record_discovery(bbox, zoom, data)
+    return data
+
+
+def _run(scheduler, key, fn, *args):
+    """Вызов fn(*args): в очереди ключа key общего пула или в текущем потоке."""
+    if scheduler is None:
+        return fn(*args)
+    return scheduler.submit(key, fn, *args).result()
+
+
+def _discover_all(client, calls, scheduler=None, key=None, journal=None):
+    """
+    Запросы /objects/discovery для списка (bbox, location, zoom).
+    
+    Без планировщика запросы идут по одному; с планировщиком все ставятся в
+    очередь ключа key сразу, а результаты отдаются в исходном порядке.
+    """
+    if scheduler is None:
+        for bbox, location, zoom in calls:
+            yield _discover(client, journal, bbox, location, zoom)
+        return
+    
+    futures = [scheduler.submit(key, _discover, client, journal, bbox, location, zoom)
+               for bbox, location, zoom in calls]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _overview_bbox(city_bbox, area, say):
+    """bbox обзорного запроса: bbox города, обрезанный по охвату области (None - не пересекаются)."""
+    if area is None:
+        return city_bbox
+    overview_bbox = area.clip_bbox(city_bbox)
+    if overview_bbox is None:
+        say("   ℹ️  Область не пересекается с bbox города")
+    return overview_bbox
+
+
+def _filter_hot_zones(hot_zones, area, say):
+    """Горячие зоны, пересекающие полигон области; остальные отбрасываются до запросов."""
+    if area is None:
+        return hot_zones
+    kept = [zone for zone in hot_zones if area.intersects_bbox(zone['bbox'])]
+    if len(kept) < len(hot_zones):
+        say(f"   📐 Вне полигона: {len(hot_zones) - len(kept)} зон отброшено, осталось {len(kept)}")
+    return kept
+
+
+def _fetch_full_info(client, scooter_number, scooter_geo, journal=None):
+    """
+    Полная информация одного самоката: журнал обхода, свежая запись кэша
+    или /offers/create.
+    
+    Returns:
+        (full_info или None, был ли запрос к API)
+    """
+    cache = client.full_info_cache
+    
+    if journal is not None:
+        full_info = journal.full_info(scooter_number)
+        if full_info is not None:
+            return full_info, False
+    
+    # Свежая запись в кэше - запрос не нужен
+    if cache is not None:
+        full_info = cache.lookup(scooter_number, scooter_geo)
+        if full_info is not None:
+            return full_info, False
+    
+    offer_data = client.offer(scooter_number, scooter_geo)
+    
+    if offer_data:
+        full_info = extract_full_info_from_offer(offer_data)
+        if cache is not None:
+            cache.store(scooter_number, scooter_geo, full_info)
+        if journal is not None:
+            journal.record_full_info(scooter_number, full_info)
+        return full_info, True
+    
+    if cache is not None:
+        # Статические поля из кэша лучше, чем ничего
+        return cache.fallback(scooter_number), True
+    
+    return None, True
+
+
+class _EnrichmentPipeline:
+    """
+    Этап 5 параллельно с этапами 3-4: самокат уходит в /offers/create сразу
+    после обнаружения. Не более max_pending запросов в очереди - при переполнении
+    детальные запросы ждут (обратное давление), и память не растёт.
+    """
+    
+    def __init__(self, client, city_id, workers=4, scheduler=None, max_pending=256, journal=None):
+        self.client = client
+        self.journal = journal
+        self.key = (city_id, 'enrichment')
+        self._own_scheduler = scheduler is None
+        self.scheduler = scheduler or FairScheduler(workers)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._futures = {}  # scooter_id -> Future[(full_info, requested)]
+        self._error = None
+    
+    def submit(self, scooter):
+        """Постановка самоката в очередь (повторные id игнорируются)."""
+        if self._error is not None:
+            raise self._error
+        
+        scooter_id = scooter.get('id')
+        scooter_number = scooter.get('payload', {}).get('number')
+        scooter_geo = scooter.get('geo')
+        if not scooter_id or not scooter_number or not scooter_geo or scooter_id in self._futures:
+            return
+        
+        self._slots.acquire()
+        with ledger.context_scope(dict(ledger.get_context(), stage='enrichment')):
+            future = self.scheduler.submit(self.key, self._fetch, scooter_number, scooter_geo)
+        future.add_done_callback(self._on_done)
+        self._futures[scooter_id] = future
+    
+    def _fetch(self, scooter_number, scooter_geo):
+        # После TokenExpiredError/AuthError остальные запросы бессмысленны
+        if self._error is not None:
+            return None, False
+        return _fetch_full_info(self.client, scooter_number, scooter_geo, self.journal)
+    
+    def _on_done(self, future):
+        self._slots.release()
+        if not future.cancelled() and future.exception() is not None and self._error is None:
+            self._error = future.exception()
+    
+    def pending(self):
+        return sum(1 for future in self._futures.values() if not future.done())
+    
+    def results(self):
+        """
+        Ожидание всех запросов.
+        
+        Returns:
+            (dict scooter_id -> full_info, количество запросов к API)
+        """
+        full_infos = {}
+        offer_requests = 0
+        for scooter_id, future in self._futures.items():
+            full_info, requested = future.result()
+            offer_requests += requested
+            if full_info:
+                full_infos[scooter_id] = full_info
+        return full_infos, offer_requests
+    
+    def close(self):
+        """Отмена невыполненных запросов и остановка собственного пула."""
+        for future in self._futures.values():
+            future.cancel()
+        if self._own_scheduler:
+            self.scheduler.shutdown(cancel_pending=True)
+
+
+def crawl_city_metadata(client: YandexClient, city_bbox: List[float], max_attempts: int = 5) -> Optional[dict]:
+    """
+    Дешёвое получение метаданных города (operator, subscription, currency).
+    
+    Обзорный запрос + один детальный запрос в самую плотную горячую зону +
+    /offers/create для первых самокатов до первого успешного ответа.
+    
+    Returns:
+        dict {operator, subscription, currency} или None
+    """
+    center_lon = (city_bbox[0] + city_bbox[2]) / 2
+    center_lat = (city_bbox[1] + city_bbox[3]) / 2
+    
+    overview_data = client.discovery(city_bbox, [center_lon, center_lat], zoom=12)
+    if not overview_data:
+        return None
+    
+    hot_zones = simple_cluster_points(extract_points_from_response(overview_data), grid_size_deg=0.02)
+    if not hot_zones:
+        return None
+    
+    densest = max(hot_zones, key=lambda z: z['points_count'])
+    zone_bbox = densest['bbox']
+    zone_center = [(zone_bbox[0] + zone_bbox[2]) / 2, (zone_bbox[1] + zone_bbox[3]) / 2]
+    
+    detail_data = client.discovery(zone_bbox, zone_center, zoom=17)
+    if not detail_data:
+        return None
+    
+    attempts = 0
+    for scooter in extract_detailed_objects(detail_data)['scooters']:
+        scooter_number = scooter.get('payload', {}).get('number')
+        scooter_geo = scooter.get('geo')
+        if not scooter_number or not scooter_geo:
+            continue
+        
+        offer_data = client.offer(scooter_number, scooter_geo)
+        if offer_data:
+            full_info = extract_full_info_from_offer(offer_data)
+            return {
+                'operator': full_info['operator'],
+                'subscription': full_info['subscription'],
+                'currency': full_info['currency']
+            }
+        
+        attempts += 1
+        if attempts >= max_attempts:
+            break
+    
+    return None
+
+
+def crawl_city_scooters(client: YandexClient, city_bbox: List[float], city_id: str,
+                        min_cluster_size: int = 50, with_full_info: bool = False,
+                        sample_per_cell: int = 0, sample_cell_deg: float = DEFAULT_SAMPLE_CELL_DEG,
+                        crawl_params: Optional[dict] = None, scheduler: Optional[FairScheduler] = None,
+                        verbose: bool = True, enrich_workers: int = 4,
+                        on_object: Optional[Callable[[str, dict], None]] = None,
+                        journal: Optional[CrawlJournal] = None,
+                        area: Optional[PreparedGeometry] = None) -> Dict[str, dict]:
+    """
+    Комбинированный подход для полного парсинга города.
+    
+    Кэши берутся из клиента: свежие записи client.full_info_cache используются
+    вместо повторного запроса /offers/create, метаданные города - из
+    client.metadata_cache, если в этом запуске они не были получены.
+    
+    Параметры:
+        with_full_info: если True, для каждого самоката будет запрошена полная информация
+                       (батарея, цены, страховка) через /offers/create
+        sample_per_cell: если > 0, /offers/create запрашивается только для стольких
+                        самокатов в каждой ячейке sample_cell_deg, а цены остальных
+                        оцениваются по выборке (full_info.estimated = True, без батареи)
+        crawl_params: dict параметров обхода из autotune (cell_size_m, detail_zoom,
+                     expansion_box_m) или None - сетка 0.02°, zoom 17, раскрытие 0.005°
+        scheduler: FairScheduler или None; все запросы обхода (обзор, этапы 3-4 и
+                  последовательный этап 5) ставятся в общий пул (пакетный обход
+                  многих городов), иначе выполняются по одному в текущем потоке
+        verbose: False - не печатать ход обхода (параллельные города)
+        enrich_workers: если > 0 (и не режим выборки), этап 5 идёт параллельно с
+                       этапами 3-4 в стольких потоках (в общем пуле scheduler, если он
+                       задан); 0 - последовательно после раскрытия кластеров
+        on_object: callable(id, объект), вызывается, когда объект впервые добавлен
+                  в результат (потоковый вывод); полная информация к этому моменту
+                  ещё не собрана
+        journal: CrawlJournal или None; выполненные запросы и полная информация
+                записываются, а записанные ранее берутся из журнала без запросов
+        area: PreparedGeometry или None - полигон зоны обслуживания или область
+             интереса; обзор ограничивается её охватом, а горячие зоны вне
+             полигона отбрасываются до детальных запросов
+    
+    Returns:
+        dict id -> объект (самокат или кластер) и '__metadata__', если метаданные известны
+    
+    Raises:
+        TokenExpiredError, AuthError: токен недействителен
+    """
+    pipeline = None
+    if with_full_info and not sample_per_cell and enrich_workers > 0:
+        pipeline = _EnrichmentPipeline(client, city_id, enrich_workers, scheduler, journal=journal)
+    
+    try:
+        return _crawl_city_scooters(client, city_bbox, city_id, min_cluster_size, with_full_info,
+                                    sample_per_cell, sample_cell_deg, crawl_params, scheduler,
+                                    verbose, pipeline, on_object, journal, area)
+    finally:
+        if pipeline is not None:
+            pipeline.close()
+
+
+def _crawl_city_scooters(client, city_bbox, city_id, min_cluster_size, with_full_info,
+                         sample_per_cell, sample_cell_deg, crawl_params, scheduler, verbose, pipeline,
+                         on_object, journal, area):
+    """Тело crawl_city_scooters; pipeline - _EnrichmentPipeline или None."""
+    full_info_cache = client.full_info_cache
+    metadata_cache = client.metadata_cache
+    say = print if verbose else _quiet
+
+    say(f"\n🚀 Парсинг города: {city_id}")
+    say("="*80)
+    
+    if with_full_info:
+        say("ℹ️  Режим: полная информация (батарея, цены, страховка)")
+        say("⚠️  Это увеличит время парсинга в ~N раз (N = количество самокатов)")
+        if pipeline is not None:
+            say("⚡ Сбор полной информации идёт параллельно с детальными запросами")
+    
+    # Вычисляем центр bbox для user_location
+    center_lon = (city_bbox[0] + city_bbox[2]) / 2
+    center_lat = (city_bbox[1] + city_bbox[3]) / 2
+    user_location = [center_lon, center_lat]
+    
+    # Параметры обхода: подобранные для города (в метрах, с поправкой на широту) или исходные
+    if crawl_params:
+        grid_lon_deg, grid_lat_deg = meters_to_degrees(crawl_params['cell_size_m'], center_lat)
+        box_lon_deg, box_lat_deg = meters_to_degrees(crawl_params['expansion_box_m'], center_lat)
+        detail_zoom = crawl_params['detail_zoom']
+        grid_label = f"{crawl_params['cell_size_m']} м"
+        say(f"🎛️  Параметры города: ячейка {crawl_params['cell_size_m']} м, zoom {detail_zoom}, "
+              f"порог кластера {min_cluster_size}, раскрытие {crawl_params['expansion_box_m']} м")
+    else:
+        grid_lon_deg = grid_lat_deg = 0.02
+        box_lon_deg = box_lat_deg = 0.005
+        detail_zoom = 17
+        grid_label = "0.02°"
+    
+    # Параметры обхода попадают в журнал запросов для офлайн-анализа
+    ledger.set_context(
+        city_id=city_id,
+        grid_size_deg=round(grid_lon_deg, 5),
+        min_cluster_size=min_cluster_size,
+        cell_size_m=crawl_params['cell_size_m'] if crawl_params else None,
+        detail_zoom=detail_zoom,
+        expansion_box_m=crawl_params['expansion_box_m'] if crawl_params else None
+    )
+    
+    if journal is not None and journal.hot_zones is not None:
+        # План уже в журнале - этапы 1-2 не повторяем
+        hot_zones = journal.hot_zones
+        say(f"\n📒 Продолжение по журналу ({journal.summary()})")
+    else:
+        # Этап 1: Обзорный запрос с низким zoom
+        say(f"\n📡 Этап 1: Обзорный запрос (zoom 12)")
+        overview_bbox = _overview_bbox(city_bbox, area, say)
+        if overview_bbox is None:
+            return {}
+        say(f"   Bbox: {overview_bbox}")
+        
+        stage_start = time.time()
+        profiler.start('overview')
+        ledger.set_context(stage='overview')
+        overview_data = _run(scheduler, city_id, client.discovery, overview_bbox, user_location, 12)
+        metrics.record_stage('overview', time.time() - stage_start)
+        profiler.stop()
+        
+        if not overview_data:
+            say("❌ Не удалось получить обзорные данные")
+            return {}
+        
+        # Извлекаем все точки
+        all_points = extract_points_from_response(overview_data)
+        say(f"   Найдено точек: {len(all_points)}")
+        
+        if len(all_points) == 0:
+            say("   ℹ️  В городе нет самокатов")
+            return {}
+        
+        # Этап 2: Кластеризация в горячие зоны
+        say(f"\n🔥 Этап 2: Кластеризация точек (сетка {grid_label})")
+        stage_start = time.time()
+        profiler.start('clustering')
+        ledger.set_context(stage='clustering')
+        hot_zones = simple_cluster_points(all_points, grid_size_deg=grid_lon_deg, grid_size_lat_deg=grid_lat_deg)
+        say(f"   Горячих зон: {len(hot_zones)}")
+        hot_zones = _filter_hot_zones(hot_zones, area, say)
+        metrics.record_stage('clustering', time.time() - stage_start)
+        profiler.stop()
+        
+        if journal is not None:
+            journal.set_plan(hot_zones)
+    
+    # Этап 3: Детальные запросы для горячих зон
+    say(f"\n📥 Этап 3: Детальные запросы (zoom {detail_zoom})")
+    stage_start = time.time()
+    profiler.start('detail')
+    ledger.set_context(stage='detail')
+    
+    all_scooters = {}
+    all_clusters_to_process = []
+    
+    def add(obj_id, obj):
+        """Добавление объекта в результат; True, если он новый."""
+        is_new = obj_id not in all_scooters
+        all_scooters[obj_id] = obj
+        if is_new and on_object is not None:
+            on_object(obj_id, obj)
+        return is_new
+    
+    zone_calls = []
+    for zone in hot_zones:
+        zone_bbox = zone['bbox']
+        zone_center = [
+            (zone_bbox[0] + zone_bbox[2]) / 2,
+            (zone_bbox[1] + zone_bbox[3]) / 2
+        ]
+        zone_calls.append((zone_bbox, zone_center, detail_zoom))
+    
+    zone_results = _discover_all(client, zone_calls, scheduler, city_id, journal)
+    
+    for i, (zone, detail_data) in enumerate(zip(hot_zones, zone_results), 1):
+        say(f"   [{i}/{len(hot_zones)}] Зона с {zone['points_count']} точками...", end=' ')
+        
+        if not detail_data:
+            say("⚠️  Ошибка")
+            continue
+        
+        objects = extract_detailed_objects(detail_data)
+        
+        # Сохраняем самокаты
+        for scooter in objects['scooters']:
+            scooter_id = scooter.get('id')
+            if scooter_id:
+                add(scooter_id, scooter)
+                if pipeline is not None:
+                    pipeline.submit(scooter)
+        
+        # Собираем большие кластеры для дальнейшей обработки
+        for cluster in objects['clusters']:
+            count = cluster.get('payload', {}).get('objects_count', 0)
+            if count >= min_cluster_size:
+                all_clusters_to_process.append(cluster)
+            else:
+                # Маленькие кластеры сохраняем как есть
+                cluster_id = cluster.get('id')
+                if cluster_id:
+                    add(cluster_id, cluster)
+        
+        say(f"✓ {len(objects['scooters'])} самокатов, {len(objects['clusters'])} кластеров")
+    
+    metrics.record_stage('detail', time.time() - stage_start)
+    profiler.stop()
+    
+    # Этап 4: Рекурсивное раскрытие больших кластеров
+    stage_start = time.time()
+    profiler.start('expansion')
+    ledger.set_context(stage='expansion')
+    if all_clusters_to_process:
+        say(f"\n🔍 Этап 4: Раскрытие больших кластеров (zoom 19)")
+        say(f"   Кластеров для обработки: {len(all_clusters_to_process)}")
+        
+        # Уменьшаем bbox вокруг кластера
+        cluster_calls = [
+            (shrink_bbox_around_point(cluster['geo'], size_deg=box_lon_deg, size_lat_deg=box_lat_deg),
+             cluster['geo'], 19)
+            for cluster in all_clusters_to_process if cluster.get('geo')
+        ]
+        cluster_results = _discover_all(client, cluster_calls, scheduler, city_id, journal)
+        
+        for i, cluster in enumerate(all_clusters_to_process, 1):
+            count = cluster.get('payload', {}).get('objects_count', 0)
+            geo = cluster.get('geo')
+            
+            say(f"   [{i}/{len(all_clusters_to_process)}] Кластер с {count} самокатами...", end=' ')
+            
+            if not geo:
+                say("⚠️  Нет координат")
+                continue
+            
+            detail_data = next(cluster_results)
+            
+            if not detail_data:
+                say("⚠️  Ошибка")
+                # Сохраняем кластер как есть
+                cluster_id = cluster.get('id')
+                if cluster_id:
+                    add(cluster_id, cluster)
+                continue
+            
+            objects = extract_detailed_objects(detail_data)
+            
+            # Сохраняем раскрытые самокаты
+            new_scooters = 0
+            for scooter in objects['scooters']:
+                scooter_id = scooter.get('id')
+                if scooter_id and scooter_id not in all_scooters:
+                    add(scooter_id, scooter)
+                    new_scooters += 1
+                    if pipeline is not None:
+                        pipeline.submit(scooter)
+            
+            # Если остались кластеры - сохраняем их
+            for sub_cluster in objects['clusters']:
+                cluster_id = sub_cluster.get('id')
+                if cluster_id:
+                    add(cluster_id, sub_cluster)
+            
+            say(f"✓ Раскрыто {new_scooters}/{count}")
+    
+    metrics.record_stage('expansion', time.time() - stage_start)
+    profiler.stop()
+    
+    # Этап 5 (опционально): Сбор полной информации через /offers/create
+    stage_start = time.time()
+    if with_full_info:
+        profiler.start('enrichment')
+        ledger.set_context(stage='enrichment')
+        scooter_list = [s for s in all_scooters.values() if s.get('id', '').startswith('scooter_')]
+        
+        if scooter_list:
+            offer_requests = 0
+            cells = None
+            
+            # Успешные замеры по ячейкам (режим выборки)
+            cell_infos = defaultdict(list)
+            
+            if pipeline is not None:
+                # Запросы уже идут с этапа 3 - ждём оставшиеся
+                say(f"\n💎 Этап 5: Сбор полной информации (параллельно с этапами 3-4)")
+                say(f"   Самокатов: {len(scooter_list)}, запросов в очереди: {pipeline.pending()}")
+                full_infos, offer_requests = pipeline.results()
+                for scooter in scooter_list:
+                    if scooter['id'] in full_infos:
+                        scooter['full_info'] = full_infos[scooter['id']]
+                say(f"   ✓ Полная информация собрана ({offer_requests} запросов)")
+            else:
+                # Режим выборки: запросы только для sample_per_cell самокатов в каждой ячейке
+                if sample_per_cell:
+                    cells = group_by_cell(scooter_list, sample_cell_deg)
+                    samples = sample_scooters(cells, sample_per_cell)
+                    queue = [(cell, scooter) for cell, cell_samples in samples.items() for scooter in cell_samples]
+                else:
+                    queue = [(None, scooter) for scooter in scooter_list]
+                
+                say(f"\n💎 Этап 5: Сбор полной информации")
+                if cells is not None:
+                    say(f"   Режим выборки: до {sample_per_cell} самокатов на ячейку {sample_cell_deg}°")
+                    say(f"   Ячеек: {len(cells)}, самокатов: {len(scooter_list)}")
+                else:
+                    say(f"   Самокатов для обработки: {len(scooter_list)}")
+                say(f"   ⚠️  Это займёт до ~{len(queue) * client.delay:.0f} секунд")
+                
+                # Прогресс-бар
+                bar_width = 50
+                
+                for i, (cell, scooter) in enumerate(queue, 1):
+                    scooter_number = scooter.get('payload', {}).get('number')
+                    scooter_geo = scooter.get('geo')
+                    
+                    # В ячейке уже достаточно замеров - запасные не нужны
+                    if cell is not None and len(cell_infos[cell]) >= sample_per_cell:
+                        continue
+                    
+                    if not scooter_number or not scooter_geo:
+                        continue
+                    
+                    full_info, requested = _run(scheduler, city_id, _fetch_full_info,
+                                                client, scooter_number, scooter_geo, journal)
+                    offer_requests += requested
+                    
+                    if full_info:
+                        # Добавляем информацию к самокату
+                        scooter['full_info'] = full_info
+                        if cell is not None and full_info.get('pricing', {}).get('unlock_price') is not None:
+                            cell_infos[cell].append(full_info)
+                    
+                    # Обновляем прогресс-бар
+                    progress = i / len(queue)
+                    filled = int(bar_width * progress)
+                    bar = '█' * filled + '░' * (bar_width - filled)
+                    percent = int(progress * 100)
+                    say(f'\r   [{bar}] {percent}% ({i}/{len(queue)})', end='', flush=True)
+                
+                say(f"\n   ✓ Полная информация собрана ({offer_requests} запросов)")
+            
+            if full_info_cache is not None:
+                cache_stats = full_info_cache.stats
+                say(f"   💾 Кэш: {cache_stats['hits']} попаданий "
+                      f"(устарело: {cache_stats['stale']}, перемещено: {cache_stats['moved']})")
+            
+            # Метаданные города (operator, subscription, currency) - из первого самоката с данными
+            first_info = next((s['full_info'] for s in scooter_list if s.get('full_info')), None)
+            
+            # Распространяем оценки цен на остальные самокаты
+            if cells is not None:
+                estimates = {}
+                for cell, infos in cell_infos.items():
+                    estimate = estimate_pricing(infos)
+                    if estimate:
+                        estimates[cell] = estimate
+                estimated = spread_estimates(cells, estimates)
+                say(f"   📐 Оценено по выборке: {estimated} самокатов ({len(estimates)}/{len(cells)} ячеек с замерами)")
+            
+            # Добавляем метаданные в результат
+            if first_info:
+                city_metadata = {
+                    'operator': first_info['operator'],
+                    'subscription': first_info['subscription'],
+                    'currency': first_info['currency']
+                }
+                all_scooters['__metadata__'] = city_metadata
+                
+                if metadata_cache is not None and metadata_cache.store(city_id, city_metadata):
+                    say(f"   🔄 Метаданные города обновлены в кэше")
+    
+    if with_full_info:
+        metrics.record_stage('enrichment', time.time() - stage_start)
+        profiler.stop()
+    
+    # Без свежих метаданных - берём из кэша (без дополнительных запросов)
+    if '__metadata__' not in all_scooters and metadata_cache is not None:
+        cached_metadata = metadata_cache.get(city_id)
+        if cached_metadata:
+            all_scooters['__metadata__'] = cached_metadata
+    
+    return all_scooters
+
+
+def crawl_city_parkings(client: YandexClient, city_bbox: List[float], city_id: str,
+                        on_object: Optional[Callable[[str, dict], None]] = None,
+                        area: Optional[PreparedGeometry] = None) -> Dict[str, dict]:
+    """
+    Парсинг парковок города (cluster и cluster_empty).
+    
+    on_object: callable(id, парковка), вызывается для каждой новой парковки
+    area: PreparedGeometry или None - горячие зоны вне полигона не запрашиваются
+    """
+    print(f"\n🅿️  Парсинг парковок города: {city_id}")
+    print("="*80)
+    
+    center_lon = (city_bbox[0] + city_bbox[2]) / 2
+    center_lat = (city_bbox[1] + city_bbox[3]) / 2
+    user_location = [center_lon, center_lat]
+    
+    ledger.set_context(city_id=city_id, grid_size_deg=0.02)
+    
+    # Этап 1: Обзор
+    print(f"\n📡 Этап 1: Обзорный запрос (zoom 12)")
+    overview_bbox = _overview_bbox(city_bbox, area, print)
+    if overview_bbox is None:
+        return {}
+    stage_start = time.time()
+    profiler.start('overview')
+    ledger.set_context(stage='overview')
+    overview_data = client.discovery(overview_bbox, user_location, zoom=12)
+    metrics.record_stage('overview', time.time() - stage_start)
+    profiler.stop()
+    
+    if not overview_data:
+        return {}
+    
+    all_points = extract_points_from_response(overview_data)
+    print(f"   Найдено точек: {len(all_points)}")
+    
+    if len(all_points) == 0:
+        return {}
+    
+    # Этап 2: Кластеризация
+    print(f"\n🔥 Этап 2: Кластеризация (сетка 0.02°)")
+    hot_zones = simple_cluster_points(all_points, grid_size_deg=0.02)
+    print(f"   Горячих зон: {len(hot_zones)}")
+    hot_zones = _filter_hot_zones(hot_zones, area, print)
+    
+    # Этап 3: Детальные запросы
+    print(f"\n📥 Этап 3: Детальные запросы (zoom 17)")
+    stage_start = time.time()
+    profiler.start('detail')
+    ledger.set_context(stage='detail')
+    
+    all_parkings = {}
+    
+    for i, zone in enumerate(hot_zones, 1):
+        zone_bbox = zone['bbox']
+        zone_center = [
+            (zone_bbox[0] + zone_bbox[2]) / 2,
+            (zone_bbox[1] + zone_bbox[3]) / 2
+        ]
+        
+        print(f"   [{i}/{len(hot_zones)}] Зона...", end=' ')
+        
+        detail_data = client.discovery(zone_bbox, zone_center, zoom=17)
+        
+        if not detail_data:
+            print("⚠️")
+            continue
+        
+        parkings = extract_parkings_only(detail_data)
+        
+        for parking in parkings:
+            parking_id = parking.get('id')
+            if parking_id:
+                if on_object is not None and parking_id not in all_parkings:
+                    on_object(parking_id, parking)
+                all_parkings[parking_id] = parking
+        
+        print(f"✓ {len(parkings)} парковок")
+    
+    metrics.record_stage('detail', time.time() - stage_start)
+    profiler.stop()
+    
+    return all_parkings
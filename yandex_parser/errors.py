@@ -0,0 +1,35 @@
+"""
+Исключения библиотеки.
+
+CLI-скрипты перехватывают YandexParserError, печатают сообщение и завершаются
+с кодом 1; при встраивании в сервис исключения обрабатывает вызывающий код.
+"""
+
+
+class YandexParserError(Exception):
+    """Базовое исключение библиотеки."""
+
+
+class ConfigError(YandexParserError):
+    """config.json отсутствует или не содержит заголовков."""
+
+
+class DataNotFoundError(YandexParserError):
+    """Не найден справочник (cities_list.csv, cities.geojson) или город в нём."""
+
+
+class ApiError(YandexParserError):
+    """Ответ API, после которого продолжать обход бессмысленно."""
+
+    def __init__(self, message, status=None, endpoint=None):
+        super().__init__(message)
+        self.status = status
+        self.endpoint = endpoint
+
+
+class TokenExpiredError(ApiError):
+    """HTTP 405: истёк JWT токен (X-Yandex-Jws)."""
+
+
+class AuthError(ApiError):
+    """HTTP 401/403: токен авторизации недействителен."""
@@ -0,0 +1,309 @@
+"""
+Персистентные кэши данных из /offers/create: полная информация о самокатах
+и метаданные городов (оператор, подписки, валюта).
+
+Ключ кэша - номер самоката (payload.number). Поля делятся на две группы:
+- статические (модель, вендор, uuid, тариф, страховка) - меняются редко,
+  живут static_ttl секунд;
+- изменчивые (заряд, запас хода, цены с учётом surge) - живут volatile_ttl секунд.
+
+Запись считается устаревшей, если истёк любой из TTL или самокат сместился
+дальше move_threshold_m метров от сохранённой позиции. Повторный запрос
+/offers/create нужен только для устаревших записей.
+
+Отдельного запроса только за изменчивыми полями в API нет, поэтому
+volatile_ttl по умолчанию - 3 часа, а не минуты: иначе каждый плановый
+перезапуск запрашивал бы все самокаты заново. Компромисс: заряд
+неподвижного самоката меняется только при замене батареи (поездку ловит
+проверка смещения), а цены и surge из кэша могут отставать до volatile_ttl.
+Возраст изменчивых полей отдаётся в full_info['cached_at'].
+"""
+
+import json
+import math
+import threading
+import time
+from pathlib import Path
+
+from .paths import OUTPUT_DIR
+
+# Путь к кэшу по умолчанию
+DEFAULT_CACHE_PATH = OUTPUT_DIR / 'cache' / 'full_info_cache.json'
+
+# TTL по умолчанию (в секундах)
+DEFAULT_STATIC_TTL = 7 * 24 * 3600  # 7 дней
+DEFAULT_VOLATILE_TTL = 3 * 3600  # 3 часа (см. компромисс в начале модуля)
+
+# Смещение, после которого самокат считается перемещённым (метры)
+DEFAULT_MOVE_THRESHOLD_M = 30.0
+
+# Разбиение полей full_info на статические и изменчивые
+STATIC_FIELDS = {
+    'vehicle': ['uuid', 'model', 'vendor', 'image_tag', 'type'],
+    'pricing': ['offer_type', 'tariff_name', 'tariff_subname', 'tariff_short_name'],
+    'insurance': None,  # вся секция
+    'operator': None,
+    'subscription': None,
+    'currency': None
+}
+
+VOLATILE_FIELDS = {
+    'vehicle': ['charge_level', 'remaining_distance', 'remaining_time'],
+    'pricing': ['offer_id', 'unlock_price', 'riding_price', 'parking_price',
+                'surge_balance', 'surge_unlock_balance', 'surge_info_balance']
+}
+
+
+def distance_m(point_a, point_b):
+    """Приблизительное расстояние между двумя точками [lon, lat] в метрах."""
+    lon1, lat1 = point_a
+    lon2, lat2 = point_b
+    mean_lat = math.radians((lat1 + lat2) / 2)
+    dx = math.radians(lon2 - lon1) * math.cos(mean_lat)
+    dy = math.radians(lat2 - lat1)
+    return 6371000.0 * math.hypot(dx, dy)
+
+
+def split_full_info(full_info, fields):
+    """Выделяет из full_info подмножество полей по схеме fields."""
+    part = {}
+    for section, keys in fields.items():
+        data = full_info.get(section, {})
+        if keys is None:
+            part[section] = data
+        else:
+            part[section] = {k: data.get(k) for k in keys}
+    return part
+
+
+def merge_full_info(static_part, volatile_part):
+    """Собирает full_info из статической и изменчивой частей."""
+    result = {
+        'vehicle': {},
+        'pricing': {},
+        'insurance': {},
+        'operator': {},
+        'subscription': {},
+        'currency': {}
+    }
+    for part in (static_part or {}, volatile_part or {}):
+        for section, data in part.items():
+            result.setdefault(section, {})
+            if isinstance(data, dict):
+                result[section].update(data)
+            else:
+                result[section] = data
+    return result
+
+
+class FullInfoCache:
+    """Кэш full_info с раздельными TTL для статических и изменчивых полей."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, static_ttl=DEFAULT_STATIC_TTL,
+                 volatile_ttl=DEFAULT_VOLATILE_TTL, move_threshold_m=DEFAULT_MOVE_THRESHOLD_M):
+        self.path = Path(path)
+        self.static_ttl = static_ttl
+        self.volatile_ttl = volatile_ttl
+        self.move_threshold_m = move_threshold_m
+        self.entries = {}
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'moved': 0, 'fallbacks': 0}
+        # Кэш общий для потоков этапа 5; save() может прийти из паузы на обновление токена
+        self._lock = threading.RLock()
+
+    def load(self):
+        """Загрузка кэша с диска (отсутствующий или битый файл = пустой кэш)."""
+        if not self.path.exists():
+            return self
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.entries = data.get('entries', {})
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Кэш {self.path.name} не прочитан, начинаю с пустого: {e}")
+            self.entries = {}
+        return self
+
+    def save(self):
+        """Атомарное сохранение кэша на диск (снимок записей под блокировкой)."""
+        with self._lock:
+            raw = json.dumps({'version': 1, 'entries': self.entries}, ensure_ascii=False)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(raw)
+        tmp_path.replace(self.path)
+
+    def lookup(self, scooter_number, geo, now=None):
+        """
+        Поиск свежей записи для самоката.
+
+        Args:
+            scooter_number: str, номер самоката (payload.number)
+            geo: list [lon, lat], текущая позиция самоката
+            now: float, текущее время (для тестов)
+
+        Returns:
+            dict full_info (с cached_at - временем изменчивых полей) или None,
+            если нужен новый запрос /offers/create
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            entry = self.entries.get(str(scooter_number))
+
+            if not entry:
+                self.stats['misses'] += 1
+                return None
+
+            if now - entry.get('static_at', 0) > self.static_ttl or \
+                    now - entry.get('volatile_at', 0) > self.volatile_ttl:
+                self.stats['stale'] += 1
+                return None
+
+            if geo and entry.get('geo') and distance_m(entry['geo'], geo) > self.move_threshold_m:
+                self.stats['moved'] += 1
+                return None
+
+            self.stats['hits'] += 1
+            full_info = merge_full_info(entry.get('static'), entry.get('volatile'))
+            full_info['cached_at'] = entry.get('volatile_at')
+            return full_info
+
+    def fallback(self, scooter_number, now=None):
+        """
+        Статическая часть записи без изменчивых полей.
+
+        Используется, когда /offers/create не ответил: модель и тариф ещё
+        валидны, а заряд и цены отдавать нельзя.
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            entry = self.entries.get(str(scooter_number))
+            if not entry or now - entry.get('static_at', 0) > self.static_ttl:
+                return None
+            self.stats['fallbacks'] += 1
+            return merge_full_info(entry.get('static'), None)
+
+    def store(self, scooter_number, geo, full_info, now=None):
+        """Сохранение свежего ответа /offers/create в кэш."""
+        now = now if now is not None else time.time()
+        with self._lock:
+            self.entries[str(scooter_number)] = {
+                'geo': geo,
+                'static': split_full_info(full_info, STATIC_FIELDS),
+                'volatile': split_full_info(full_info, VOLATILE_FIELDS),
+                'static_at': now,
+                'volatile_at': now
+            }
+
+    def prune(self, now=None):
+        """Удаление записей с истёкшим статическим TTL. Возвращает число удалённых."""
+        now = now if now is not None else time.time()
+        with self._lock:
+            expired = [number for number, entry in self.entries.items()
+                       if now - entry.get('static_at', 0) > self.static_ttl]
+            for number in expired:
+                del self.entries[number]
+            return len(expired)
+
+
+# Путь и TTL кэша метаданных городов
+DEFAULT_METADATA_CACHE_PATH = OUTPUT_DIR / 'cache' / 'city_metadata.json'
+DEFAULT_METADATA_TTL = 3 * 24 * 3600  # 3 дня
+
+METADATA_SECTIONS = ('operator', 'subscription', 'currency')
+
+
+def metadata_fingerprint(metadata):
+    """Стабильный отпечаток метаданных для проверки изменений."""
+    return json.dumps({k: metadata.get(k) for k in METADATA_SECTIONS},
+                      ensure_ascii=False, sort_keys=True)
+
+
+class CityMetadataCache:
+    """
+    Кэш метаданных города (operator, subscription, currency).
+
+    Записи хранятся по городу и оператору (ОГРН или название), так что
+    смена оператора в городе не затирает историю, а попадает в новую запись.
+    """
+
+    def __init__(self, path=DEFAULT_METADATA_CACHE_PATH, ttl=DEFAULT_METADATA_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.cities = {}
+        # Кэш общий для городов пакетного обхода
+        self._lock = threading.RLock()
+
+    def load(self):
+        """Загрузка кэша с диска (отсутствующий или битый файл = пустой кэш)."""
+        if not self.path.exists():
+            return self
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.cities = data.get('cities', {})
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Кэш {self.path.name} не прочитан, начинаю с пустого: {e}")
+            self.cities = {}
+        return self
+
+    def save(self):
+        """Атомарное сохранение кэша на диск (снимок под блокировкой)."""
+        with self._lock:
+            raw = json.dumps({'version': 1, 'cities': self.cities}, ensure_ascii=False, indent=2)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(raw)
+        tmp_path.replace(self.path)
+
+    @staticmethod
+    def operator_key(metadata):
+        """Ключ оператора: ОГРН, название или 'unknown'."""
+        operator = metadata.get('operator') or {}
+        return operator.get('ogrn') or operator.get('name') or 'unknown'
+
+    def get(self, city_id, now=None):
+        """
+        Свежие метаданные города (последний обновлённый оператор).
+
+        Returns:
+            dict {operator, subscription, currency, fetched_at} или None
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            operators = self.cities.get(city_id, {})
+            if not operators:
+                return None
+
+            entry = max(operators.values(), key=lambda e: e.get('fetched_at', 0))
+            if now - entry.get('fetched_at', 0) > self.ttl:
+                return None
+
+            metadata = {k: entry['metadata'].get(k, {}) for k in METADATA_SECTIONS}
+            metadata['fetched_at'] = entry.get('fetched_at')
+            return metadata
+
+    def store(self, city_id, metadata, now=None):
+        """
+        Сохранение метаданных города.
+
+        Returns:
+            bool: True, если метаданные изменились относительно кэша
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            key = self.operator_key(metadata)
+            fingerprint = metadata_fingerprint(metadata)
+
+            operators = self.cities.setdefault(city_id, {})
+            previous = operators.get(key)
+            changed = previous is None or previous.get('fingerprint') != fingerprint
+
+            operators[key] = {
+                'metadata': {k: metadata.get(k, {}) for k in METADATA_SECTIONS},
+                'fingerprint': fingerprint,
+                'fetched_at': now,
+                'changed_at': now if changed else previous.get('changed_at', now)
+            }
+            return changed
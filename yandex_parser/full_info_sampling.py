@@ -0,0 +1,137 @@
+"""
+Стратифицированная выборка для обогащения ценами и тарифами.
+
+В пределах города /offers/create почти всегда возвращает одинаковые цены,
+тариф и страховку - различаются в основном surge и заряд батареи. Вместо
+запроса для каждого самоката берём несколько самокатов из каждой ячейки
+сетки, оцениваем по ним цены ячейки и распространяем оценку на остальные
+самокаты с пометкой estimated.
+"""
+
+import hashlib
+from collections import Counter, defaultdict
+from statistics import median
+
+# Размер ячейки стратификации по умолчанию (~1×1 км)
+DEFAULT_SAMPLE_CELL_DEG = 0.01
+
+# Поля, оцениваемые модой (дискретные значения тарифа)
+MODE_PRICING_FIELDS = ['unlock_price', 'riding_price', 'parking_price', 'offer_type',
+                       'tariff_name', 'tariff_subname', 'tariff_short_name']
+
+# Поля, оцениваемые медианой (surge)
+MEDIAN_PRICING_FIELDS = ['surge_balance', 'surge_unlock_balance', 'surge_info_balance']
+
+
+def cell_of(geo, cell_deg):
+    """Ячейка сетки (x, y) для точки [lon, lat]."""
+    return (int(geo[0] // cell_deg), int(geo[1] // cell_deg))
+
+
+def group_by_cell(scooters, cell_deg=DEFAULT_SAMPLE_CELL_DEG):
+    """Группировка самокатов по ячейкам сетки. Возвращает dict: cell -> [scooter, ...]."""
+    cells = defaultdict(list)
+    for scooter in scooters:
+        geo = scooter.get('geo')
+        if geo:
+            cells[cell_of(geo, cell_deg)].append(scooter)
+    return cells
+
+
+def _stable_rank(scooter):
+    """Детерминированный псевдослучайный порядок (одинаковая выборка между запусками)."""
+    number = str(scooter.get('payload', {}).get('number') or scooter.get('id'))
+    return hashlib.md5(number.encode('utf-8')).hexdigest()
+
+
+def sample_scooters(cells, per_cell):
+    """
+    Выбор per_cell самокатов из каждой ячейки.
+
+    Args:
+        cells: dict cell -> [scooter, ...] (результат group_by_cell)
+        per_cell: int, количество самокатов на ячейку
+
+    Returns:
+        dict cell -> [scooter, ...] в порядке приоритета запроса;
+        после первых per_cell идут столько же запасных на случай ошибок
+    """
+    samples = {}
+    for cell, scooters in cells.items():
+        samples[cell] = sorted(scooters, key=_stable_rank)[:per_cell * 2]
+    return samples
+
+
+def _mode(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    return Counter(values).most_common(1)[0][0]
+
+
+def _median(values):
+    values = [v for v in values if isinstance(v, (int, float))]
+    return median(values) if values else None
+
+
+def estimate_pricing(full_infos):
+    """
+    Оценка цен, тарифа и страховки по выборке full_info.
+
+    Returns:
+        dict {pricing, insurance, samples} или None, если выборка пуста
+    """
+    if not full_infos:
+        return None
+
+    pricing = {}
+    for field in MODE_PRICING_FIELDS:
+        pricing[field] = _mode(fi.get('pricing', {}).get(field) for fi in full_infos)
+    for field in MEDIAN_PRICING_FIELDS:
+        pricing[field] = _median([fi.get('pricing', {}).get(field) for fi in full_infos])
+
+    insurance = {}
+    for field in ['type', 'immutable', 'price', 'coverage']:
+        insurance[field] = _mode(fi.get('insurance', {}).get(field) for fi in full_infos)
+
+    return {'pricing': pricing, 'insurance': insurance, 'samples': len(full_infos)}
+
+
+def nearest_estimate(cell, estimates):
+    """Оценка из ближайшей ячейки (для ячеек без успешных замеров)."""
+    if not estimates:
+        return None
+    nearest = min(estimates, key=lambda c: (c[0] - cell[0]) ** 2 + (c[1] - cell[1]) ** 2)
+    return estimates[nearest]
+
+
+def spread_estimates(cells, estimates):
+    """
+    Распространение оценок на самокаты без собственного full_info.
+
+    Самокат получает full_info с оценёнными pricing/insurance, пустым vehicle
+    (заряд не оценивается) и флагом estimated=True.
+
+    Returns:
+        int: количество самокатов с оценёнными данными
+    """
+    estimated = 0
+    for cell, scooters in cells.items():
+        estimate = estimates.get(cell) or nearest_estimate(cell, estimates)
+        if not estimate:
+            continue
+        for scooter in scooters:
+            if scooter.get('full_info'):
+                continue
+            scooter['full_info'] = {
+                'vehicle': {},
+                'pricing': dict(estimate['pricing']),
+                'insurance': dict(estimate['insurance']),
+                'operator': {},
+                'subscription': {},
+                'currency': {},
+                'estimated': True,
+                'estimate_samples': estimate['samples']
+            }
+            estimated += 1
+    return estimated
@@ -0,0 +1,313 @@
+"""
+Геометрия: принадлежность точек и bbox полигону, границы, центроиды и
+площади (Polygon, MultiPolygon).
+
+Обход планируется по bbox города, а зона обслуживания в cities.geojson -
+полигон, часто вытянутый или из нескольких частей. PreparedGeometry один
+раз раскладывает полигон на кольца с их bbox, после чего проверка точки -
+отсечение по bbox и чётность пересечений рёбер (дыры учитываются
+автоматически), а проверка bbox горячей зоны - вершины, углы и пересечение
+рёбер со сторонами прямоугольника.
+
+geometry_stats/collection_stats считают bbox, центроид (взвешенный по
+площади, с учётом дыр и частей MultiPolygon) и площадь в м²: кольцо
+проецируется на плоскость с масштабом долготы cos(средней широты)
+полигона, что для зон размером с город даёт ошибку площади в доли процента.
+"""
+
+import json
+import math
+from pathlib import Path
+
+from .cities import load_city_polygon
+from .errors import DataNotFoundError
+
+# Длина градуса широты и градуса долготы на экваторе, метров
+METERS_PER_DEG_LAT = 110574.0
+METERS_PER_DEG_LON_EQUATOR = 111320.0
+
+
+def meters_to_degrees(meters, lat):
+    """Перевод длины в метрах в (градусы долготы, градусы широты) на широте lat."""
+    cos_lat = max(math.cos(math.radians(lat)), 0.01)
+    return meters / (METERS_PER_DEG_LON_EQUATOR * cos_lat), meters / METERS_PER_DEG_LAT
+
+
+def _ring_bbox(ring):
+    lons = [c[0] for c in ring]
+    lats = [c[1] for c in ring]
+    return (min(lons), min(lats), max(lons), max(lats))
+
+
+def _bbox_disjoint(a, b):
+    return a[2] < b[0] or b[2] < a[0] or a[3] < b[1] or b[3] < a[1]
+
+
+def _ring_crossings(ring, lon, lat):
+    """Количество пересечений луча от точки вправо с рёбрами кольца."""
+    crossings = 0
+    x1, y1 = ring[-1][0], ring[-1][1]
+    for x2, y2, *_ in ring:
+        if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+            crossings += 1
+        x1, y1 = x2, y2
+    return crossings
+
+
+def _segment_intersects_bbox(x1, y1, x2, y2, bbox):
+    """Отсечение Лианга-Барского: пересекает ли отрезок прямоугольник."""
+    t0, t1 = 0.0, 1.0
+    dx, dy = x2 - x1, y2 - y1
+    for p, q in ((-dx, x1 - bbox[0]), (dx, bbox[2] - x1), (-dy, y1 - bbox[1]), (dy, bbox[3] - y1)):
+        if p == 0:
+            if q < 0:
+                return False
+            continue
+        t = q / p
+        if p < 0:
+            t0 = max(t0, t)
+        else:
+            t1 = min(t1, t)
+        if t0 > t1:
+            return False
+    return True
+
+
+def polygons_of(geojson):
+    """
+    Список полигонов (list колец [[lon, lat], ...]) из GeoJSON: геометрии
+    Polygon/MultiPolygon, Feature или FeatureCollection.
+    """
+    kind = geojson.get('type')
+    if kind == 'FeatureCollection':
+        return [polygon for feature in geojson.get('features', []) for polygon in polygons_of(feature)]
+    if kind == 'Feature':
+        return polygons_of(geojson.get('geometry') or {})
+    if kind == 'Polygon':
+        return [geojson['coordinates']]
+    if kind == 'MultiPolygon':
+        return list(geojson['coordinates'])
+    if kind == 'GeometryCollection':
+        return [polygon for geometry in geojson.get('geometries', []) for polygon in polygons_of(geometry)]
+    return []
+
+
+def _ring_moments(ring, kx):
+    """
+    Площадь (в градусах², долгота умножена на kx) и центроид [lon, lat]
+    кольца - формула шнурования относительно первой вершины (устойчива к
+    большим координатам, направление обхода не важно).
+    """
+    x0, y0 = ring[0][0], ring[0][1]
+    area = mx = my = 0.0
+    px = py = 0.0
+    for c in ring[1:]:
+        x, y = (c[0] - x0) * kx, c[1] - y0
+        cross = px * y - x * py
+        area += cross
+        mx += (px + x) * cross
+        my += (py + y) * cross
+        px, py = x, y
+    if area == 0:
+        return 0.0, None
+    return abs(area) / 2, [x0 + mx / (3 * area) / kx, y0 + my / (3 * area)]
+
+
+def _polygon_moments(rings):
+    """Площадь в м² и центроид полигона: внешнее кольцо минус дыры."""
+    lats = [c[1] for c in rings[0]]
+    kx = max(math.cos(math.radians((min(lats) + max(lats)) / 2)), 0.01)
+    area = mx = my = 0.0
+    for i, ring in enumerate(rings):
+        ring_area, centroid = _ring_moments(ring, kx)
+        if centroid is None:
+            continue
+        sign = 1 if i == 0 else -1
+        area += sign * ring_area
+        mx += sign * ring_area * centroid[0]
+        my += sign * ring_area * centroid[1]
+    if area <= 0:
+        return 0.0, None
+    return area * METERS_PER_DEG_LON_EQUATOR * METERS_PER_DEG_LAT, [mx / area, my / area]
+
+
+def geometry_stats(geojson):
+    """
+    bbox, центроид и площадь геометрии (Polygon/MultiPolygon, Feature или
+    FeatureCollection) за один проход.
+
+    Returns:
+        dict {'bbox': [min_lon, min_lat, max_lon, max_lat], 'centroid': [lon, lat],
+              'area_m2': float} или None, если полигонов нет. Центроид вырожденной
+              (нулевой площади) геометрии - среднее вершин внешних колец.
+    """
+    polygons = [[ring for ring in rings if len(ring) >= 3] for rings in polygons_of(geojson)]
+    polygons = [rings for rings in polygons if rings]
+    if not polygons:
+        return None
+
+    bboxes = [_ring_bbox([c for ring in rings for c in ring]) for rings in polygons]
+    area = mx = my = 0.0
+    for rings in polygons:
+        polygon_area, centroid = _polygon_moments(rings)
+        if centroid is not None:
+            area += polygon_area
+            mx += polygon_area * centroid[0]
+            my += polygon_area * centroid[1]
+
+    if area > 0:
+        centroid = [mx / area, my / area]
+    else:
+        outer = [c for rings in polygons for c in rings[0]]
+        centroid = [sum(c[0] for c in outer) / len(outer), sum(c[1] for c in outer) / len(outer)]
+
+    return {
+        'bbox': [min(b[0] for b in bboxes), min(b[1] for b in bboxes),
+                 max(b[2] for b in bboxes), max(b[3] for b in bboxes)],
+        'centroid': centroid,
+        'area_m2': area
+    }
+
+
+def geometry_bounds(geojson):
+    """bbox [min_lon, min_lat, max_lon, max_lat] по всем кольцам всех полигонов (None - полигонов нет)."""
+    bboxes = [_ring_bbox(ring) for rings in polygons_of(geojson) for ring in rings if ring]
+    if not bboxes:
+        return None
+    return [min(b[0] for b in bboxes), min(b[1] for b in bboxes),
+            max(b[2] for b in bboxes), max(b[3] for b in bboxes)]
+
+
+def collection_stats(feature_collection):
+    """
+    geometry_stats для каждого Feature коллекции.
+
+    Returns:
+        list of (feature, stats); Feature без полигонов пропускаются
+    """
+    result = []
+    for feature in feature_collection.get('features', []):
+        stats = geometry_stats(feature)
+        if stats is not None:
+            result.append((feature, stats))
+    return result
+
+
+class PreparedGeometry:
+    """Полигоны, подготовленные для массовых проверок точек и bbox."""
+
+    def __init__(self, polygons):
+        self.polygons = []  # [(bbox полигона, [кольца])]
+        for rings in polygons:
+            rings = [ring for ring in rings if len(ring) >= 3]
+            if rings:
+                self.polygons.append((_ring_bbox(rings[0]), rings))
+        if not self.polygons:
+            raise ValueError("В геометрии нет полигонов")
+        self.bbox = (
+            min(b[0] for b, _ in self.polygons), min(b[1] for b, _ in self.polygons),
+            max(b[2] for b, _ in self.polygons), max(b[3] for b, _ in self.polygons)
+        )
+
+    @classmethod
+    def from_geojson(cls, geojson):
+        return cls(polygons_of(geojson))
+
+    def contains(self, lon, lat):
+        """Точка внутри полигона (на границе - не определено)."""
+        for bbox, rings in self.polygons:
+            if bbox[0] <= lon <= bbox[2] and bbox[1] <= lat <= bbox[3]:
+                if sum(_ring_crossings(ring, lon, lat) for ring in rings) % 2:
+                    return True
+        return False
+
+    def filter_points(self, points):
+        """Точки [lon, lat] внутри полигона (порядок сохраняется)."""
+        if not points:
+            return []
+        min_lon, min_lat, max_lon, max_lat = self.bbox
+        return [p for p in points
+                if min_lon <= p[0] <= max_lon and min_lat <= p[1] <= max_lat and self.contains(p[0], p[1])]
+
+    def intersects_bbox(self, bbox):
+        """Пересекается ли прямоугольник [min_lon, min_lat, max_lon, max_lat] с полигоном."""
+        if _bbox_disjoint(self.bbox, bbox):
+            return False
+        for polygon_bbox, rings in self.polygons:
+            if _bbox_disjoint(polygon_bbox, bbox):
+                continue
+            outer = rings[0]
+            # Полигон внутри прямоугольника
+            if bbox[0] <= outer[0][0] <= bbox[2] and bbox[1] <= outer[0][1] <= bbox[3]:
+                return True
+            # Прямоугольник внутри полигона (в том числе не в дыре)
+            if sum(_ring_crossings(ring, bbox[0], bbox[1]) for ring in rings) % 2:
+                return True
+            # Границы пересекаются
+            for ring in rings:
+                x1, y1 = ring[-1][0], ring[-1][1]
+                for x2, y2, *_ in ring:
+                    if _segment_intersects_bbox(x1, y1, x2, y2, bbox):
+                        return True
+                    x1, y1 = x2, y2
+        return False
+
+    def clip_bbox(self, bbox):
+        """Пересечение bbox с охватом полигона или None, если они не пересекаются."""
+        clipped = [max(bbox[0], self.bbox[0]), max(bbox[1], self.bbox[1]),
+                   min(bbox[2], self.bbox[2]), min(bbox[3], self.bbox[3])]
+        if clipped[0] >= clipped[2] or clipped[1] >= clipped[3]:
+            return None
+        return clipped
+
+
+def load_area(path):
+    """
+    Область интереса из GeoJSON-файла (Polygon/MultiPolygon, Feature или FeatureCollection).
+
+    Raises:
+        DataNotFoundError: файла нет или в нём нет полигонов
+    """
+    path = Path(path)
+    if not path.exists():
+        raise DataNotFoundError(f"Ошибка: файл области {path} не найден!")
+    with open(path, 'r', encoding='utf-8') as f:
+        geojson = json.load(f)
+    try:
+        return PreparedGeometry.from_geojson(geojson)
+    except ValueError:
+        raise DataNotFoundError(f"Ошибка: в {path.name} нет полигонов (Polygon/MultiPolygon)")
+
+
+def load_city_area(city_id):
+    """
+    Полигон зоны обслуживания из cities.geojson или None, если его там нет
+    (обход тогда идёт по всему bbox, как раньше).
+    """
+    try:
+        feature = load_city_polygon(city_id)
+        return PreparedGeometry.from_geojson(feature)
+    except (DataNotFoundError, ValueError):
+        return None
+
+
+def add_area_arguments(parser):
+    """Добавляет в argparse общие флаги --area PATH и --no-area."""
+    parser.add_argument('--area', type=str, metavar='PATH',
+                        help='GeoJSON области интереса (Polygon/MultiPolygon): обход ограничивается её '
+                             'охватом, горячие зоны вне полигона не запрашиваются')
+    parser.add_argument('--no-area', action='store_true',
+                        help='Не отсекать горячие зоны по полигону зоны обслуживания из cities.geojson '
+                             '(обход всего bbox)')
+
+
+def area_from_args(args, zone_id=None):
+    """
+    Полигон обхода зоны по флагам add_area_arguments: область --area, иначе
+    полигон зоны обслуживания из cities.geojson (None - обход всего bbox).
+    """
+    if args.area:
+        return load_area(args.area)
+    if zone_id is None or args.no_area:
+        return None
+    return load_city_area(zone_id)
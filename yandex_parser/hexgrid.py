@@ -0,0 +1,258 @@
+"""
+Иерархическая шестиугольная сетка и агрегация самокатов для тепловых карт.
+
+Уровень 0 - шестиугольники радиуса cell_size_m в метрах Web Mercator (на
+местности - умножить на cos широты). Центры уровня L+1 - подрешётка
+индекса 7 центров уровня L (векторы (2, 1) и (-1, 3) в осевых координатах):
+родитель ячейки - ближайший центр подрешётки, то есть каждый родитель
+объединяет 7 детей ("цветок", как в H3). Родитель вычисляется целочисленной
+арифметикой по индексу ячейки, поэтому крупные уровни сворачиваются из
+уровня 0 без повторного прохода по точкам.
+
+HexAggregator раскладывает самокаты снимков по ячейкам уровня 0 и
+интервалам времени (bucket_s) и копит суммы - число самокатов, сумму и
+число значений заряда, самокаты в кластерах. Суммы складываются при
+свёртке, средние считаются в конце. Города снимаются в разные интервалы,
+поэтому ячейка помечается городами её снимков, а средние и доли делятся на
+число интервалов со снимками этих городов, а не всех.
+"""
+
+import math
+from datetime import datetime
+
+# Радиус Земли Web Mercator (EPSG:3857)
+EARTH_RADIUS_M = 6378137
+
+# Радиус ячейки уровня 0 (центр - вершина), метров Web Mercator (~57 м на широте 55°)
+DEFAULT_CELL_SIZE_M = 100
+
+# Уровней по умолчанию: площадь ячейки растёт в 7 раз на уровень
+DEFAULT_LEVELS = 4
+
+# Интервал времени для доступности, секунд
+DEFAULT_BUCKET_S = 3600
+
+SQRT3 = math.sqrt(3)
+
+# Вершины шестиугольника (острый верх) в осевых координатах относительно центра,
+# против часовой стрелки - внешнее кольцо по RFC 7946
+_CORNERS = [(1 / 3, 1 / 3), (-1 / 3, 2 / 3), (-2 / 3, 1 / 3), (-1 / 3, -1 / 3), (1 / 3, -2 / 3), (2 / 3, -1 / 3)]
+
+
+def _cube_round(q, r):
+    """Ближайшая ячейка к дробным осевым координатам."""
+    s = -q - r
+    rq, rr, rs = round(q), round(r), round(s)
+    dq, dr, ds = abs(rq - q), abs(rr - r), abs(rs - s)
+    if dq > dr and dq > ds:
+        rq = -rr - rs
+    elif dr > ds:
+        rr = -rq - rs
+    return int(rq), int(rr)
+
+
+def parent_cell(cell):
+    """Ячейка уровня L+1, содержащая ячейку (q, r) уровня L (ближайший центр подрешётки)."""
+    q, r = cell
+    return _cube_round((3 * q + r) / 7, (2 * r - q) / 7)
+
+
+def _to_level0(q, r, level):
+    """Осевые координаты центра ячейки уровня level в решётке уровня 0 (дробные для вершин)."""
+    for _ in range(level):
+        q, r = 2 * q - r, q + 3 * r
+    return q, r
+
+
+class HexGrid:
+    """Перевод lon/lat ↔ ячейки уровня 0 и геометрия ячеек любого уровня."""
+
+    def __init__(self, cell_size_m=DEFAULT_CELL_SIZE_M):
+        self.cell_size_m = cell_size_m
+
+    def cell_of(self, lon, lat):
+        """Ячейка (q, r) уровня 0 для точки."""
+        lat = max(-85.05112878, min(85.05112878, lat))
+        x = EARTH_RADIUS_M * math.radians(lon)
+        y = EARTH_RADIUS_M * math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+        return _cube_round((SQRT3 / 3 * x - y / 3) / self.cell_size_m, (2 / 3 * y) / self.cell_size_m)
+
+    def _lonlat(self, q, r):
+        x = self.cell_size_m * (SQRT3 * q + SQRT3 / 2 * r)
+        y = self.cell_size_m * 1.5 * r
+        return [round(math.degrees(x / EARTH_RADIUS_M), 7),
+                round(math.degrees(2 * math.atan(math.exp(y / EARTH_RADIUS_M)) - math.pi / 2), 7)]
+
+    def center(self, cell, level=0):
+        """[lon, lat] центра ячейки уровня level."""
+        return self._lonlat(*_to_level0(cell[0], cell[1], level))
+
+    def boundary(self, cell, level=0):
+        """GeoJSON Polygon ячейки: шестиугольник уровня 0, растянутый и повёрнутый, как подрешётка."""
+        ring = [self._lonlat(*_to_level0(cell[0] + dq, cell[1] + dr, level)) for dq, dr in _CORNERS]
+        ring.append(ring[0])
+        return {'type': 'Polygon', 'coordinates': [ring]}
+
+
+def cell_id(level, cell):
+    """Строковый id ячейки: уровень/q/r."""
+    return f'{level}/{cell[0]}/{cell[1]}'
+
+
+def bucket_of(timestamp, bucket_s=DEFAULT_BUCKET_S):
+    """Начало интервала времени (unix-секунды) для метки времени."""
+    return int(timestamp // bucket_s * bucket_s)
+
+
+def latest_per_bucket(snapshots, bucket_s=DEFAULT_BUCKET_S):
+    """
+    Последний снимок каждого города в каждом интервале (повторные обходы
+    одного города за интервал не удваивают самокаты).
+
+    Args:
+        snapshots: iterable (city_id, timestamp, features)
+
+    Returns:
+        list (city_id, timestamp, features) в порядке времени
+    """
+    latest = {}
+    for city_id, timestamp, features in snapshots:
+        key = (city_id, bucket_of(timestamp, bucket_s))
+        if key not in latest or timestamp > latest[key][1]:
+            latest[key] = (city_id, timestamp, features)
+    return sorted(latest.values(), key=lambda snapshot: snapshot[1])
+
+
+class HexAggregator:
+    """Суммы по ячейкам уровня 0 и интервалам времени со свёрткой на крупные уровни."""
+
+    # Поля сумм ячейки за интервал
+    FIELDS = ('scooters', 'charge_sum', 'charge_count', 'cluster_scooters')
+
+    def __init__(self, grid=None, bucket_s=DEFAULT_BUCKET_S):
+        self.grid = grid or HexGrid()
+        self.bucket_s = bucket_s
+        self.buckets = set()
+        self.points = 0
+        # (q, r) -> {bucket: [scooters, charge_sum, charge_count, cluster_scooters]}
+        self.cells = {}
+        # city_id -> интервалы со снимками города; (q, r) -> города ячейки
+        self.city_buckets = {}
+        self.cell_cities = {}
+
+    def add_snapshot(self, features, timestamp, city_id=None):
+        """Самокаты (type scooter) и кластеры (objects_count) одного снимка города city_id."""
+        bucket = bucket_of(timestamp, self.bucket_s)
+        self.buckets.add(bucket)
+        self.city_buckets.setdefault(city_id, set()).add(bucket)
+        cell_of = self.grid.cell_of
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') != 'Point':
+                continue
+            properties = feature.get('properties') or {}
+            kind = properties.get('type')
+            if kind not in ('scooter', 'cluster'):
+                continue
+            cell = cell_of(*geometry['coordinates'][:2])
+            sums = self.cells.setdefault(cell, {})
+            cities = self.cell_cities.get(cell)
+            if cities is None:
+                cities = self.cell_cities[cell] = set()
+            cities.add(city_id)
+            values = sums.get(bucket)
+            if values is None:
+                values = sums[bucket] = [0, 0.0, 0, 0]
+            if kind == 'cluster':
+                values[3] += properties.get('objects_count') or 0
+                continue
+            values[0] += 1
+            charge = properties.get('charge_level')
+            if charge is not None:
+                values[1] += charge
+                values[2] += 1
+            self.points += 1
+
+    def levels(self, count=DEFAULT_LEVELS):
+        """
+        Суммы уровней 0..count-1: каждый уровень - свёртка предыдущего по parent_cell.
+
+        Returns:
+            list dict (q, r) -> {bucket: [суммы FIELDS]}
+        """
+        result = [self.cells]
+        for _ in range(count - 1):
+            parents = {}
+            for cell, sums in result[-1].items():
+                target = parents.setdefault(parent_cell(cell), {})
+                for bucket, values in sums.items():
+                    total = target.get(bucket)
+                    if total is None:
+                        target[bucket] = list(values)
+                    else:
+                        for i, value in enumerate(values):
+                            total[i] += value
+            result.append(parents)
+        return result
+
+    def level_cities(self, level):
+        """Города ячеек уровня level: (q, r) -> set city_id (свёртка меток уровня 0)."""
+        result = {}
+        for cell, cities in self.cell_cities.items():
+            for _ in range(level):
+                cell = parent_cell(cell)
+            result.setdefault(cell, set()).update(cities)
+        return result
+
+    def observed_buckets(self, cities):
+        """Число интервалов, в которых есть снимок хотя бы одного из городов."""
+        return len(set().union(*(self.city_buckets.get(city, ()) for city in cities)))
+
+    def cell_summary(self, sums, observed=None):
+        """
+        Показатели ячейки по её суммам за интервалы: среднее и максимум
+        самокатов, доля интервалов с самокатами (из observed интервалов со
+        снимками городов ячейки; None - из всех), средний заряд и ряд по времени.
+        """
+        counts = {bucket: values[0] for bucket, values in sums.items()}
+        charge_count = sum(values[2] for values in sums.values())
+        total_buckets = (observed if observed is not None else len(self.buckets)) or 1
+        return {
+            'scooters_mean': round(sum(counts.values()) / total_buckets, 2),
+            'scooters_max': max(counts.values(), default=0),
+            'available_share': round(sum(1 for count in counts.values() if count > 0) / total_buckets, 3),
+            'mean_charge': round(sum(values[1] for values in sums.values()) / charge_count, 1)
+            if charge_count else None,
+            'cluster_scooters_mean': round(sum(values[3] for values in sums.values()) / total_buckets, 2),
+            'series': {datetime.fromtimestamp(bucket).isoformat(): counts[bucket] for bucket in sorted(counts)}
+        }
+
+    def to_geojson(self, level, cells):
+        """FeatureCollection шестиугольников уровня с показателями cell_summary."""
+        features = []
+        cell_cities = self.level_cities(level)
+        observed_by_cities = {}
+        for cell in sorted(cells):
+            cities = frozenset(cell_cities.get(cell, ()))
+            observed = observed_by_cities.get(cities)
+            if observed is None:
+                observed = observed_by_cities[cities] = self.observed_buckets(cities)
+            city_ids = sorted(str(city) for city in cities if city is not None)
+            features.append({
+                'type': 'Feature',
+                'id': cell_id(level, cell),
+                'geometry': self.grid.boundary(cell, level),
+                'properties': {'level': level, 'city_id': ','.join(city_ids) or None, 'buckets': observed,
+                               **self.cell_summary(cells[cell], observed)}
+            })
+        return {
+            'type': 'FeatureCollection',
+            'features': features,
+            'metadata': {
+                'level': level,
+                'cell_size_m': round(self.grid.cell_size_m * math.sqrt(7) ** level, 1),
+                'bucket_s': self.bucket_s,
+                'buckets': len(self.buckets),
+                'cells': len(features)
+            }
+        }
@@ -0,0 +1,151 @@
+"""
+Журнал обхода зоны города для продолжения после истечения токена.
+
+Обход с --with-full-info большого города длится дольше часа - жизни JWT
+токена, и TokenExpiredError ближе к концу означал повтор с нуля. Журнал
+дописывает в output/tmp/journal/<зона>.jsonl по строке на событие:
+план (горячие зоны этапа 2), каждый выполненный запрос /objects/discovery
+и полную информацию каждого самоката. Повторный запуск с теми же
+параметрами проигрывает журнал без запросов к API и продолжает с места
+остановки. После сохранения результата журнал удаляется.
+"""
+
+import json
+import re
+import threading
+import time
+from pathlib import Path
+
+from .paths import OUTPUT_DIR
+
+DEFAULT_JOURNAL_DIR = OUTPUT_DIR / 'tmp' / 'journal'
+
+# Журнал старше этого срока не продолжается: самокаты успели переместиться
+DEFAULT_MAX_AGE = 12 * 3600
+
+
+def _discovery_key(bbox, zoom):
+    return f"{zoom}|" + ','.join(f'{c:.7f}' for c in bbox)
+
+
+class CrawlJournal:
+    """Журнал одной зоны: план, ответы discovery и полная информация (потокобезопасный)."""
+
+    def __init__(self, path, params, max_age=DEFAULT_MAX_AGE):
+        self.path = Path(path)
+        # Параметры сравниваются после JSON (кортежи -> списки)
+        self.params = json.loads(json.dumps(params))
+        self.max_age = max_age
+        self.hot_zones = None
+        self.resumed = False
+        self._discovery = {}
+        self._full_info = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+    @classmethod
+    def open(cls, name, params, journal_dir=DEFAULT_JOURNAL_DIR, max_age=DEFAULT_MAX_AGE, resume=True):
+        """
+        Журнал зоны name. resume=False - начать заново, удалив прежний журнал.
+
+        Прежний журнал продолжается, только если совпадают параметры обхода
+        (bbox, режим, параметры сетки) и он не старше max_age.
+        """
+        safe_name = re.sub(r'[^\w.-]', '_', name)
+        journal = cls(Path(journal_dir) / f'{safe_name}.jsonl', params, max_age)
+        if resume:
+            journal.load()
+        journal._start()
+        return journal
+
+    def load(self):
+        """Чтение журнала; недописанная последняя строка (обрыв процесса) пропускается."""
+        if not self.path.exists():
+            return self
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+
+        if not records or records[0].get('kind') != 'header':
+            return self
+        header = records[0]
+        if header.get('params') != self.params or time.time() - header.get('started_at', 0) > self.max_age:
+            return self
+
+        for record in records[1:]:
+            kind = record.get('kind')
+            if kind == 'plan':
+                self.hot_zones = record['hot_zones']
+            elif kind == 'discovery':
+                self._discovery[record['key']] = record['data']
+            elif kind == 'full_info':
+                self._full_info[record['number']] = record['full_info']
+
+        self.resumed = True
+        return self
+
+    def _start(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.resumed:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        else:
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._append({'kind': 'header', 'params': self.params, 'started_at': time.time()})
+
+    def _append(self, record):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._file.flush()
+
+    def set_plan(self, hot_zones):
+        """План обхода - горячие зоны этапа 2."""
+        self.hot_zones = hot_zones
+        self._append({'kind': 'plan', 'hot_zones': hot_zones})
+
+    def discovery(self, bbox, zoom):
+        """Ответ ранее выполненного запроса (только objects) или None."""
+        with self._lock:
+            return self._discovery.get(_discovery_key(bbox, zoom))
+
+    def record_discovery(self, bbox, zoom, data):
+        # Этапам 3-4 нужны только объекты, без остальной части ответа
+        data = {'objects': data.get('objects', {})}
+        key = _discovery_key(bbox, zoom)
+        with self._lock:
+            self._discovery[key] = data
+        self._append({'kind': 'discovery', 'key': key, 'data': data})
+
+    def full_info(self, scooter_number):
+        with self._lock:
+            return self._full_info.get(scooter_number)
+
+    def record_full_info(self, scooter_number, full_info):
+        with self._lock:
+            self._full_info[scooter_number] = full_info
+        self._append({'kind': 'full_info', 'number': scooter_number, 'full_info': full_info})
+
+    def summary(self):
+        """Строка статистики для лога."""
+        with self._lock:
+            return (f"горячих зон: {len(self.hot_zones or [])}, запросов: {len(self._discovery)}, "
+                    f"полной информации: {len(self._full_info)}")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def remove(self):
+        """Удаление журнала после сохранения результата."""
+        self.close()
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,237 @@
+"""
+Метрики запросов и этапов парсинга с выгрузкой в Prometheus text format.
+
+Глобальный реестр registry собирает:
+- гистограммы задержек по endpoint;
+- количество ответов по кодам статуса, включая ответы из кэша (cached="true");
+- объём полученных данных;
+- гистограммы количества объектов в ответе;
+- длительность этапов (overview, clustering, detail, expansion, enrichment, ...);
+- произвольные gauge (например, запросов на найденный самокат).
+
+Если задан каталог вывода (registry.configure), после каждого этапа файл
+<job>.prom перезаписывается - его можно отдавать node_exporter через textfile
+collector и видеть прогресс расписанных запусков в реальном времени.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+# Границы гистограмм
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+OBJECTS_BUCKETS = (0, 1, 10, 50, 100, 250, 500, 1000, 5000)
+
+
+class Histogram:
+    """Кумулятивная гистограмма в стиле Prometheus."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'avg': round(self.sum / self.count, 6) if self.count else None,
+            'buckets': dict(zip((str(b) for b in self.buckets), self.counts))
+        }
+
+
+def _labels(**labels):
+    parts = [f'{k}="{str(v)}"' for k, v in labels.items()]
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Metrics:
+    """Реестр метрик одного запуска."""
+
+    def __init__(self):
+        self.job = None
+        self.output_dir = None
+        self.started_at = time.time()
+        self.requests = {}  # (endpoint, status, cached) -> count
+        self.latency = {}  # endpoint -> Histogram
+        self.bytes_received = {}  # endpoint -> bytes
+        self.objects = {}  # endpoint -> Histogram
+        self.stage_seconds = {}  # stage -> seconds
+        self.stage_runs = {}  # stage -> count
+        self.gauges = {}  # name -> value
+        self._lock = threading.RLock()  # запросы могут идти из нескольких потоков (пакетный режим)
+
+    def configure(self, output_dir, job):
+        """Включение выгрузки метрик в каталог output_dir с префиксом файлов job."""
+        self.output_dir = Path(output_dir) if output_dir else None
+        self.job = job
+        return self
+
+    def observe_request(self, endpoint, status, latency, nbytes=0, cached=False):
+        """
+        Учёт одного запроса к API.
+
+        Args:
+            endpoint: str, путь endpoint (/4.0/...)
+            status: int код ответа или 'error' при сетевой ошибке
+            latency: float, длительность запроса в секундах
+            nbytes: int, размер тела ответа
+            cached: True - ответ из кэша (ResponseCache), в задержку и объём не входит
+        """
+        key = (endpoint, str(status), bool(cached))
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+            if cached:
+                return
+            self.latency.setdefault(endpoint, Histogram(LATENCY_BUCKETS)).observe(latency)
+            self.bytes_received[endpoint] = self.bytes_received.get(endpoint, 0) + nbytes
+
+    def observe_objects(self, endpoint, objects):
+        """Учёт количества объектов в успешном ответе."""
+        with self._lock:
+            self.objects.setdefault(endpoint, Histogram(OBJECTS_BUCKETS)).observe(objects)
+
+    @contextmanager
+    def stage(self, name):
+        """Контекстный менеджер для замера длительности этапа."""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.time() - start)
+
+    def record_stage(self, name, seconds):
+        """Учёт длительности этапа, замеренной вызывающим кодом."""
+        with self._lock:
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+            self.stage_runs[name] = self.stage_runs.get(name, 0) + 1
+            self.flush()
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def requests_total(self, endpoint=None, cached=None):
+        """Число запросов; cached=False - только ушедшие в сеть, True - только из кэша."""
+        return sum(count for (ep, _, from_cache), count in self.requests.items()
+                   if (endpoint is None or ep == endpoint) and (cached is None or from_cache == cached))
+
+    def cache_hit_rate(self, endpoint):
+        """Доля ответов endpoint из кэша или None, если запросов не было."""
+        total = self.requests_total(endpoint)
+        return self.requests_total(endpoint, cached=True) / total if total else None
+
+    def to_prometheus(self):
+        """Метрики в Prometheus text exposition format."""
+        lines = []
+
+        lines.append('# HELP yandex_parser_requests_total Запросы к API по endpoint и статусу')
+        lines.append('# TYPE yandex_parser_requests_total counter')
+        for (endpoint, status, cached), count in sorted(self.requests.items()):
+            labels = _labels(endpoint=endpoint, status=status, cached=str(cached).lower())
+            lines.append(f'yandex_parser_requests_total{labels} {count}')
+
+        lines.append('# HELP yandex_parser_request_seconds Задержка запросов к API')
+        lines.append('# TYPE yandex_parser_request_seconds histogram')
+        for endpoint, hist in sorted(self.latency.items()):
+            lines.extend(self._histogram_lines('yandex_parser_request_seconds', hist, endpoint=endpoint))
+
+        lines.append('# HELP yandex_parser_response_bytes_total Получено байт по endpoint')
+        lines.append('# TYPE yandex_parser_response_bytes_total counter')
+        for endpoint, nbytes in sorted(self.bytes_received.items()):
+            lines.append(f'yandex_parser_response_bytes_total{_labels(endpoint=endpoint)} {nbytes}')
+
+        lines.append('# HELP yandex_parser_response_objects Объектов в одном ответе')
+        lines.append('# TYPE yandex_parser_response_objects histogram')
+        for endpoint, hist in sorted(self.objects.items()):
+            lines.extend(self._histogram_lines('yandex_parser_response_objects', hist, endpoint=endpoint))
+
+        lines.append('# HELP yandex_parser_stage_seconds Суммарная длительность этапа')
+        lines.append('# TYPE yandex_parser_stage_seconds gauge')
+        for stage, seconds in sorted(self.stage_seconds.items()):
+            lines.append(f'yandex_parser_stage_seconds{_labels(stage=stage)} {seconds:.6f}')
+
+        for name, value in sorted(self.gauges.items()):
+            lines.append(f'# TYPE yandex_parser_{name} gauge')
+            lines.append(f'yandex_parser_{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _histogram_lines(name, hist, **labels):
+        lines = []
+        for bound, count in zip(hist.buckets, hist.counts):
+            lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {count}')
+        lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {hist.count}')
+        lines.append(f'{name}_sum{_labels(**labels)} {hist.sum:.6f}')
+        lines.append(f'{name}_count{_labels(**labels)} {hist.count}')
+        return lines
+
+    def summary(self):
+        """JSON-сводка запуска."""
+        return {
+            'job': self.job,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(),
+            'elapsed_seconds': round(time.time() - self.started_at, 3),
+            'requests': {f'{ep} {status}{" cached" if cached else ""}': count
+                         for (ep, status, cached), count in sorted(self.requests.items())},
+            'requests_total': self.requests_total(),
+            'cache_hit_rate': {ep: round(self.cache_hit_rate(ep), 4)
+                               for ep in sorted({ep for ep, _, _ in self.requests})},
+            'latency': {ep: hist.to_dict() for ep, hist in self.latency.items()},
+            'bytes_received': self.bytes_received,
+            'objects_per_response': {ep: hist.to_dict() for ep, hist in self.objects.items()},
+            'stages': {name: {'seconds': round(sec, 3), 'runs': self.stage_runs.get(name, 0)}
+                       for name, sec in self.stage_seconds.items()},
+            'gauges': self.gauges
+        }
+
+    def flush(self):
+        """Перезапись файла .prom (если выгрузка включена)."""
+        if not self.output_dir:
+            return None
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        prom_path = self.output_dir / f'{self.job}.prom'
+        tmp_path = prom_path.with_suffix('.prom.tmp')
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+            tmp_path.replace(prom_path)
+        return prom_path
+
+    def write_summary(self):
+        """Финальная выгрузка: .prom и JSON-сводка. Возвращает путь к сводке."""
+        if not self.output_dir:
+            return None
+        self.flush()
+        summary_path = self.output_dir / f'{self.job}_summary.json'
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+        return summary_path
+
+
+def count_response_objects(data):
+    """Количество объектов в ответе discovery (objects + rowan) или polygons (features)."""
+    if not isinstance(data, dict):
+        return 0
+    if 'features' in data:
+        return len(data.get('features') or [])
+    total = 0
+    for section in ('objects', 'rowan'):
+        for obj_type in data.get(section, {}).get('objects_by_type', []):
+            total += len(obj_type.get('objects', []))
+    return total
+
+
+# Глобальный реестр метрик процесса
+registry = Metrics()
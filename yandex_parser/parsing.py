@@ -0,0 +1,247 @@
+"""
+Разбор ответов API и геометрия обхода: точки и объекты из /objects/discovery,
+полная информация из /offers/create, сетка горячих зон.
+"""
+
+from collections import defaultdict
+
+from .geometry import geometry_bounds
+
+
+def get_polygon_bbox(polygon_coords):
+    """
+    Вычисление bbox по координатам Polygon или одного кольца.
+    Для геометрии любого типа (в том числе MultiPolygon) - geometry.geometry_bounds.
+    """
+    if not isinstance(polygon_coords[0][0], list):
+        # Simple ring
+        polygon_coords = [polygon_coords]
+    return geometry_bounds({'type': 'Polygon', 'coordinates': polygon_coords})
+
+
+def extract_full_info_from_offer(offer_data):
+    """
+    Извлечение всей полезной информации из ответа /offers/create.
+    Возвращает dict с батареей, ценами, страховкой, оператором, подписками.
+    """
+    result = {
+        'vehicle': {},
+        'pricing': {},
+        'insurance': {},
+        'operator': {},
+        'subscription': {},
+        'currency': {}
+    }
+    
+    # Информация о самокате
+    vehicles = offer_data.get('vehicles', [])
+    if vehicles:
+        vehicle = vehicles[0]
+        result['vehicle'] = {
+            'uuid': vehicle.get('id'),
+            'model': vehicle.get('model'),
+            'vendor': vehicle.get('vendor'),
+            'image_tag': vehicle.get('image'),
+            'type': vehicle.get('type'),
+            'charge_level': vehicle.get('status', {}).get('charge_level'),
+            'remaining_distance': vehicle.get('status', {}).get('remaining_distance'),
+            'remaining_time': vehicle.get('status', {}).get('remaining_time')
+        }
+    
+    # Ценовая информация
+    offers = offer_data.get('offers', [])
+    if offers:
+        offer = offers[0]
+        prices = offer.get('prices', {})
+        surge = offer.get('surge', {})
+        
+        result['pricing'] = {
+            'offer_id': offer.get('offer_id'),
+            'offer_type': offer.get('type'),
+            'unlock_price': prices.get('unlock'),
+            'riding_price': prices.get('riding'),
+            'parking_price': prices.get('parking'),
+            'surge_balance': surge.get('balance', 0.0),
+            'surge_unlock_balance': surge.get('unlock_balance', 0.0),
+            'surge_info_balance': surge.get('info_balance', 0.0),
+            'tariff_name': offer.get('name'),
+            'tariff_subname': offer.get('subname'),
+            'tariff_short_name': offer.get('short_name')
+        }
+        
+        # Страховка
+        insurance = offer.get('insurance', {})
+        full_insurance = insurance.get('full_insurance_prices', {})
+        
+        result['insurance'] = {
+            'type': insurance.get('type'),
+            'immutable': insurance.get('is_immutable'),
+            'price': full_insurance.get('fixed_price'),
+            'coverage': full_insurance.get('coverage')
+        }
+        
+        # Парсинг информации об операторе из offer_details
+        offer_details = offer.get('texts', {}).get('offer_details', '')
+        if 'ОГРН' in offer_details:
+            # Простой парсинг (можно улучшить регулярками)
+            lines = offer_details.split('\n')
+            for i, line in enumerate(lines):
+                if 'ОГРН' in line:
+                    result['operator']['ogrn'] = line.split(':')[-1].strip()
+                if i == 0 and ('ООО' in line or 'ИП' in line or 'АО' in line):
+                    result['operator']['name'] = line.strip()
+    
+    # Подписки
+    passes = offer_data.get('passes', {})
+    super_passes = passes.get('super_passes', {})
+    purchase_window = super_passes.get('purchase_window', {})
+    
+    result['subscription'] = {
+        'title': purchase_window.get('title'),
+        'subtitle': purchase_window.get('subtitle'),
+        'packages': []
+    }
+    
+    pass_elements = purchase_window.get('pass_elements', [])
+    for element in pass_elements:
+        package = {
+            'pass_id': element.get('pass_id'),
+            'name': element.get('name'),
+            'description': element.get('description')
+        }
+        result['subscription']['packages'].append(package)
+    
+    # Валюта
+    currency_rules = offer_data.get('currency_rules', {})
+    result['currency'] = {
+        'code': currency_rules.get('code'),
+        'sign': currency_rules.get('sign'),
+        'text': currency_rules.get('text'),
+        'template': currency_rules.get('template')
+    }
+    
+    return result
+
+
+def extract_points_from_response(data):
+    """
+    Извлечение всех координат из ответа (любой формат).
+    Возвращает list of [lon, lat].
+    """
+    points = []
+    
+    # objects формат (детальный)
+    objects = data.get('objects', {})
+    for obj_type in objects.get('objects_by_type', []):
+        for obj in obj_type.get('objects', []):
+            if isinstance(obj, dict) and 'geo' in obj:
+                points.append(obj['geo'])
+            elif isinstance(obj, list) and len(obj) >= 2:
+                points.append(obj)
+    
+    # rowan формат (упрощенный)
+    rowan = data.get('rowan', {})
+    for obj_type in rowan.get('objects_by_type', []):
+        for coords in obj_type.get('objects', []):
+            if coords and len(coords) >= 2:
+                points.append(coords)
+    
+    return points
+
+
+def extract_detailed_objects(data):
+    """
+    Извлечение детальных объектов из objects формата.
+    Возвращает dict: {scooters: [...], clusters: [...]}
+    """
+    result = {
+        'scooters': [],
+        'clusters': [],
+        'cluster_empty': []
+    }
+    
+    objects = data.get('objects', {})
+    for obj_type in objects.get('objects_by_type', []):
+        type_name = obj_type.get('type')
+        objects_list = obj_type.get('objects', [])
+        
+        if type_name == 'scooter':
+            result['scooters'].extend(objects_list)
+        elif type_name == 'cluster':
+            result['clusters'].extend(objects_list)
+        elif type_name == 'cluster_empty':
+            result['cluster_empty'].extend(objects_list)
+    
+    return result
+
+
+def extract_parkings_only(data):
+    """Извлекает только парковки из ответа API."""
+    parkings = []
+    objects = data.get('objects', {})
+    
+    for obj_type in objects.get('objects_by_type', []):
+        type_name = obj_type.get('type')
+        if type_name in ['cluster', 'cluster_empty']:
+            for obj in obj_type.get('objects', []):
+                if isinstance(obj, dict):
+                    parkings.append(obj)
+    
+    return parkings
+
+
+def simple_cluster_points(points, grid_size_deg=0.02, grid_size_lat_deg=None):
+    """
+    Простая кластеризация точек в сетку.
+    Возвращает list of bboxes для "горячих" зон.
+    
+    grid_size_lat_deg - высота ячейки по широте, если отличается от ширины
+    (ячейка в метрах на широте города, см. autotune.meters_to_degrees).
+    """
+    if not points:
+        return []
+    
+    grid_size_lat_deg = grid_size_lat_deg or grid_size_deg
+    
+    # Находим общий bbox
+    lons = [p[0] for p in points]
+    lats = [p[1] for p in points]
+    min_lon, max_lon = min(lons), max(lons)
+    min_lat, max_lat = min(lats), max(lats)
+    
+    # Создаём сетку
+    grid = defaultdict(list)
+    
+    for point in points:
+        lon, lat = point
+        grid_x = int((lon - min_lon) / grid_size_deg)
+        grid_y = int((lat - min_lat) / grid_size_lat_deg)
+        grid[(grid_x, grid_y)].append(point)
+    
+    # Создаём bbox для непустых ячеек
+    hot_zones = []
+    for (grid_x, grid_y), cell_points in grid.items():
+        if len(cell_points) > 0:  # Любое количество точек
+            cell_min_lon = min_lon + grid_x * grid_size_deg
+            cell_min_lat = min_lat + grid_y * grid_size_lat_deg
+            cell_max_lon = cell_min_lon + grid_size_deg
+            cell_max_lat = cell_min_lat + grid_size_lat_deg
+            
+            hot_zones.append({
+                'bbox': [cell_min_lon, cell_min_lat, cell_max_lon, cell_max_lat],
+                'points_count': len(cell_points)
+            })
+    
+    return hot_zones
+
+
+def shrink_bbox_around_point(point, size_deg=0.005, size_lat_deg=None):
+    """Создание маленького bbox вокруг точки."""
+    lon, lat = point
+    size_lat_deg = size_lat_deg or size_deg
+    return [
+        lon - size_deg,
+        lat - size_lat_deg,
+        lon + size_deg,
+        lat + size_lat_deg
+    ]
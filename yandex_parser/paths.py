@@ -0,0 +1,32 @@
+"""
+Каталог данных: cities_list.csv, config.json, city_params.json и output/.
+
+Скрипты репозитория работают с каталогом репозитория, как и раньше. Пакет,
+установленный отдельно, не может искать данные рядом с собой, поэтому
+каталог выбирается так:
+- переменная окружения YANDEX_PARSER_HOME, если задана;
+- каталог репозитория, если пакет лежит в нём (рядом cities_list.csv или
+  config.json.example);
+- иначе текущий каталог.
+
+Все пути по умолчанию (DEFAULT_*_PATH модулей) строятся от ROOT_DIR, а
+функции принимают явные пути - сервису достаточно передать свои.
+"""
+
+import os
+from pathlib import Path
+
+_REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+def _data_dir():
+    home = os.environ.get('YANDEX_PARSER_HOME')
+    if home:
+        return Path(home).expanduser()
+    if (_REPO_DIR / 'cities_list.csv').exists() or (_REPO_DIR / 'config.json.example').exists():
+        return _REPO_DIR
+    return Path.cwd()
+
+
+ROOT_DIR = _data_dir()
+OUTPUT_DIR = ROOT_DIR / 'output'
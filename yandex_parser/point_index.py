@@ -0,0 +1,143 @@
+"""
+Сеточный индекс точечных объектов (самокаты, парковки) в памяти.
+
+Точки раскладываются по ячейкам равной сетки в градусах; запросы bbox,
+радиуса и k ближайших перебирают только ячейки рядом с точкой запроса.
+Расстояния - в метрах по равнопромежуточной проекции на широте запроса
+(на радиусах в километры погрешность меньше метра).
+"""
+
+import math
+
+from .geometry import METERS_PER_DEG_LAT, METERS_PER_DEG_LON_EQUATOR
+
+# Сторона ячейки сетки, метров по широте (~0.0045°)
+DEFAULT_CELL_M = 500
+
+
+class PointIndex:
+    """Точечные Feature в сетке ячеек с запросами bbox, radius и nearest."""
+
+    def __init__(self, features, cell_m=DEFAULT_CELL_M):
+        """
+        Args:
+            features: GeoJSON Feature; учитываются только Point
+            cell_m: сторона ячейки в метрах по широте (по долготе - те же градусы)
+        """
+        self.cell = cell_m / METERS_PER_DEG_LAT
+        self.features = []
+        self._coords = []
+        self._cells = {}
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') != 'Point':
+                continue
+            lon, lat = geometry['coordinates'][:2]
+            self._cells.setdefault(self._cell_of(lon, lat), []).append(len(self.features))
+            self.features.append(feature)
+            self._coords.append((lon, lat))
+        self.size = len(self.features)
+
+    def _cell_of(self, lon, lat):
+        return (math.floor(lon / self.cell), math.floor(lat / self.cell))
+
+    def _distance_m(self, i, lon, lat, kx):
+        dx = (self._coords[i][0] - lon) * kx
+        dy = (self._coords[i][1] - lat) * METERS_PER_DEG_LAT
+        return math.hypot(dx, dy)
+
+    def _cell_distance_m(self, cell, lon, lat, kx):
+        """Расстояние от точки до прямоугольника ячейки (0 - точка внутри)."""
+        x0, y0 = cell[0] * self.cell, cell[1] * self.cell
+        dx = max(x0 - lon, lon - x0 - self.cell, 0) * kx
+        dy = max(y0 - lat, lat - y0 - self.cell, 0) * METERS_PER_DEG_LAT
+        return math.hypot(dx, dy)
+
+    def _cells_in(self, x0, y0, x1, y1):
+        """Занятые ячейки в диапазоне (большой диапазон - перебором занятых ячеек)."""
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self._cells):
+            return [cell for cell in self._cells if x0 <= cell[0] <= x1 and y0 <= cell[1] <= y1]
+        return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1) if (x, y) in self._cells]
+
+    def bbox(self, bbox, limit=None):
+        """Feature в bbox [min_lon, min_lat, max_lon, max_lat] (не больше limit)."""
+        found = []
+        for cell in self._cells_in(*self._cell_of(bbox[0], bbox[1]), *self._cell_of(bbox[2], bbox[3])):
+            for i in self._cells[cell]:
+                lon, lat = self._coords[i]
+                if bbox[0] <= lon <= bbox[2] and bbox[1] <= lat <= bbox[3]:
+                    found.append(self.features[i])
+                    if limit is not None and len(found) >= limit:
+                        return found
+        return found
+
+    def radius(self, lon, lat, radius_m, limit=None):
+        """list (расстояние м, Feature) в радиусе radius_m, по возрастанию расстояния."""
+        kx = METERS_PER_DEG_LON_EQUATOR * max(math.cos(math.radians(lat)), 0.01)
+        dlon, dlat = radius_m / kx, radius_m / METERS_PER_DEG_LAT
+        found = []
+        for cell in self._cells_in(*self._cell_of(lon - dlon, lat - dlat), *self._cell_of(lon + dlon, lat + dlat)):
+            for i in self._cells[cell]:
+                distance = self._distance_m(i, lon, lat, kx)
+                if distance <= radius_m:
+                    found.append((distance, i))
+        found.sort()
+        return [(distance, self.features[i]) for distance, i in found[:limit]]
+
+    def nearest(self, lon, lat, k=1, max_distance_m=None):
+        """
+        k ближайших: list (расстояние м, Feature) по возрастанию расстояния.
+        Кольца ячеек вокруг точки перебираются, пока k-е расстояние не
+        окажется ближе следующего кольца.
+        """
+        if not self._cells or k <= 0:
+            return []
+        kx = METERS_PER_DEG_LON_EQUATOR * max(math.cos(math.radians(lat)), 0.01)
+        # Точка кольца r (по Чебышёву от ячейки запроса) не ближе (r - 1) ячеек по более узкой стороне
+        ring_m = self.cell * min(kx, METERS_PER_DEG_LAT)
+        cx, cy = self._cell_of(lon, lat)
+        found = []
+
+        def done(next_ring):
+            """Все непросмотренные ячейки - в кольцах >= next_ring."""
+            bound = (next_ring - 1) * ring_m
+            if max_distance_m is not None and bound > max_distance_m:
+                return True
+            if len(found) < k:
+                return False
+            found.sort()
+            del found[k:]
+            return found[-1][0] <= bound
+
+        r = 0
+        while (2 * r + 1) ** 2 <= len(self._cells):
+            if r == 0:
+                ring = [(cx, cy)]
+            else:
+                ring = [(x, y) for x in range(cx - r, cx + r + 1) for y in (cy - r, cy + r)]
+                ring += [(x, y) for x in (cx - r, cx + r) for y in range(cy - r + 1, cy + r)]
+            for cell in ring:
+                for i in self._cells.get(cell, ()):
+                    found.append((self._distance_m(i, lon, lat, kx), i))
+            r += 1
+            if done(r):
+                break
+        else:
+            # Кольца покрыли больше ячеек, чем занято (точка далеко от данных): остальные
+            # занятые ячейки - по расстоянию до их границы, пока оно меньше k-го найденного
+            rest = sorted((self._cell_distance_m(cell, lon, lat, kx), cell) for cell in self._cells
+                          if max(abs(cell[0] - cx), abs(cell[1] - cy)) >= r)
+            for bound, cell in rest:
+                if max_distance_m is not None and bound > max_distance_m:
+                    break
+                if len(found) >= k:
+                    found.sort()
+                    del found[k:]
+                    if found[-1][0] <= bound:
+                        break
+                for i in self._cells[cell]:
+                    found.append((self._distance_m(i, lon, lat, kx), i))
+
+        found.sort()
+        return [(distance, self.features[i]) for distance, i in found[:k]
+                if max_distance_m is None or distance <= max_distance_m]
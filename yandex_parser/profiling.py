@@ -0,0 +1,186 @@
+"""
+Профилирование CPU и памяти по этапам парсинга (--profile).
+
+Для каждого этапа (overview, clustering, detail, ... в fetch_scooters;
+stage1_known / stage2_search в fetch_cities; zones / merge в fetch_zones)
+записываются:
+- <job>_<NN>_<stage>.pstats - профиль cProfile (смотреть через
+  `python3 -m pstats` или snakeviz);
+- <job>_allocations.txt - топ-N мест выделения памяти за этап (tracemalloc)
+  и топ-N функций по cumulative time.
+
+Рабочие потоки (FairScheduler, загрузка тайлов зон) профилируются каждая
+задача своим cProfile в worker_scope; при закрытии этапа профили задач,
+завершившихся за этап, сливаются с профилем основного потока в один .pstats.
+tracemalloc и так видит выделения во всех потоках. В Python 3.12+ cProfile
+работает через sys.monitoring, и второй профиль при активном профиле этапа
+не включается (ValueError) - тогда задачи выполняются без своего профиля, а
+в отчёте этапа отмечается, сколько их было.
+
+Чтобы отделить локальный CPU от сети, запустите повторно с --response-cache:
+ответы будут браться из кэша, и в профиле останется только локальная работа
+(разбор JSON, геометрия, сериализация).
+"""
+
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+from .paths import OUTPUT_DIR
+
+# Сколько строк выводить в отчётах
+DEFAULT_TOP_N = 25
+
+# Каталог по умолчанию для --profile без аргумента
+DEFAULT_PROFILE_DIR = OUTPUT_DIR / 'profile'
+
+
+class StageProfiler:
+    """Профилировщик этапов: cProfile + снимки tracemalloc до/после этапа."""
+
+    def __init__(self):
+        self.output_dir = None
+        self.job = None
+        self.top_n = DEFAULT_TOP_N
+        self.counter = 0
+        self._active = None  # (name, profile, snapshot, started_at)
+        self._workers = None  # pstats.Stats задач рабочих потоков за текущий этап
+        self._worker_tasks = 0
+        self._worker_threads = set()
+        self._worker_skipped = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def enabled(self):
+        return self.output_dir is not None
+
+    def configure(self, output_dir, job, top_n=DEFAULT_TOP_N):
+        """Включение профилирования (output_dir=None - выключено)."""
+        self.output_dir = Path(output_dir) if output_dir else None
+        self.job = job
+        self.top_n = top_n
+        if self.enabled:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            report_path = self.output_dir / f'{self.job}_allocations.txt'
+            report_path.write_text(f'=== {self.job}: профиль по этапам ===\n', encoding='utf-8')
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+        return self
+
+    def start(self, name):
+        """Начало этапа name (предыдущий незавершённый этап закрывается)."""
+        if not self.enabled:
+            return
+        if self._active:
+            self.stop()
+        profile = cProfile.Profile()
+        snapshot = tracemalloc.take_snapshot()
+        with self._lock:
+            self._workers = pstats.Stats()
+            self._worker_tasks = 0
+            self._worker_threads = set()
+            self._worker_skipped = 0
+        profile.enable()
+        self._active = (name, profile, snapshot, time.time())
+
+    @contextmanager
+    def worker_scope(self):
+        """
+        Профиль задачи рабочего потока: отдельный cProfile на время задачи,
+        по завершении добавляется к текущему этапу (вне этапа - отбрасывается).
+        """
+        if not self.enabled or self._active is None or getattr(self._local, 'busy', False):
+            yield
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+: уже активен профиль этапа - задача идёт без своего профиля
+            with self._lock:
+                self._worker_skipped += 1
+            yield
+            return
+        self._local.busy = True
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._local.busy = False
+            profile.create_stats()
+            with self._lock:
+                if self._workers is not None:
+                    self._workers.add(profile)
+                    self._worker_tasks += 1
+                    self._worker_threads.add(threading.current_thread().name)
+
+    def stop(self):
+        """Завершение текущего этапа и запись отчётов (профиль основного потока и задач рабочих)."""
+        if not self.enabled or not self._active:
+            return None
+        name, profile, snapshot_before, started_at = self._active
+        profile.disable()
+        self._active = None
+        with self._lock:
+            workers, worker_tasks, worker_threads = self._workers, self._worker_tasks, len(self._worker_threads)
+            worker_skipped = self._worker_skipped
+            self._workers = None
+        elapsed = time.time() - started_at
+
+        snapshot_after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+
+        self.counter += 1
+        safe_name = name.replace('/', '_').replace(' ', '_')
+        pstats_path = self.output_dir / f'{self.job}_{self.counter:02d}_{safe_name}.pstats'
+        cpu_report = io.StringIO()
+        stats = pstats.Stats(profile, stream=cpu_report)
+        if worker_tasks:
+            stats.add(workers)
+        stats.dump_stats(str(pstats_path))
+        stats.sort_stats('cumulative').print_stats(self.top_n)
+
+        alloc_diff = snapshot_after.compare_to(snapshot_before, 'lineno')
+
+        report_path = self.output_dir / f'{self.job}_allocations.txt'
+        with open(report_path, 'a', encoding='utf-8') as f:
+            f.write(f'\n--- Этап {self.counter}: {name} ({elapsed:.2f} сек) ---\n')
+            f.write(f'Память: текущая {current / 1024 / 1024:.1f} MB, пик {peak / 1024 / 1024:.1f} MB\n')
+            f.write(f'Профиль CPU: {pstats_path.name}'
+                    f' (основной поток + {worker_tasks} задач в {worker_threads} рабочих потоках)\n')
+            if worker_skipped:
+                f.write(f'Без профиля: {worker_skipped} задач рабочих потоков '
+                        f'(второй cProfile не включается при активном профиле этапа)\n')
+            f.write('\n')
+            f.write(f'Топ-{self.top_n} выделений памяти за этап:\n')
+            for stat in alloc_diff[:self.top_n]:
+                f.write(f'  {stat}\n')
+            f.write(f'\nТоп-{self.top_n} функций по cumulative time:\n')
+            f.write(cpu_report.getvalue())
+
+        tracemalloc.reset_peak()
+        return pstats_path
+
+    def finish(self):
+        """Закрытие незавершённого этапа. Возвращает путь к сводному отчёту."""
+        if not self.enabled:
+            return None
+        self.stop()
+        return self.output_dir / f'{self.job}_allocations.txt'
+
+
+# Глобальный профилировщик процесса
+profiler = StageProfiler()
+
+
+def add_profile_argument(parser):
+    """Добавляет в argparse общий флаг --profile [DIR]."""
+    parser.add_argument('--profile', nargs='?', const=str(DEFAULT_PROFILE_DIR), metavar='DIR',
+                        help='Профилировать CPU и память по этапам, включая задачи рабочих потоков; '
+                             'отчёты в DIR (по умолчанию: output/profile)')
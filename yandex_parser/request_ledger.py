@@ -0,0 +1,218 @@
+"""
+Журнал запросов к API для офлайн-подбора параметров обхода.
+
+Каждый запрос дописывается одной JSON-строкой в output/tmp/request_ledger.jsonl:
+endpoint, bbox и его площадь, zoom, задержка, статус, размер ответа,
+количество объектов по типам, размеры кластеров и оценка числа объектов,
+отброшенных у краёв bbox (API не возвращает объекты у границ области).
+Ответы из кэша (ResponseCache) тоже записываются, с "cached": true и
+нулевой задержкой.
+
+Контекст (город, скрипт, параметры сетки) задаётся через set_context и
+добавляется в каждую запись - так анализ в analyze_ledger.py может сравнить,
+например, grid_size_deg=0.02 и 0.01 по числу объектов на запрос.
+Контекст хранится отдельно для каждого потока: при пакетном обходе городы
+обрабатываются параллельно, и запрос в рабочем потоке получает контекст
+города, поставившего его в очередь (см. context_scope).
+"""
+
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from .paths import OUTPUT_DIR, ROOT_DIR
+
+# Путь к журналу по умолчанию
+DEFAULT_LEDGER_PATH = OUTPUT_DIR / 'tmp' / 'request_ledger.jsonl'
+
+
+def bbox_area_km2(bbox):
+    """Площадь bbox [min_lon, min_lat, max_lon, max_lat] в км² (равнопромежуточное приближение)."""
+    if not bbox or len(bbox) != 4:
+        return None
+    mean_lat = math.radians((bbox[1] + bbox[3]) / 2)
+    width_km = abs(bbox[2] - bbox[0]) * 111.32 * math.cos(mean_lat)
+    height_km = abs(bbox[3] - bbox[1]) * 110.57
+    return width_km * height_km
+
+
+def count_objects_by_type(data):
+    """Количество объектов в ответе по типам (discovery: objects/rowan, polygons: properties.type)."""
+    counts = {}
+    if not isinstance(data, dict):
+        return counts
+
+    for feature in data.get('features') or []:
+        zone_type = feature.get('properties', {}).get('type') or 'feature'
+        counts[zone_type] = counts.get(zone_type, 0) + 1
+
+    for section in ('objects', 'rowan'):
+        for obj_type in data.get(section, {}).get('objects_by_type', []):
+            type_name = obj_type.get('type') or section
+            counts[type_name] = counts.get(type_name, 0) + len(obj_type.get('objects', []))
+
+    return counts
+
+
+def response_cluster_sizes(data):
+    """Размеры (payload.objects_count) кластеров ответа discovery - для подбора порога раскрытия."""
+    sizes = []
+    if not isinstance(data, dict):
+        return sizes
+    for obj_type in data.get('objects', {}).get('objects_by_type', []):
+        if obj_type.get('type') != 'cluster':
+            continue
+        for obj in obj_type.get('objects', []):
+            if isinstance(obj, dict):
+                sizes.append(obj.get('payload', {}).get('objects_count') or 0)
+    return sizes
+
+
+def response_points(data):
+    """Координаты точечных объектов ответа discovery."""
+    points = []
+    if not isinstance(data, dict):
+        return points
+    for section in ('objects', 'rowan'):
+        for obj_type in data.get(section, {}).get('objects_by_type', []):
+            for obj in obj_type.get('objects', []):
+                if isinstance(obj, dict) and obj.get('geo'):
+                    points.append(obj['geo'])
+                elif isinstance(obj, list) and len(obj) >= 2:
+                    points.append(obj)
+    return points
+
+
+def estimate_edge_dropped(bbox, points):
+    """
+    Оценка числа объектов, отброшенных у краёв bbox.
+
+    API возвращает объекты только из внутренней части области. Считаем, что
+    плотность в отброшенной полосе такая же, как в покрытой части
+    (bbox фактически возвращённых точек), и экстраполируем на всю площадь.
+    """
+    if not bbox:
+        return None
+    points = [p for p in points if bbox[0] <= p[0] <= bbox[2] and bbox[1] <= p[1] <= bbox[3]]
+    if len(points) < 2:
+        return None
+    lons = [p[0] for p in points]
+    lats = [p[1] for p in points]
+    covered = (max(lons) - min(lons)) * (max(lats) - min(lats))
+    total = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+    if covered <= 0 or total <= 0 or covered >= total:
+        return 0
+    return int(round(len(points) * (total - covered) / covered))
+
+
+class RequestLedger:
+    """Дописываемый JSONL-журнал запросов."""
+
+    def __init__(self):
+        self.path = None
+        self.context = {}  # общий контекст процесса (configure)
+        self._local = threading.local()  # контекст потока (set_context)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def configure(self, path, **context):
+        """Включение журнала (path=None - выключено) и установка общего контекста."""
+        self.path = Path(path) if path else None
+        self.context = dict(context)
+        self._local.context = {}
+        if self.enabled:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        return self
+
+    def _thread_context(self):
+        if not hasattr(self._local, 'context'):
+            self._local.context = {}
+        return self._local.context
+
+    def set_context(self, **context):
+        """Обновление контекста текущего потока (None удаляет ключ)."""
+        self._thread_context().update(context)
+
+    def get_context(self):
+        """Итоговый контекст текущего потока (общий + потоковый)."""
+        merged = dict(self.context)
+        merged.update(self._thread_context())
+        return {key: value for key, value in merged.items() if value is not None}
+
+    @contextmanager
+    def context_scope(self, context):
+        """Временная подмена контекста потока (снимок get_context другого потока)."""
+        previous = self._thread_context()
+        self._local.context = dict(context)
+        try:
+            yield
+        finally:
+            self._local.context = previous
+
+    def record(self, endpoint, bbox, zoom, status, latency, nbytes=0, data=None, cached=False):
+        """Запись одного запроса в журнал (cached=True - ответ из кэша, без обращения к API)."""
+        if not self.enabled:
+            return
+
+        entry = {
+            'ts': round(time.time(), 3),
+            'endpoint': endpoint,
+            'status': status,
+            'latency': round(latency, 4),
+            'bytes': nbytes,
+            'zoom': zoom,
+            'bbox': [round(c, 6) for c in bbox] if bbox else None,
+            'area_km2': round(bbox_area_km2(bbox), 4) if bbox else None
+        }
+        if cached:
+            entry['cached'] = True
+
+        if data is not None:
+            counts = count_objects_by_type(data)
+            entry['objects'] = counts
+            entry['objects_total'] = sum(counts.values())
+            entry['edge_dropped_est'] = estimate_edge_dropped(bbox, response_points(data))
+            cluster_sizes = response_cluster_sizes(data)
+            if cluster_sizes:
+                entry['cluster_sizes'] = cluster_sizes
+
+        entry.update(self.get_context())
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+def read_ledger(path=DEFAULT_LEDGER_PATH):
+    """Чтение журнала (битые строки пропускаются)."""
+    entries = []
+    path = Path(path)
+    if not path.exists():
+        return entries
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+
+def add_ledger_argument(parser):
+    """Добавляет в argparse общий флаг --no-ledger."""
+    parser.add_argument('--no-ledger', action='store_true',
+                        help=f'Не записывать журнал запросов ({DEFAULT_LEDGER_PATH.relative_to(ROOT_DIR)})')
+
+
+# Глобальный журнал процесса
+ledger = RequestLedger()
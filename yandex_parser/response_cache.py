@@ -0,0 +1,173 @@
+"""
+Дисковый кэш ответов API с адресацией по содержимому запроса.
+
+Используется для /objects/discovery и /layers/v1/polygons: при разработке и
+перезапуске упавшего города одни и те же bbox запрашиваются повторно через
+несколько минут, а полигоны городов и зон меняются не чаще раза в несколько часов.
+
+Ключ - SHA-256 от нормализованного запроса: endpoint, bbox, округлённый до
+сетки, zoom и mode. У каждого endpoint свой TTL; при превышении общего размера
+вытесняются записи, к которым дольше всего не обращались (LRU).
+"""
+
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+
+from .paths import OUTPUT_DIR
+
+# Директория кэша по умолчанию
+DEFAULT_CACHE_DIR = OUTPUT_DIR / 'cache' / 'responses'
+
+# Шаг округления bbox (~10 м)
+DEFAULT_BBOX_GRID_DEG = 0.0001
+
+# Максимальный размер кэша по умолчанию
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# TTL по endpoint (в секундах)
+DEFAULT_TTLS = {
+    '/4.0/eboks/scooters/v1/objects/discovery': 5 * 60,  # самокаты двигаются
+    '/4.0/layers/v1/polygons': 6 * 3600  # полигоны городов и зон почти статичны
+}
+
+
+def normalize_request(endpoint, bbox, zoom, mode=None, grid_deg=DEFAULT_BBOX_GRID_DEG):
+    """Нормализованное представление запроса (bbox округлён до сетки)."""
+    return {
+        'endpoint': endpoint,
+        'bbox': [round(round(c / grid_deg) * grid_deg, 7) for c in bbox],
+        'zoom': round(float(zoom), 2),
+        'mode': mode
+    }
+
+
+def request_key(normalized):
+    """SHA-256 ключ нормализованного запроса."""
+    raw = json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Дисковый кэш ответов с TTL по endpoint, LRU-вытеснением и счётчиками."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttls=None, max_bytes=DEFAULT_MAX_BYTES,
+                 grid_deg=DEFAULT_BBOX_GRID_DEG):
+        self.cache_dir = Path(cache_dir)
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_bytes = max_bytes
+        self.grid_deg = grid_deg
+        self.index_path = self.cache_dir / 'index.json'
+        self.index = {}
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'stores': 0, 'evictions': 0}
+        # Кэш общий для рабочих потоков; save() может прийти из паузы на обновление токена
+        self._lock = threading.RLock()
+        self._load_index()
+
+    def _load_index(self):
+        if not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def _path(self, key):
+        return self.cache_dir / key[:2] / f'{key}.json'
+
+    def _remove(self, key):
+        self.index.pop(key, None)
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(entry.get('size', 0) for entry in self.index.values())
+
+    def get(self, endpoint, bbox, zoom, mode=None, now=None):
+        """
+        Поиск ответа в кэше.
+
+        Returns:
+            dict ответа или None (промах или истёкший TTL)
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            key = request_key(normalize_request(endpoint, bbox, zoom, mode, self.grid_deg))
+            entry = self.index.get(key)
+
+            if not entry:
+                self.stats['misses'] += 1
+                return None
+
+            if now - entry.get('created', 0) > self.ttls.get(endpoint, 0):
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                self._remove(key)
+                return None
+
+            try:
+                with open(self._path(key), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                self.stats['misses'] += 1
+                self._remove(key)
+                return None
+
+            entry['accessed'] = now
+            self.stats['hits'] += 1
+            return data
+
+    def put(self, endpoint, bbox, zoom, data, mode=None, now=None):
+        """Сохранение ответа в кэш (только для endpoint с TTL)."""
+        if endpoint not in self.ttls:
+            return
+        now = now if now is not None else time.time()
+        with self._lock:
+            key = request_key(normalize_request(endpoint, bbox, zoom, mode, self.grid_deg))
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+            raw = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            with open(path, 'wb') as f:
+                f.write(raw)
+
+            self.index[key] = {'endpoint': endpoint, 'size': len(raw), 'created': now, 'accessed': now}
+            self.stats['stores'] += 1
+            self.evict()
+
+    def evict(self):
+        """Вытеснение давно неиспользованных записей до укладывания в max_bytes."""
+        with self._lock:
+            total = self.total_bytes()
+            if total <= self.max_bytes:
+                return
+            for key, entry in sorted(self.index.items(), key=lambda item: item[1].get('accessed', 0)):
+                if total <= self.max_bytes:
+                    break
+                total -= entry.get('size', 0)
+                self._remove(key)
+                self.stats['evictions'] += 1
+
+    def save(self):
+        """Сохранение индекса кэша на диск (снимок индекса под блокировкой)."""
+        with self._lock:
+            raw = json.dumps(self.index)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(raw)
+        tmp_path.replace(self.index_path)
+
+    def summary(self):
+        """Строка со статистикой для вывода в конце работы."""
+        requests_total = self.stats['hits'] + self.stats['misses']
+        hit_rate = self.stats['hits'] / requests_total * 100 if requests_total else 0
+        return (f"попаданий {self.stats['hits']}/{requests_total} ({hit_rate:.0f}%), "
+                f"записано {self.stats['stores']}, вытеснено {self.stats['evictions']}, "
+                f"размер {self.total_bytes() / 1024 / 1024:.1f} MB")
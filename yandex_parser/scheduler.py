@@ -0,0 +1,104 @@
+"""
+Общий пул запросов для пакетного обхода многих городов.
+
+FairScheduler выполняет задачи в max_workers потоках и берёт их из очередей
+городов по кругу: город с тысячей горячих зон не задерживает город с десятью,
+а общий темп ограничивается RateLimiter клиента. Контекст журнала запросов
+(город, этап) переносится из потока, поставившего задачу, в рабочий поток.
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Hashable
+
+from .profiling import profiler
+from .request_ledger import ledger
+
+
+class FairScheduler:
+    """Пул потоков с очередью на каждый ключ (город) и круговой выборкой."""
+
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+        self._queues = {}  # key -> deque[(future, fn, args, kwargs, context)]
+        self._ready = deque()  # ключи с задачами, в порядке обслуживания
+        self._cond = threading.Condition()
+        self._shutdown = False
+        self._threads = []
+
+    def _start_workers(self):
+        while len(self._threads) < self.max_workers:
+            thread = threading.Thread(target=self._worker, name=f'scheduler-{len(self._threads)}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, key: Hashable, fn: Callable, *args, **kwargs) -> Future:
+        """Постановка задачи fn(*args, **kwargs) в очередь ключа key."""
+        future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError('планировщик остановлен')
+            self._start_workers()
+            queue = self._queues.setdefault(key, deque())
+            if not queue:
+                self._ready.append(key)
+            queue.append((future, fn, args, kwargs, ledger.get_context()))
+            self._cond.notify()
+        return future
+
+    def _next_task(self):
+        with self._cond:
+            while not self._ready and not self._shutdown:
+                self._cond.wait()
+            if not self._ready:
+                return None
+            key = self._ready.popleft()
+            queue = self._queues[key]
+            task = queue.popleft()
+            if queue:
+                self._ready.append(key)
+            return task
+
+    def _worker(self):
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            future, fn, args, kwargs, context = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with ledger.context_scope(context), profiler.worker_scope():
+                    result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def pending(self):
+        """Количество задач в очередях."""
+        with self._cond:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def shutdown(self, cancel_pending=False):
+        """Остановка пула; cancel_pending=True - отменить задачи из очередей."""
+        with self._cond:
+            self._shutdown = True
+            if cancel_pending:
+                for queue in self._queues.values():
+                    for future, *_ in queue:
+                        future.cancel()
+                    queue.clear()
+                self._ready.clear()
+            self._cond.notify_all()
+        if not cancel_pending:
+            for thread in self._threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(cancel_pending=exc_type is not None)
+
@@ -0,0 +1,307 @@
+"""
+Упрощение полигонов и квантование координат для cities.geojson и зон.
+
+API отдаёт границы с точностью до миллиметров и вершинами через каждые
+несколько метров, а карты и загрузчики разбирают эти файлы постоянно.
+GeometrySimplifier прореживает кольца алгоритмом Дугласа-Пекера с допуском
+в метрах и округляет координаты до заданного числа знаков.
+
+Соседние зоны соприкасаются общими границами, поэтому кольца упрощаются не
+по отдельности, а по дугам, как в TopoJSON: кольца режутся в узлах - точках,
+где расходятся соседи, - и каждая общая дуга упрощается один раз, а узлы
+остаются на месте. Так у соседей не появляется щелей и наложений, а общая
+граница остаётся одной дугой. Если полигон после упрощения вырождается
+(кольцо меньше 4 точек), самопересекается или его дыра пересекает внешнее
+кольцо, его дуги остаются без упрощения - и у соседей тоже.
+"""
+
+import json
+import math
+
+from .geometry import METERS_PER_DEG_LAT, METERS_PER_DEG_LON_EQUATOR
+
+# Допуск упрощения по умолчанию, метров
+DEFAULT_TOLERANCE_M = 1.0
+
+# Знаков после запятой по умолчанию: 6 знаков - около 0.1 м
+DEFAULT_PRECISION = 6
+
+
+def _douglas_peucker(points, tolerance):
+    """Индексы оставляемых точек ломаной (без рекурсии); points - в метрах."""
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    tolerance_sq = tolerance * tolerance
+    while stack:
+        start, end = stack.pop()
+        ax, ay = points[start]
+        bx, by = points[end]
+        dx, dy = bx - ax, by - ay
+        length_sq = dx * dx + dy * dy
+        max_dist_sq, index = 0.0, None
+        for i in range(start + 1, end):
+            px, py = points[i]
+            if length_sq == 0:
+                dist_sq = (px - ax) ** 2 + (py - ay) ** 2
+            else:
+                cross = dx * (py - ay) - dy * (px - ax)
+                dist_sq = cross * cross / length_sq
+            if dist_sq > max_dist_sq:
+                max_dist_sq, index = dist_sq, i
+        if index is not None and max_dist_sq > tolerance_sq:
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+    return [i for i, kept in enumerate(keep) if kept]
+
+
+def _segments_cross(a, b, c, d):
+    """Пересекаются ли отрезки ab и cd во внутренних точках."""
+    def orient(p, q, r):
+        value = (q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0])
+        return (value > 0) - (value < 0)
+    return (orient(a, b, c) * orient(a, b, d) < 0) and (orient(c, d, a) * orient(c, d, b) < 0)
+
+
+def _rings_intersect(rings):
+    """
+    Пересекаются ли кольца полигона - каждое само с собой, дыры с внешним
+    кольцом и друг с другом: рёбра перебираются по возрастанию min x.
+    """
+    edges, owners = [], []
+    for r, ring in enumerate(rings):
+        for i, edge in enumerate(zip(ring[:-1], ring[1:])):
+            edges.append(edge)
+            owners.append((r, i, len(ring) - 1))
+    count = len(edges)
+    boxes = [(min(a[0], b[0]), min(a[1], b[1]), max(a[0], b[0]), max(a[1], b[1])) for a, b in edges]
+    order = sorted(range(count), key=lambda i: boxes[i][0])
+    for k, i in enumerate(order):
+        box_i = boxes[i]
+        for j in order[k + 1:]:
+            box_j = boxes[j]
+            if box_j[0] > box_i[2]:
+                break
+            # Соседние рёбра одного кольца имеют общую вершину
+            ring_i, index_i, size = owners[i]
+            ring_j, index_j, _ = owners[j]
+            if ring_i == ring_j and abs(index_i - index_j) in (1, size - 1):
+                continue
+            if box_i[3] < box_j[1] or box_j[3] < box_i[1]:
+                continue
+            if _segments_cross(*edges[i], *edges[j]):
+                return True
+    return False
+
+
+def _polygon_parts(geometry):
+    """Кольца каждого полигона Polygon/MultiPolygon; None - геометрия другого типа."""
+    kind = geometry.get('type') if geometry else None
+    if kind == 'Polygon':
+        return [geometry['coordinates']]
+    if kind == 'MultiPolygon':
+        return geometry['coordinates']
+    return None
+
+
+def _find_junctions(rings):
+    """Точки, в которых у колец разные соседи: здесь начинаются и заканчиваются общие дуги."""
+    neighbors = {}
+    junctions = set()
+    for ring in rings:
+        n = len(ring) - 1
+        for i in range(n):
+            point = ring[i]
+            prev_point, next_point = ring[i - 1] if i else ring[n - 1], ring[i + 1]
+            pair = (prev_point, next_point) if prev_point < next_point else (next_point, prev_point)
+            seen = neighbors.setdefault(point, pair)
+            if seen != pair:
+                junctions.add(point)
+    return junctions
+
+
+def _split_ring(ring, junctions):
+    """Дуги замкнутого кольца (списки точек-кортежей) между узлами."""
+    body = ring[:-1]
+    cuts = [i for i, point in enumerate(body) if point in junctions]
+    if not cuts:
+        # Кольцо без узлов начинаем с минимальной точки, чтобы совпадающие кольца дали одну дугу
+        start = body.index(min(body))
+        return [body[start:] + body[:start + 1]]
+    start = cuts[0]
+    rotated = body[start:] + body[:start] + [body[start]]
+    offsets = [i - start for i in cuts] + [len(body)]
+    return [rotated[a:b + 1] for a, b in zip(offsets, offsets[1:])]
+
+
+def _round_ring(ring, precision):
+    """Округление координат с удалением совпавших соседних точек."""
+    rounded = []
+    for c in ring:
+        point = [round(c[0], precision), round(c[1], precision)]
+        if not rounded or point != rounded[-1]:
+            rounded.append(point)
+    return rounded
+
+
+class GeometrySimplifier:
+    """Упрощение Polygon/MultiPolygon с накоплением статистики (вершины, байты координат)."""
+
+    def __init__(self, tolerance_m=DEFAULT_TOLERANCE_M, precision=DEFAULT_PRECISION):
+        """
+        Args:
+            tolerance_m: допуск Дугласа-Пекера в метрах; 0 - без упрощения
+            precision: знаков после запятой; None - без округления
+        """
+        self.tolerance_m = tolerance_m
+        self.precision = precision
+        self.vertices_before = 0
+        self.vertices_after = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+
+    def _prepare(self, ring):
+        """Кольцо из кортежей с округлёнными координатами или None, если оно вырождается."""
+        if len(ring) < 4:
+            return None
+        points = [(c[0], c[1]) for c in ring]
+        if self.precision is not None:
+            points = [tuple(point) for point in _round_ring(points, self.precision)]
+            if points[0] != points[-1]:
+                points.append(points[0])
+        return points if len(points) >= 4 else None
+
+    def _arc(self, arc):
+        """Упрощённая дуга (концы сохраняются)."""
+        kx = METERS_PER_DEG_LON_EQUATOR * max(math.cos(math.radians(arc[0][1])), 0.01)
+        points = [(x * kx, y * METERS_PER_DEG_LAT) for x, y in arc]
+        return [arc[i] for i in _douglas_peucker(points, self.tolerance_m)]
+
+    def geometries(self, geometries):
+        """
+        Новые геометрии с упрощёнными кольцами (другие типы возвращаются как есть).
+
+        Топология общая для всего списка: граница, общая для нескольких колец
+        (соседние зоны, дыра и заполняющий её полигон), упрощается один раз.
+        """
+        parts = [_polygon_parts(geometry) for geometry in geometries]
+        # Полигоны всех геометрий: [кольцо или None, ...]; None - кольцо остаётся как есть
+        polygons = [[self._prepare(ring) for ring in rings]
+                    for polygon_parts in parts if polygon_parts is not None for rings in polygon_parts]
+
+        junctions = _find_junctions([ring for rings in polygons for ring in rings if ring is not None])
+        # Дуга хранится в каноническом направлении: (ключ, пройдена ли в обратном)
+        polygon_arcs = []
+        arc_polygons = {}
+        for p, rings in enumerate(polygons):
+            ring_arcs = []
+            for ring in rings:
+                arcs = None
+                if ring is not None:
+                    arcs = []
+                    for arc in _split_ring(ring, junctions):
+                        key = min(tuple(arc), tuple(arc[::-1]))
+                        arcs.append((key, key != tuple(arc)))
+                        arc_polygons.setdefault(key, set()).add(p)
+                ring_arcs.append(arcs)
+            polygon_arcs.append(ring_arcs)
+
+        simplified = {}
+        if self.tolerance_m > 0:
+            simplified = {key: self._arc(key) for key in arc_polygons}
+
+        def build(ring_arcs):
+            rings = []
+            for arcs in ring_arcs:
+                if arcs is None:
+                    rings.append(None)
+                    continue
+                points = []
+                for key, reverse in arcs:
+                    arc = simplified.get(key, key)
+                    if reverse:
+                        arc = arc[::-1]
+                    points.extend(arc[1:] if points else arc)
+                rings.append(points)
+            return rings
+
+        # Полигон, испорченный упрощением, получает исходные дуги; соседи по этим
+        # дугам проверяются заново
+        dirty = set(range(len(polygons))) if simplified else set()
+        while dirty:
+            frozen = set()
+            for p in sorted(dirty):
+                keys = [key for arcs in polygon_arcs[p] if arcs is not None for key, _ in arcs]
+                if all(len(simplified.get(key, key)) == len(key) for key in keys):
+                    continue
+                rings = [ring for ring in build(polygon_arcs[p]) if ring is not None]
+                if any(len(ring) < 4 for ring in rings) or _rings_intersect(rings):
+                    frozen.update(key for key in keys if key in simplified)
+            dirty = set()
+            for key in frozen:
+                del simplified[key]
+                dirty.update(arc_polygons[key])
+
+        results = []
+        polygon_index = 0
+        for geometry, polygon_parts in zip(geometries, parts):
+            if polygon_parts is None:
+                results.append(geometry)
+                continue
+            coordinates = []
+            for rings in polygon_parts:
+                built = build(polygon_arcs[polygon_index])
+                polygon_index += 1
+                coordinates.append([[list(point) for point in new] if new is not None else ring
+                                    for ring, new in zip(rings, built)])
+            if geometry['type'] == 'Polygon':
+                coordinates = coordinates[0]
+
+            self.vertices_before += _count_vertices(geometry['coordinates'])
+            self.vertices_after += _count_vertices(coordinates)
+            self.bytes_before += len(json.dumps(geometry['coordinates'], separators=(',', ':')))
+            self.bytes_after += len(json.dumps(coordinates, separators=(',', ':')))
+            results.append({**geometry, 'coordinates': coordinates})
+        return results
+
+    def geometry(self, geometry):
+        """Новая геометрия с упрощёнными кольцами (другие типы возвращаются как есть)."""
+        return self.geometries([geometry])[0]
+
+    def features(self, features):
+        """Упрощение геометрий Feature на месте (с общими дугами); возвращает тот же список."""
+        geometries = self.geometries([feature.get('geometry') for feature in features])
+        for feature, geometry in zip(features, geometries):
+            feature['geometry'] = geometry
+        return features
+
+    def summary(self):
+        """Строка статистики для лога."""
+        if not self.vertices_before:
+            return "нет полигонов"
+        vertices_saved = 100 * (1 - self.vertices_after / self.vertices_before)
+        bytes_saved = 100 * (1 - self.bytes_after / self.bytes_before)
+        return (f"вершин {self.vertices_before:,} → {self.vertices_after:,} (-{vertices_saved:.0f}%), "
+                f"координаты {self.bytes_before / 1024 / 1024:.1f} → {self.bytes_after / 1024 / 1024:.1f} MB "
+                f"(-{bytes_saved:.0f}%)")
+
+
+def _count_vertices(coordinates):
+    if coordinates and isinstance(coordinates[0][0], (int, float)):
+        return len(coordinates)
+    return sum(_count_vertices(part) for part in coordinates)
+
+
+def add_simplify_arguments(parser):
+    """Добавляет в argparse общие флаги --simplify M и --precision N."""
+    parser.add_argument('--simplify', type=float, default=DEFAULT_TOLERANCE_M, metavar='M',
+                        help='Допуск упрощения полигонов (Дуглас-Пекер) в метрах '
+                             f'(по умолчанию: {DEFAULT_TOLERANCE_M}; 0 - без упрощения)')
+    parser.add_argument('--precision', type=int, default=DEFAULT_PRECISION, metavar='N',
+                        help=f'Знаков после запятой в координатах (по умолчанию: {DEFAULT_PRECISION}, ~0.1 м)')
+
+
+def simplifier_from_args(args):
+    """GeometrySimplifier по флагам add_simplify_arguments."""
+    return GeometrySimplifier(tolerance_m=args.simplify, precision=args.precision)
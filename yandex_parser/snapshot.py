@@ -0,0 +1,152 @@
+"""
+Последний снимок результатов обхода в памяти: самокаты, парковки и зоны.
+
+Snapshot.load читает самый новый файл самокатов каждого города, парковки и
+zones.geojson и строит индексы (PointIndex, ZoneIndex). snapshot_signature -
+дешёвая подпись этих файлов (mtime, размер) без чтения: по её изменению
+сервис запросов перестраивает снимок и подменяет его целиком; файлы
+самокатов, не изменившиеся с прошлой загрузки, повторно не разбираются.
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+
+from .paths import OUTPUT_DIR
+from .point_index import PointIndex
+from .zone_index import ZoneIndex
+
+
+def scooter_paths(output_dir=OUTPUT_DIR):
+    """Файлы самокатов: city_scooters/*.geojson и scooters_full_info*.geojson."""
+    output_dir = Path(output_dir)
+    return sorted((output_dir / 'city_scooters').glob('*.geojson')) + \
+        sorted(output_dir.glob('scooters_full_info*.geojson'))
+
+
+# Разобранные файлы самокатов между перезагрузками снимка: путь -> (mtime, размер,
+# city_id, объекты); объекты хранятся только у самых новых файлов городов
+_scooter_files = {}
+_scooter_files_lock = threading.Lock()
+
+
+def _read_scooter_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return (data.get('metadata') or {}).get('city_id') or path.stem, data.get('features', [])
+
+
+def latest_scooter_files(paths):
+    """
+    Самый новый файл самокатов каждого города (по metadata.city_id, иначе по имени файла).
+
+    city_id файла запоминается по (путь, mtime, размер), поэтому при повторном
+    вызове разбираются только новые и изменённые файлы, а не вся история обходов.
+    """
+    with _scooter_files_lock:
+        seen = {}
+        latest = {}
+        for path in paths:
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            key = str(path)
+            entry = _scooter_files.get(key)
+            if entry is None or entry[:2] != (stat.st_mtime, stat.st_size):
+                entry = (stat.st_mtime, stat.st_size, *_read_scooter_file(path))
+            seen[key] = entry
+            city_id = entry[2]
+            if city_id not in latest or stat.st_mtime > latest[city_id][0]:
+                latest[city_id] = (stat.st_mtime, path)
+
+        newest = {str(path) for _, path in latest.values()}
+        _scooter_files.clear()
+        for key, (mtime, size, city_id, features) in seen.items():
+            _scooter_files[key] = (mtime, size, city_id, features if key in newest else None)
+
+        result = {}
+        for city_id, (_, path) in latest.items():
+            mtime, size, _, features = _scooter_files[str(path)]
+            if features is None:
+                # Объекты были отброшены, пока файл не был самым новым
+                features = _read_scooter_file(path)[1]
+                _scooter_files[str(path)] = (mtime, size, city_id, features)
+            result[city_id] = (path, features)
+        return result
+
+
+def _source_paths(output_dir):
+    output_dir = Path(output_dir)
+    return scooter_paths(output_dir) + [output_dir / 'parkings.geojson', output_dir / 'zones.geojson']
+
+
+def snapshot_signature(output_dir=OUTPUT_DIR):
+    """Подпись файлов снимка: tuple (путь, mtime, размер) существующих файлов."""
+    signature = []
+    for path in _source_paths(output_dir):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        signature.append((str(path), stat.st_mtime, stat.st_size))
+    return tuple(signature)
+
+
+def _load_features(path):
+    if not path.exists():
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('features', [])
+
+
+class Snapshot:
+    """Индексы одного снимка; после построения не меняется (читается из любых потоков)."""
+
+    def __init__(self, scooters, parkings, zones, sources=None):
+        """
+        Args:
+            scooters, parkings: точечные GeoJSON Feature
+            zones: Feature зон (формат zones.geojson)
+            sources: dict с описанием исходных файлов (для /status)
+        """
+        start = time.time()
+        self.scooters = PointIndex(scooters)
+        self.parkings = PointIndex(parkings)
+        self.zones = ZoneIndex(zones)
+        self.sources = sources or {}
+        self.signature = None
+        self.loaded_at = time.time()
+        self.build_seconds = self.loaded_at - start
+
+    @classmethod
+    def load(cls, output_dir=OUTPUT_DIR):
+        """Снимок из output/: самый новый файл самокатов каждого города, парковки, зоны."""
+        output_dir = Path(output_dir)
+        signature = snapshot_signature(output_dir)
+        cities = latest_scooter_files(scooter_paths(output_dir))
+        scooters = [feature for _, features in cities.values() for feature in features]
+        snapshot = cls(scooters, _load_features(output_dir / 'parkings.geojson'),
+                       _load_features(output_dir / 'zones.geojson'),
+                       sources={'scooter_files': sorted(str(path.name) for path, _ in cities.values())})
+        snapshot.signature = signature
+        return snapshot
+
+    def layer(self, name):
+        """PointIndex слоя scooters или parkings."""
+        if name == 'scooters':
+            return self.scooters
+        if name == 'parkings':
+            return self.parkings
+        raise ValueError(f"Неизвестный слой: {name} (scooters, parkings)")
+
+    def status(self):
+        return {
+            'loaded_at': self.loaded_at,
+            'build_seconds': round(self.build_seconds, 3),
+            'scooters': self.scooters.size,
+            'parkings': self.parkings.size,
+            'zones': self.zones.size,
+            **self.sources
+        }
@@ -0,0 +1,202 @@
+"""
+Жизненный цикл JWT токена X-Yandex-Jws.
+
+Токен живёт около часа, а обход страны или город с --with-full-info -
+дольше. TokenManager следит за сроком токена: незадолго до истечения
+новые запросы приостанавливаются, кэши сохраняются, и менеджер ждёт, пока
+в config.json появится новый токен, после чего подхватывает его без
+перезапуска процесса. Ответ HTTP 405 (токен истёк раньше срока или срок
+не удалось прочитать) обрабатывается так же: ожидание и повтор запроса.
+"""
+
+import base64
+import json
+import threading
+import time
+from typing import Callable, Optional
+
+from .config import DEFAULT_CONFIG_PATH, load_config
+from .errors import ConfigError
+
+# За сколько секунд до истечения приостанавливать запросы
+DEFAULT_MARGIN = 60
+
+# Как часто перечитывать config.json во время паузы, секунд
+DEFAULT_POLL_INTERVAL = 5
+
+# Ожидание нового токена в CLI по умолчанию, минут
+DEFAULT_TOKEN_WAIT_MIN = 15
+
+
+def decode_jwt_payload(jwt_token):
+    """
+    Декодирует payload JWT токена.
+
+    Raises:
+        ValueError: токен не в формате JWT или payload не читается
+    """
+    # JWT состоит из 3 частей: header.payload.signature
+    parts = jwt_token.split('.')
+    if len(parts) != 3:
+        raise ValueError("Неверный формат JWT (должно быть 3 части)")
+
+    payload = parts[1]
+    # Добавляем padding если нужно
+    padding = len(payload) % 4
+    if padding:
+        payload += '=' * (4 - padding)
+
+    try:
+        return json.loads(base64.urlsafe_b64decode(payload).decode('utf-8'))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Ошибка декодирования: {e}")
+
+
+def token_expires_at(headers) -> Optional[float]:
+    """Время истечения X-Yandex-Jws (unix time, секунды) или None, если его не прочитать."""
+    jwt_token = headers.get('X-Yandex-Jws')
+    if not jwt_token:
+        return None
+    try:
+        expires_at_ms = decode_jwt_payload(jwt_token).get('expires_at_ms')
+    except ValueError:
+        return None
+    return expires_at_ms / 1000 if expires_at_ms else None
+
+
+class TokenManager:
+    """
+    Заголовки из config.json и ожидание нового токена (потокобезопасный).
+
+    version увеличивается при каждой загрузке нового токена - по нему
+    YandexClient обновляет заголовки HTTP-сессий.
+    """
+
+    def __init__(self, config_path=DEFAULT_CONFIG_PATH, wait_timeout=0, margin=DEFAULT_MARGIN,
+                 poll_interval=DEFAULT_POLL_INTERVAL):
+        """
+        Args:
+            config_path: путь к config.json
+            wait_timeout: сколько секунд ждать нового токена; 0 - не ждать
+                         (только подхватить уже обновлённый config.json)
+            margin: за сколько секунд до истечения приостанавливать запросы
+            poll_interval: период перечитывания config.json во время паузы
+
+        Raises:
+            ConfigError: config.json отсутствует или не содержит заголовков
+        """
+        self.config_path = config_path
+        self.wait_timeout = wait_timeout
+        self.margin = margin
+        self.poll_interval = poll_interval
+        self.headers, self.payment_methods = load_config(config_path)
+        self.expires_at = token_expires_at(self.headers)
+        self.version = 0
+        self._lock = threading.RLock()
+        self._pause_callbacks = []
+        self._grace_version = None  # истёк по сроку, но нового нет - работаем до 405
+        self._failed_version = None  # 405 и нового токена не дождались
+
+    def on_pause(self, callback: Callable[[], None]):
+        """callback() вызывается в начале паузы (сохранение кэшей и контрольных точек)."""
+        self._pause_callbacks.append(callback)
+
+    def remaining(self) -> Optional[float]:
+        """Секунд до истечения токена или None, если срок неизвестен."""
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.time()
+
+    def _expiring(self):
+        remaining = self.remaining()
+        return (self.wait_timeout > 0 and remaining is not None and remaining <= self.margin
+                and self._grace_version != self.version)
+
+    def ensure_valid(self):
+        """
+        Вызывается перед каждым запросом: если токен вот-вот истечёт, ждёт нового.
+
+        Если новый токен не появился за wait_timeout, работа продолжается со
+        старым (у токена бывает запас после срока) до первого HTTP 405.
+        """
+        if not self._expiring():
+            return
+        with self._lock:
+            if not self._expiring():
+                return
+            version = self.version
+            remaining = max(0, int(self.remaining()))
+            if not self._wait(f"токен истекает через {remaining} с"):
+                self._grace_version = version
+                print("⚠️  Новый токен не получен - продолжаю со старым до ответа HTTP 405")
+
+    def wait_for_refresh(self, version) -> bool:
+        """
+        Ожидание нового токена после HTTP 405.
+
+        Args:
+            version: self.version, с которой был отправлен запрос
+
+        Returns:
+            True - токен обновлён (в том числе другим потоком), запрос можно повторить
+        """
+        with self._lock:
+            if self.version != version:
+                return True
+            if self._failed_version == version:
+                return False
+            if self._wait("HTTP 405: токен истёк"):
+                return True
+            self._failed_version = version
+            return False
+
+    def _wait(self, reason):
+        if self._reload():
+            return True
+        if self.wait_timeout <= 0:
+            return False
+
+        print(f"\n⏸️  Пауза: {reason}. Обновите X-Yandex-Jws в {self.config_path}")
+        print(f"   Ожидание нового токена до {self.wait_timeout / 60:.0f} мин...")
+        for callback in self._pause_callbacks:
+            callback()
+
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            if self._reload():
+                remaining = self.remaining()
+                until = f" (действует ещё {remaining / 60:.0f} мин)" if remaining is not None else ""
+                print(f"▶️  Новый токен загружен{until}, продолжаю")
+                return True
+
+        print(f"❌ Новый токен не появился за {self.wait_timeout / 60:.0f} мин")
+        return False
+
+    def _reload(self):
+        """Перечитывание config.json; True - загружен новый действующий токен."""
+        try:
+            headers, payment_methods = load_config(self.config_path)
+        except (ConfigError, ValueError):
+            # Файл может быть в процессе редактирования
+            return False
+
+        if headers.get('X-Yandex-Jws') == self.headers.get('X-Yandex-Jws'):
+            return False
+        expires_at = token_expires_at(headers)
+        if expires_at is not None and expires_at - time.time() <= self.margin:
+            return False
+
+        self.headers = headers
+        self.payment_methods = payment_methods
+        self.expires_at = expires_at
+        self.version += 1
+        return True
+
+
+def add_token_argument(parser):
+    """Добавляет в argparse общий флаг --token-wait MIN."""
+    parser.add_argument('--token-wait', type=float, default=DEFAULT_TOKEN_WAIT_MIN, metavar='MIN',
+                        help='Когда токен истекает, приостановить запросы и ждать новый X-Yandex-Jws '
+                             f'в config.json до MIN минут (по умолчанию: {DEFAULT_TOKEN_WAIT_MIN}; '
+                             '0 - останавливаться сразу)')
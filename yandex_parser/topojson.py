@@ -0,0 +1,165 @@
+"""
+TopoJSON: общие границы полигонов хранятся один раз.
+
+Соседние зоны ограничений и зоны обслуживания соприкасаются длинными
+границами, и в GeoJSON каждая такая граница записана дважды (а зона,
+попавшая в несколько городов, - целиком несколько раз). encode() переводит
+координаты в целочисленную сетку (10^-precision градуса), разрезает кольца
+в узлах - точках, где расходятся соседи по кольцам, - и сохраняет каждую
+дугу один раз в разностной записи. Кольцо ссылается на дуги по индексам
+(~i - дуга в обратном направлении). decode() собирает GeoJSON обратно.
+"""
+
+import math
+
+from .simplify import DEFAULT_PRECISION, _find_junctions, _polygon_parts, _split_ring
+
+# Имя коллекции объектов по умолчанию
+DEFAULT_OBJECT_NAME = 'zones'
+
+
+def _quantize_ring(ring, x0, y0, k):
+    points = []
+    for c in ring:
+        point = (round((c[0] - x0) * k), round((c[1] - y0) * k))
+        if not points or point != points[-1]:
+            points.append(point)
+    if points[0] != points[-1]:
+        points.append(points[0])
+    return points
+
+
+class _ArcIndex:
+    """Дуги без повторов: одинаковая последовательность точек (в любом направлении) - одна дуга."""
+
+    def __init__(self):
+        self.arcs = []
+        self._index = {}
+
+    def add(self, points):
+        key = tuple(points)
+        index = self._index.get(key)
+        if index is not None:
+            return index
+        index = self._index.get(key[::-1])
+        if index is not None:
+            return ~index
+        self._index[key] = len(self.arcs)
+        self.arcs.append(points)
+        return len(self.arcs) - 1
+
+    def ring(self, ring, junctions):
+        """Индексы дуг замкнутого кольца."""
+        return [self.add(arc) for arc in _split_ring(ring, junctions)]
+
+
+def encode(features, precision=DEFAULT_PRECISION, object_name=DEFAULT_OBJECT_NAME):
+    """
+    TopoJSON Topology из GeoJSON Feature с геометрией Polygon/MultiPolygon.
+
+    Args:
+        features: список Feature; у Feature с другой геометрией сохраняются
+                  только id и properties
+        precision: знаков после запятой в координатах (шаг сетки 10^-precision)
+        object_name: имя коллекции в topology['objects']
+    """
+    k = 10 ** precision
+    coords = [c for feature in features for rings in (_polygon_parts(feature.get('geometry')) or [])
+              for ring in rings for c in ring]
+    x0 = min((c[0] for c in coords), default=0)
+    y0 = min((c[1] for c in coords), default=0)
+    x0, y0 = round(x0 * k) / k, round(y0 * k) / k
+
+    # Кольца в целочисленных координатах: [(feature, [[[кольцо, ...] полигона], ...])]
+    quantized = []
+    for feature in features:
+        parts = _polygon_parts(feature.get('geometry'))
+        if parts is not None:
+            parts = [[_quantize_ring(ring, x0, y0, k) for ring in rings if ring] for rings in parts]
+        quantized.append((feature, parts))
+
+    junctions = _find_junctions([ring for _, parts in quantized for rings in parts or [] for ring in rings])
+    arcs = _ArcIndex()
+    geometries = []
+    for feature, parts in quantized:
+        geometry = {'type': None}
+        if parts is not None:
+            polygons = [[arcs.ring(ring, junctions) for ring in rings] for rings in parts]
+            if feature['geometry']['type'] == 'Polygon':
+                geometry = {'type': 'Polygon', 'arcs': polygons[0]}
+            else:
+                geometry = {'type': 'MultiPolygon', 'arcs': polygons}
+        if feature.get('id') is not None:
+            geometry['id'] = feature['id']
+        if feature.get('properties'):
+            geometry['properties'] = feature['properties']
+        geometries.append(geometry)
+
+    # Разностная запись: первая точка дуги - от начала сетки, остальные - от предыдущей
+    encoded_arcs = []
+    for points in arcs.arcs:
+        px = py = 0
+        deltas = []
+        for x, y in points:
+            deltas.append([x - px, y - py])
+            px, py = x, y
+        encoded_arcs.append(deltas)
+
+    return {
+        'type': 'Topology',
+        'transform': {'scale': [1 / k, 1 / k], 'translate': [x0, y0]},
+        'objects': {object_name: {'type': 'GeometryCollection', 'geometries': geometries}},
+        'arcs': encoded_arcs
+    }
+
+
+def decode(topology, object_name=None):
+    """
+    GeoJSON FeatureCollection из Topology (encode или другой квантованной TopoJSON).
+
+    object_name: коллекция из topology['objects']; None - первая
+    """
+    transform = topology.get('transform') or {'scale': [1, 1], 'translate': [0, 0]}
+    sx, sy = transform['scale']
+    tx, ty = transform['translate']
+    # Округление до шага сетки убирает хвосты вида 27.561500000000002
+    digits = max(0, math.ceil(-math.log10(min(sx, sy))))
+
+    arcs = []
+    for deltas in topology['arcs']:
+        x = y = 0
+        points = []
+        for dx, dy in deltas:
+            x += dx
+            y += dy
+            points.append([round(x * sx + tx, digits), round(y * sy + ty, digits)])
+        arcs.append(points)
+
+    def ring(indexes):
+        coordinates = []
+        for index in indexes:
+            points = arcs[index] if index >= 0 else arcs[~index][::-1]
+            coordinates.extend(points[1:] if coordinates else points)
+        return coordinates
+
+    if object_name is None:
+        object_name = next(iter(topology['objects']))
+
+    features = []
+    for geometry in topology['objects'][object_name]['geometries']:
+        kind = geometry.get('type')
+        if kind == 'Polygon':
+            geojson_geometry = {'type': 'Polygon', 'coordinates': [ring(r) for r in geometry['arcs']]}
+        elif kind == 'MultiPolygon':
+            geojson_geometry = {'type': 'MultiPolygon',
+                                'coordinates': [[ring(r) for r in rings] for rings in geometry['arcs']]}
+        else:
+            geojson_geometry = None
+        feature = {'type': 'Feature'}
+        if 'id' in geometry:
+            feature['id'] = geometry['id']
+        feature['geometry'] = geojson_geometry
+        feature['properties'] = geometry.get('properties', {})
+        features.append(feature)
+
+    return {'type': 'FeatureCollection', 'features': features}
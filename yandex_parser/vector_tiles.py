@@ -0,0 +1,550 @@
+"""
+Пирамида векторных тайлов z/x/y (Mapbox Vector Tile) из результатов обхода.
+
+Карта загружает save_geojson и zones.geojson целиком - по несколько MB на
+файл. build_tiles режет слои (самокаты, парковки, зоны) на тайлы Web
+Mercator от min_zoom до max_zoom, чтобы карта запрашивала только видимые:
+- полигоны упрощаются (Дуглас-Пекер) с допуском в единицах тайла, поэтому на
+  мелких зумах вершин меньше, и обрезаются по тайлу с запасом buffer;
+- точки ниже max_zoom прореживаются по сетке thin_cell: из ячейки остаётся
+  первая, в point_count - сколько точек она заменяет.
+
+Результат - каталог {z}/{x}/{y}.pbf или один файл MBTiles (sqlite3). Манифест
+рядом с результатом хранит хеш и bbox каждого объекта: при повторном запуске
+перестраиваются только тайлы, которых касаются добавленные, изменённые или
+удалённые объекты.
+"""
+
+import gzip
+import hashlib
+import json
+import math
+import shutil
+import sqlite3
+import struct
+from pathlib import Path
+
+from .geometry import polygons_of
+from .simplify import _douglas_peucker
+
+MANIFEST_VERSION = 1
+
+# Зумы пирамиды по умолчанию: от области до улиц (дальше карта растягивает z14)
+DEFAULT_MIN_ZOOM = 8
+DEFAULT_MAX_ZOOM = 14
+
+# Единиц координат на сторону тайла и запас обрезки полигонов
+DEFAULT_EXTENT = 4096
+DEFAULT_BUFFER = 64
+
+# Допуск упрощения полигонов в единицах тайла (16 единиц - пиксель тайла 256 px)
+DEFAULT_SIMPLIFY = 4
+
+# Ячейка прореживания точек ниже max_zoom, единиц тайла (4 пикселя)
+DEFAULT_THIN_CELL = 64
+
+# Типы геометрии MVT
+POINT = 1
+POLYGON = 3
+
+# Предел широты Web Mercator
+MAX_LATITUDE = 85.05112878
+
+
+# --- Protobuf ---
+
+def _varint(value):
+    out = bytearray()
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(number, wire_type):
+    return _varint((number << 3) | wire_type)
+
+
+def _varint_field(number, value):
+    return _key(number, 0) + _varint(value)
+
+
+def _bytes_field(number, data):
+    return _key(number, 2) + _varint(len(data)) + data
+
+
+def _packed_field(number, values):
+    return _bytes_field(number, b''.join(_varint(value) for value in values))
+
+
+def _encode_value(value):
+    """Сообщение Value: строка, double, uint/sint или bool."""
+    if isinstance(value, bool):
+        return _varint_field(7, int(value))
+    if isinstance(value, int):
+        return _varint_field(5, value) if value >= 0 else _varint_field(6, _zigzag(value))
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack('<d', value)
+    return _bytes_field(1, str(value).encode('utf-8'))
+
+
+def _command(command_id, count):
+    return (command_id & 0x7) | (count << 3)
+
+
+def _point_commands(points):
+    commands = [_command(1, len(points))]
+    cx = cy = 0
+    for x, y in points:
+        commands += [_zigzag(x - cx), _zigzag(y - cy)]
+        cx, cy = x, y
+    return commands
+
+
+def _polygon_commands(rings):
+    """MoveTo, LineTo по кольцу без замыкающей точки, ClosePath; курсор общий для всех колец."""
+    commands = []
+    cx = cy = 0
+    for ring in rings:
+        x, y = ring[0]
+        commands += [_command(1, 1), _zigzag(x - cx), _zigzag(y - cy)]
+        cx, cy = x, y
+        commands.append(_command(2, len(ring) - 1))
+        for x, y in ring[1:]:
+            commands += [_zigzag(x - cx), _zigzag(y - cy)]
+            cx, cy = x, y
+        commands.append(_command(7, 1))
+    return commands
+
+
+def encode_layer(name, features, extent=DEFAULT_EXTENT):
+    """
+    Слой MVT (версия 2).
+
+    features: list (тип геометрии, команды геометрии, properties); None в
+    properties пропускаются, dict/list пишутся строкой JSON
+    """
+    keys, values = {}, {}
+    encoded = []
+    for geometry_type, commands, properties in features:
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            if isinstance(value, (dict, list)):
+                value = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault((type(value).__name__, value), len(values)))
+        encoded.append(_bytes_field(2, _packed_field(2, tags) + _varint_field(3, geometry_type)
+                                    + _packed_field(4, commands)))
+
+    layer = [_varint_field(15, 2), _bytes_field(1, name.encode('utf-8'))]
+    layer += encoded
+    layer += [_bytes_field(3, key.encode('utf-8')) for key in keys]
+    layer += [_bytes_field(4, _encode_value(value)) for _, value in values]
+    layer.append(_varint_field(5, extent))
+    return b''.join(layer)
+
+
+def encode_tile(layers, extent=DEFAULT_EXTENT):
+    """Тайл MVT из {имя слоя: features encode_layer}; пустые слои пропускаются."""
+    return b''.join(_bytes_field(3, encode_layer(name, features, extent))
+                    for name, features in layers.items() if features)
+
+
+# --- Проекция, упрощение, обрезка ---
+
+def _world(lon, lat, scale):
+    """Координаты Web Mercator зума: 0..scale слева направо и с севера на юг."""
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    return ((lon + 180) / 360 * scale,
+            (1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * scale)
+
+
+def _tile_range(bbox, z, extent, buffer):
+    """Тайлы (x0, y0, x1, y1) зума z, буфер которых пересекает bbox [lon, lat, lon, lat]."""
+    scale = extent * (1 << z)
+    x0, y0 = _world(bbox[0], bbox[3], scale)
+    x1, y1 = _world(bbox[2], bbox[1], scale)
+    last = (1 << z) - 1
+    return (max(int((x0 - buffer) // extent), 0), max(int((y0 - buffer) // extent), 0),
+            min(int((x1 + buffer) // extent), last), min(int((y1 + buffer) // extent), last))
+
+
+def _clip_edge(points, axis, bound, keep_greater):
+    """Один шаг Сазерленда-Ходжмена: часть кольца по одну сторону прямой axis = bound."""
+    result = []
+    prev = points[-1]
+    prev_in = prev[axis] >= bound if keep_greater else prev[axis] <= bound
+    for point in points:
+        point_in = point[axis] >= bound if keep_greater else point[axis] <= bound
+        if point_in != prev_in:
+            t = (bound - prev[axis]) / (point[axis] - prev[axis])
+            crossing = [prev[0] + (point[0] - prev[0]) * t, prev[1] + (point[1] - prev[1]) * t]
+            crossing[axis] = bound
+            result.append(crossing)
+        if point_in:
+            result.append(point)
+        prev, prev_in = point, point_in
+    return result
+
+
+def _clip_ring(ring, low, high):
+    for axis in (0, 1):
+        for bound, keep_greater in ((low, True), (high, False)):
+            ring = _clip_edge(ring, axis, bound, keep_greater)
+            if not ring:
+                return []
+    return ring
+
+
+def _ring_area(ring):
+    """Площадь по формуле землемера в координатах тайла (y вниз): у внешнего кольца > 0."""
+    return sum(ring[i - 1][0] * ring[i][1] - ring[i][0] * ring[i - 1][1] for i in range(len(ring))) / 2
+
+
+def _tile_ring(ring, ox, oy, low, high, exterior):
+    """Кольцо в целых координатах тайла (без замыкающей точки) или None, если вырождено."""
+    clipped = _clip_ring([(x - ox, y - oy) for x, y in ring], low, high)
+    points = []
+    for x, y in clipped:
+        point = (round(x), round(y))
+        if not points or point != points[-1]:
+            points.append(point)
+    while len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    if len(points) < 3:
+        return None
+    area = _ring_area(points)
+    if area == 0:
+        return None
+    if (area > 0) != exterior:
+        points.reverse()
+    return points
+
+
+class _PolygonFeature:
+    """Полигоны объекта, спроецированные и упрощённые для одного зума."""
+
+    def __init__(self, polygons, z, extent, tolerance):
+        scale = extent * (1 << z)
+        self.polygons = []
+        for rings in polygons:
+            projected = []
+            for ring in rings:
+                points = [_world(c[0], c[1], scale) for c in ring]
+                if tolerance > 0 and len(points) > 4:
+                    simplified = [points[i] for i in _douglas_peucker(points, tolerance)]
+                    if len(simplified) >= 4:
+                        points = simplified
+                projected.append(points[:-1] if points[0] == points[-1] else points)
+            self.polygons.append(projected)
+
+    def commands(self, x, y, extent, buffer):
+        """Команды геометрии в тайле x/y или None, если в тайл ничего не попало."""
+        ox, oy = x * extent, y * extent
+        rings = []
+        for polygon in self.polygons:
+            exterior = _tile_ring(polygon[0], ox, oy, -buffer, extent + buffer, True)
+            if exterior is None:
+                continue
+            rings.append(exterior)
+            for hole in polygon[1:]:
+                ring = _tile_ring(hole, ox, oy, -buffer, extent + buffer, False)
+                if ring is not None:
+                    rings.append(ring)
+        return _polygon_commands(rings) if rings else None
+
+
+# --- Объекты слоёв ---
+
+def _feature_properties(feature):
+    properties = dict(feature.get('properties') or {})
+    if feature.get('id') is not None:
+        properties.setdefault('id', feature['id'])
+    return properties
+
+
+def _feature_hash(feature):
+    data = json.dumps(feature, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+def _feature_bbox(feature):
+    geometry = feature.get('geometry') or {}
+    if geometry.get('type') == 'Point':
+        lon, lat = geometry['coordinates'][:2]
+        return [lon, lat, lon, lat]
+    coords = [c for rings in polygons_of(geometry) for ring in rings for c in ring]
+    if not coords:
+        return None
+    return [min(c[0] for c in coords), min(c[1] for c in coords),
+            max(c[0] for c in coords), max(c[1] for c in coords)]
+
+
+def _field_type(value):
+    if isinstance(value, bool):
+        return 'Boolean'
+    if isinstance(value, (int, float)):
+        return 'Number'
+    return 'String'
+
+
+# --- Запись тайлов ---
+
+class DirectoryTileWriter:
+    """Тайлы {z}/{x}/{y}.pbf (без сжатия) и metadata.json (TileJSON) в каталоге."""
+
+    format = 'directory'
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.existed = self.path.exists()
+
+    def clear(self):
+        if self.path.exists():
+            for child in self.path.iterdir():
+                if child.is_dir() and child.name.isdigit():
+                    shutil.rmtree(child)
+
+    def write(self, z, x, y, data):
+        path = self.path / str(z) / str(x) / f'{y}.pbf'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+    def delete(self, z, x, y):
+        """Удаление тайла; True - тайл был."""
+        path = self.path / str(z) / str(x) / f'{y}.pbf'
+        if not path.exists():
+            return False
+        path.unlink()
+        return True
+
+    def close(self, metadata):
+        self.path.mkdir(parents=True, exist_ok=True)
+        tilejson = {
+            'tilejson': '3.0.0',
+            'tiles': ['{z}/{x}/{y}.pbf'],
+            'minzoom': metadata['minzoom'],
+            'maxzoom': metadata['maxzoom'],
+            'bounds': metadata['bounds'],
+            'vector_layers': metadata['vector_layers']
+        }
+        with open(self.path / 'metadata.json', 'w', encoding='utf-8') as f:
+            json.dump(tilejson, f, ensure_ascii=False, indent=2)
+
+
+class MBTilesWriter:
+    """Один файл MBTiles: тайлы в gzip, строки в схеме TMS (y снизу вверх)."""
+
+    format = 'mbtiles'
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.existed = self.path.exists()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.execute('CREATE TABLE IF NOT EXISTS metadata (name TEXT, value TEXT)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS tiles '
+                        '(zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)')
+        self.db.execute('CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row)')
+
+    def clear(self):
+        self.db.execute('DELETE FROM tiles')
+
+    def write(self, z, x, y, data):
+        self.db.execute('INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)',
+                        (z, x, (1 << z) - 1 - y, gzip.compress(data, mtime=0)))
+
+    def delete(self, z, x, y):
+        """Удаление тайла; True - тайл был."""
+        cursor = self.db.execute('DELETE FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?',
+                                 (z, x, (1 << z) - 1 - y))
+        return cursor.rowcount > 0
+
+    def close(self, metadata):
+        bounds = metadata['bounds']
+        rows = {
+            'name': metadata['name'],
+            'format': 'pbf',
+            'type': 'overlay',
+            'minzoom': metadata['minzoom'],
+            'maxzoom': metadata['maxzoom'],
+            'bounds': ','.join(str(value) for value in bounds),
+            'center': f"{(bounds[0] + bounds[2]) / 2},{(bounds[1] + bounds[3]) / 2},{metadata['minzoom']}",
+            'json': json.dumps({'vector_layers': metadata['vector_layers']}, ensure_ascii=False)
+        }
+        self.db.execute('DELETE FROM metadata')
+        self.db.executemany('INSERT INTO metadata VALUES (?, ?)', [(k, str(v)) for k, v in rows.items()])
+        self.db.commit()
+        self.db.close()
+
+
+def open_tile_writer(path):
+    """MBTilesWriter для *.mbtiles, иначе DirectoryTileWriter."""
+    return MBTilesWriter(path) if str(path).endswith('.mbtiles') else DirectoryTileWriter(path)
+
+
+def manifest_path_for(output_path):
+    """Манифест пирамиды: output/tiles → output/tiles.manifest.json."""
+    output_path = Path(output_path)
+    return output_path.with_name(f'{output_path.stem}.manifest.json')
+
+
+# --- Построение ---
+
+def _load_manifest(path, params):
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('params') != params:
+        return None
+    return manifest
+
+
+def build_tiles(layers, output_path, min_zoom=DEFAULT_MIN_ZOOM, max_zoom=DEFAULT_MAX_ZOOM,
+                extent=DEFAULT_EXTENT, buffer=DEFAULT_BUFFER, simplify=DEFAULT_SIMPLIFY,
+                thin_cell=DEFAULT_THIN_CELL, full=False, name='yandex_parser'):
+    """
+    Пирамида векторных тайлов со слоями layers.
+
+    Args:
+        layers: dict имя слоя -> list GeoJSON Feature (Point, Polygon,
+                MultiPolygon); порядок слоёв - порядок отрисовки
+        output_path: каталог или файл .mbtiles
+        min_zoom, max_zoom: зумы пирамиды
+        extent, buffer: единиц на сторону тайла и запас обрезки полигонов
+        simplify: допуск упрощения полигонов в единицах тайла
+        thin_cell: ячейка прореживания точек ниже max_zoom в единицах тайла
+        full: перестроить все тайлы, не используя манифест
+
+    Returns:
+        dict {features, changed, tiles_written, tiles_deleted, bytes, zooms}
+    """
+    writer = open_tile_writer(output_path)
+    params = {
+        'format': writer.format, 'min_zoom': min_zoom, 'max_zoom': max_zoom, 'extent': extent,
+        'buffer': buffer, 'simplify': simplify, 'thin_cell': thin_cell, 'layers': list(layers)
+    }
+    manifest_path = manifest_path_for(output_path)
+    previous = None if full or not writer.existed else _load_manifest(manifest_path, params)
+    if previous is None:
+        writer.clear()
+
+    # 1. Хеши и bbox объектов; изменившиеся - разница с манифестом
+    entries = {}
+    changed_bboxes = []
+    for layer, features in layers.items():
+        current = {}
+        for feature in features:
+            bbox = _feature_bbox(feature)
+            if bbox is not None:
+                current[_feature_hash(feature)] = bbox
+        old = previous['layers'].get(layer, {}) if previous else {}
+        changed_bboxes += [bbox for key, bbox in current.items() if key not in old]
+        changed_bboxes += [bbox for key, bbox in old.items() if key not in current]
+        entries[layer] = current
+
+    # 2. Перестраиваемые тайлы: все, чей буфер касается изменившихся объектов
+    stats = {'features': sum(len(current) for current in entries.values()), 'changed': len(changed_bboxes),
+             'tiles_written': 0, 'tiles_deleted': 0, 'bytes': 0, 'zooms': {}}
+    for z in range(min_zoom, max_zoom + 1):
+        dirty = set()
+        for bbox in changed_bboxes:
+            x0, y0, x1, y1 = _tile_range(bbox, z, extent, buffer)
+            dirty.update((x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+        if not dirty:
+            continue
+
+        # 3. Объекты перестраиваемых тайлов
+        scale = extent * (1 << z)
+        tiles = {tile: {layer: [] for layer in layers} for tile in dirty}
+        for layer, features in layers.items():
+            for feature in features:
+                geometry = feature.get('geometry') or {}
+                if geometry.get('type') == 'Point':
+                    wx, wy = _world(geometry['coordinates'][0], geometry['coordinates'][1], scale)
+                    tile = (int(wx // extent), int(wy // extent))
+                    if tile in tiles:
+                        local = (int(wx - tile[0] * extent), int(wy - tile[1] * extent))
+                        tiles[tile][layer].append((POINT, local, feature))
+                    continue
+                polygons = polygons_of(geometry)
+                if not polygons:
+                    continue
+                x0, y0, x1, y1 = _tile_range(_feature_bbox(feature), z, extent, buffer)
+                projected = None
+                for x in range(x0, x1 + 1):
+                    for y in range(y0, y1 + 1):
+                        if (x, y) not in tiles:
+                            continue
+                        if projected is None:
+                            projected = _PolygonFeature(polygons, z, extent, simplify)
+                        tiles[(x, y)][layer].append((POLYGON, projected, feature))
+
+        # 4. Кодирование: полигоны обрезаются, точки прореживаются
+        written = 0
+        for (x, y), tile_layers in sorted(tiles.items()):
+            encoded_layers = {}
+            for layer, items in tile_layers.items():
+                encoded = []
+                cells = {}
+                for geometry_type, geometry, feature in items:
+                    if geometry_type == POLYGON:
+                        commands = geometry.commands(x, y, extent, buffer)
+                        if commands is not None:
+                            encoded.append((POLYGON, commands, _feature_properties(feature)))
+                        continue
+                    if z < max_zoom:
+                        cell = (geometry[0] // thin_cell, geometry[1] // thin_cell)
+                        if cell in cells:
+                            cells[cell][2]['point_count'] += 1
+                            continue
+                        properties = _feature_properties(feature)
+                        properties['point_count'] = 1
+                        cells[cell] = (POINT, _point_commands([geometry]), properties)
+                        encoded.append(cells[cell])
+                    else:
+                        encoded.append((POINT, _point_commands([geometry]), _feature_properties(feature)))
+                encoded_layers[layer] = encoded
+            data = encode_tile(encoded_layers, extent)
+            if data:
+                writer.write(z, x, y, data)
+                written += 1
+                stats['bytes'] += len(data)
+            elif writer.delete(z, x, y):
+                stats['tiles_deleted'] += 1
+        stats['tiles_written'] += written
+        stats['zooms'][z] = {'rebuilt': len(dirty), 'written': written}
+
+    # 5. Метаданные и манифест
+    all_bboxes = [bbox for current in entries.values() for bbox in current.values()]
+    bounds = [min(b[0] for b in all_bboxes), min(b[1] for b in all_bboxes),
+              max(b[2] for b in all_bboxes), max(b[3] for b in all_bboxes)] if all_bboxes else [-180, -85, 180, 85]
+    vector_layers = []
+    for layer, features in layers.items():
+        fields = {}
+        for feature in features:
+            for key, value in _feature_properties(feature).items():
+                if value is not None:
+                    fields.setdefault(key, _field_type(value))
+        if any(((feature.get('geometry') or {}).get('type') == 'Point') for feature in features):
+            fields.setdefault('point_count', 'Number')
+        vector_layers.append({'id': layer, 'fields': fields, 'minzoom': min_zoom, 'maxzoom': max_zoom})
+    writer.close({'name': name, 'minzoom': min_zoom, 'maxzoom': max_zoom, 'bounds': bounds,
+                  'vector_layers': vector_layers})
+
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'params': params, 'layers': entries}, f, ensure_ascii=False)
+
+    return stats
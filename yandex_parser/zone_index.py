@@ -0,0 +1,161 @@
+"""
+Пространственный индекс зон ограничений (output/zones.geojson).
+
+Зон в стране - тысячи, а самокатов - десятки тысяч, поэтому перебор всех
+полигонов для каждой точки не годится. ZoneIndex один раз строит STR-дерево
+(Sort-Tile-Recursive, пакетная загрузка) по bbox зон: поиск точки спускается
+только в узлы, чей bbox её содержит, и уточняется проверкой полигона
+(PreparedGeometry) лишь для нескольких кандидатов.
+"""
+
+import json
+import math
+from pathlib import Path
+
+from .paths import OUTPUT_DIR
+from .errors import DataNotFoundError
+from .geometry import PreparedGeometry
+
+ZONES_GEOJSON_PATH = OUTPUT_DIR / 'zones.geojson'
+
+# Типы зон, которыми помечаются объекты (границы зон обслуживания - без type - не индексируются)
+RESTRICTION_TYPES = ('speed_limit', 'no_parking', 'no_entry')
+
+# Дочерних элементов в узле STR-дерева
+NODE_CAPACITY = 16
+
+
+def _center(entry):
+    bbox = entry[0]
+    return ((bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2)
+
+
+def _union(entries):
+    return (min(e[0][0] for e in entries), min(e[0][1] for e in entries),
+            max(e[0][2] for e in entries), max(e[0][3] for e in entries))
+
+
+def _str_level(entries, capacity):
+    """Один уровень STR: вертикальные полосы по x, внутри - группы по y."""
+    node_count = math.ceil(len(entries) / capacity)
+    slice_size = math.ceil(math.sqrt(node_count)) * capacity
+    entries = sorted(entries, key=lambda e: _center(e)[0])
+    nodes = []
+    for i in range(0, len(entries), slice_size):
+        column = sorted(entries[i:i + slice_size], key=lambda e: _center(e)[1])
+        for j in range(0, len(column), capacity):
+            children = column[j:j + capacity]
+            nodes.append((_union(children), children))
+    return nodes
+
+
+class ZoneIndex:
+    """STR-дерево зон ограничений с уточнением по полигону."""
+
+    def __init__(self, features, capacity=NODE_CAPACITY):
+        """
+        Args:
+            features: GeoJSON Feature зон (формат zones.geojson); учитываются
+                      только зоны с properties.type из RESTRICTION_TYPES
+        """
+        leaves = []
+        for feature in features:
+            properties = feature.get('properties') or {}
+            if properties.get('type') not in RESTRICTION_TYPES:
+                continue
+            try:
+                geometry = PreparedGeometry.from_geojson(feature)
+            except ValueError:
+                continue
+            zone = {'id': feature.get('id'), **properties}
+            leaves.append((geometry.bbox, (zone, geometry)))
+
+        self.size = len(leaves)
+        self._root = None
+        level = leaves
+        while len(level) > 1:
+            level = _str_level(level, capacity)
+        if level:
+            # Лист-корень (одна зона) оборачиваем в узел
+            self._root = level[0] if self.size > 1 else (level[0][0], level)
+
+    @classmethod
+    def load(cls, path=ZONES_GEOJSON_PATH):
+        """
+        Индекс зон из zones.geojson.
+
+        Raises:
+            DataNotFoundError: файла нет
+        """
+        path = Path(path)
+        if not path.exists():
+            raise DataNotFoundError(f"Ошибка: файл {path.name} не найден!\n"
+                                    "Сначала запустите: python3 fetch_zones.py")
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f).get('features', []))
+
+    def query(self, lon, lat):
+        """Зоны (properties + id), содержащие точку."""
+        if self._root is None:
+            return []
+        found = []
+        stack = [self._root]
+        while stack:
+            bbox, children = stack.pop()
+            if not (bbox[0] <= lon <= bbox[2] and bbox[1] <= lat <= bbox[3]):
+                continue
+            for child in children:
+                child_bbox, payload = child
+                if not (child_bbox[0] <= lon <= child_bbox[2] and child_bbox[1] <= lat <= child_bbox[3]):
+                    continue
+                if isinstance(payload, list):
+                    stack.append(child)
+                elif payload[1].contains(lon, lat):
+                    found.append(payload[0])
+        return found
+
+    def lookup(self, lon, lat):
+        """
+        Свойства точки для GeoJSON: {'zones': [id], 'zone_types': [...],
+        'speed_limit': км/ч} или {}, если точка вне зон ограничений.
+        Действующее ограничение скорости - минимальное из пересекающихся зон.
+        """
+        zones = self.query(lon, lat)
+        if not zones:
+            return {}
+        tags = {
+            'zones': sorted(str(zone['id']) for zone in zones),
+            'zone_types': sorted({zone['type'] for zone in zones})
+        }
+        limits = [zone['speed_limit'] for zone in zones if zone.get('speed_limit') is not None]
+        if limits:
+            tags['speed_limit'] = min(limits)
+        return tags
+
+    def tag_features(self, features):
+        """
+        Добавляет lookup() в properties точечных Feature (на месте).
+
+        Returns:
+            dict: количество помеченных объектов по типу зоны
+        """
+        counts = {}
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') != 'Point':
+                continue
+            tags = self.lookup(*geometry['coordinates'][:2])
+            if not tags:
+                continue
+            feature['properties'].update(tags)
+            for zone_type in tags['zone_types']:
+                counts[zone_type] = counts.get(zone_type, 0) + 1
+        return counts
+
+
+def load_zone_index(path=ZONES_GEOJSON_PATH):
+    """ZoneIndex или None, если zones.geojson ещё не загружен (объекты не помечаются)."""
+    try:
+        return ZoneIndex.load(path)
+    except DataNotFoundError:
+        return None
@@ -0,0 +1,89 @@
+"""
+План запросов /layers/v1/polygons для многих городов.
+
+Города одной агломерации в cities.geojson - отдельные полигоны с
+перекрывающимися или вложенными bbox (у Москвы их 17), и запрос зон для
+каждого по отдельности скачивает одни и те же зоны несколько раз.
+plan_zone_requests объединяет города в группы, пока общий bbox группы не
+больше суммы bbox по отдельности, - один запрос на группу покрывает все её
+города не большей площадью. split_zones_by_city раздаёт ответ группы
+городам: город получает зоны, пересекающие его bbox, как при отдельном
+запросе.
+"""
+
+from .geometry import geometry_bounds
+
+
+def _area(bbox):
+    return max(bbox[2] - bbox[0], 0) * max(bbox[3] - bbox[1], 0)
+
+
+def _union(a, b):
+    return [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+
+
+def _intersects(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def plan_zone_requests(cities):
+    """
+    Группы городов для общих запросов зон.
+
+    Args:
+        cities: list dict с полями id, bbox (load_city_polygons / find_cities_by_name)
+
+    Returns:
+        list dict {'bbox': общий bbox, 'location': его центр, 'cities': [города]}
+        в порядке первого города группы во входном списке
+    """
+    groups = [{'bbox': list(city['bbox']), 'cities': [city], 'order': i} for i, city in enumerate(cities)]
+
+    merged = True
+    while merged:
+        merged = False
+        groups.sort(key=lambda g: g['bbox'][0])
+        for i, group in enumerate(groups):
+            for other in groups[i + 1:]:
+                # Группы отсортированы по min lon: дальше пересечений нет
+                if other['bbox'][0] > group['bbox'][2]:
+                    break
+                if not _intersects(group['bbox'], other['bbox']):
+                    continue
+                union = _union(group['bbox'], other['bbox'])
+                if _area(union) <= _area(group['bbox']) + _area(other['bbox']):
+                    group['bbox'] = union
+                    group['cities'] += other['cities']
+                    group['order'] = min(group['order'], other['order'])
+                    groups.remove(other)
+                    merged = True
+                    break
+            if merged:
+                break
+
+    groups.sort(key=lambda g: g['order'])
+    return [{
+        'bbox': group['bbox'],
+        'location': [(group['bbox'][0] + group['bbox'][2]) / 2, (group['bbox'][1] + group['bbox'][3]) / 2],
+        'cities': group['cities']
+    } for group in groups]
+
+
+def split_zones_by_city(zones_data, cities):
+    """
+    Ответ общего запроса зон по городам группы.
+
+    Returns:
+        dict city_id -> FeatureCollection зон, пересекающих bbox города
+        (зона без геометрии достаётся всем городам)
+    """
+    features = zones_data.get('features', [])
+    bounds = [geometry_bounds(feature.get('geometry') or {}) for feature in features]
+    result = {}
+    for city in cities:
+        result[city['id']] = {
+            **zones_data,
+            'features': [feature for feature, bbox in zip(features, bounds)
+                         if bbox is None or _intersects(bbox, city['bbox'])]
+        }
+    return result
@@ -0,0 +1,146 @@
+"""
+Загрузка зон больших городов по тайлам.
+
+Один запрос /layers/v1/polygons на bbox крупного города отдаёт огромный
+ответ: он долгий, может прийти обрезанным и при таймауте теряется целиком.
+fetch_zones_tiled делит такой bbox на тайлы сетки Web Mercator (z/x/y, как
+у тайлов слоёв карты) и запрашивает их параллельно. Bbox запроса - ровно
+граница тайла, поэтому соседние города и повторные запуски запрашивают те
+же тайлы (попадания в кэш ответов). Зона, попавшая в несколько тайлов,
+остаётся одна (по id); при ошибке повторяются только неудачные тайлы.
+"""
+
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .profiling import profiler
+from .request_ledger import ledger
+
+# Зум сетки тайлов: z11 - около 20 км по долготе на экваторе (10-11 км на широте 55-60°)
+DEFAULT_TILE_ZOOM = 11
+
+# Bbox не больше стольких тайлов загружается одним запросом
+DEFAULT_MAX_SINGLE_TILES = 4
+
+# Одновременных запросов тайлов
+DEFAULT_TILE_WORKERS = 4
+
+# Повторных попыток для неудачных тайлов
+DEFAULT_TILE_RETRIES = 2
+
+# Предел широты Web Mercator
+MAX_LATITUDE = 85.05112878
+
+
+def _tile_x(lon, z):
+    return int((lon + 180) / 360 * (1 << z))
+
+
+def _tile_y(lat, z):
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    rad = math.radians(lat)
+    return int((1 - math.asinh(math.tan(rad)) / math.pi) / 2 * (1 << z))
+
+
+def tile_bbox(x, y, z):
+    """Bbox тайла z/x/y: [min_lon, min_lat, max_lon, max_lat]."""
+    n = 1 << z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return [x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)]
+
+
+def tiles_for_bbox(bbox, z=DEFAULT_TILE_ZOOM):
+    """Тайлы (x, y) зума z, покрывающие bbox, - по строкам с севера на юг."""
+    n = 1 << z
+    x0, x1 = _tile_x(bbox[0], z), min(_tile_x(bbox[2], z), n - 1)
+    y0, y1 = _tile_y(bbox[3], z), min(_tile_y(bbox[1], z), n - 1)
+    return [(x, y) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+
+
+def _feature_key(feature):
+    """Ключ дедупликации: id, а у зон без id - геометрия."""
+    if feature.get('id') is not None:
+        return ('id', feature['id'])
+    return ('geometry', json.dumps(feature.get('geometry'), sort_keys=True))
+
+
+def _fetch_tile(client, bbox, zoom, context):
+    with ledger.context_scope(context), profiler.worker_scope():
+        location = [(bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2]
+        return client.polygons(bbox, zoom, location)
+
+
+def fetch_zones_tiled(client, bbox, zoom, location=None, tile_zoom=DEFAULT_TILE_ZOOM,
+                      max_single_tiles=DEFAULT_MAX_SINGLE_TILES, max_workers=DEFAULT_TILE_WORKERS,
+                      retries=DEFAULT_TILE_RETRIES, log=None):
+    """
+    Зоны слоя самокатов в bbox: одним запросом или по тайлам.
+
+    Args:
+        client: YandexClient (общий для всех потоков)
+        bbox: list [min_lon, min_lat, max_lon, max_lat]
+        zoom: зум запроса (детализация зон)
+        location: центр для запроса одним bbox (по умолчанию - центр bbox)
+        tile_zoom: зум сетки тайлов
+        max_single_tiles: bbox не больше стольких тайлов запрашивается целиком
+        max_workers: одновременных запросов тайлов
+        retries: повторов для тайлов с ошибкой
+        log: функция вывода прогресса или None
+
+    Returns:
+        dict GeoJSON FeatureCollection (зоны без повторов) или None, если
+        часть тайлов не загрузилась и после повторов
+
+    Raises:
+        TokenExpiredError, AuthError: оставшиеся тайлы отменяются
+    """
+    tiles = tiles_for_bbox(bbox, tile_zoom)
+    if len(tiles) <= max_single_tiles:
+        return client.polygons(bbox, zoom, location)
+
+    context = ledger.get_context()
+    responses = {}
+    pending = tiles
+    attempt = 0
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tile') as executor:
+        while pending and attempt <= retries:
+            if attempt and log:
+                log(f"   🔁 Повтор {attempt}/{retries}: {len(pending)} тайлов")
+            futures = {executor.submit(_fetch_tile, client, tile_bbox(x, y, tile_zoom), zoom, context): (x, y)
+                       for x, y in pending}
+            try:
+                for future in as_completed(futures):
+                    result = future.result()
+                    if result is not None:
+                        responses[futures[future]] = result
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+            pending = [tile for tile in pending if tile not in responses]
+            attempt += 1
+
+    if pending:
+        if log:
+            log(f"   ❌ Не загружено тайлов: {len(pending)}/{len(tiles)} (z{tile_zoom})")
+        return None
+
+    # Тайлы в исходном порядке: порядок зон не зависит от порядка ответов
+    features, seen = [], set()
+    for tile in tiles:
+        for feature in responses[tile].get('features', []):
+            key = _feature_key(feature)
+            if key not in seen:
+                seen.add(key)
+                features.append(feature)
+
+    if log:
+        log(f"   🧱 Тайлов: {len(tiles)} (z{tile_zoom}), зон: {len(features)}")
+
+    result = {key: value for key, value in responses[tiles[0]].items() if key != 'features'}
+    result['features'] = features
+    return result
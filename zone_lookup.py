@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Поиск зон ограничений (output/zones.geojson) для точек и готовых GeoJSON.
+
+Использование:
+    python3 zone_lookup.py 27.5615 53.9023  # Зоны и ограничение скорости в точке
+    python3 zone_lookup.py --geojson output/city_scooters/Минск_20260211.geojson  # Пометить файл
+    python3 zone_lookup.py --geojson scooters.geojson -o scooters_zones.geojson
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from yandex_parser import ZoneIndex, YandexParserError
+from yandex_parser.zone_index import ZONES_GEOJSON_PATH
+
+
+def lookup_point(index, lon, lat):
+    tags = index.lookup(lon, lat)
+    if not tags:
+        print(f"📍 {lon}, {lat}: вне зон ограничений")
+        return
+    print(f"📍 {lon}, {lat}:")
+    print(f"   • Зоны: {', '.join(tags['zones'])}")
+    print(f"   • Типы: {', '.join(tags['zone_types'])}")
+    if 'speed_limit' in tags:
+        print(f"   • Ограничение скорости: {tags['speed_limit']} км/ч")
+
+
+def tag_geojson(index, input_path, output_path):
+    with open(input_path, 'r', encoding='utf-8') as f:
+        geojson = json.load(f)
+
+    start = time.time()
+    features = geojson.get('features', [])
+    counts = index.tag_features(features)
+    geojson.setdefault('metadata', {})['objects_in_zones'] = counts
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(geojson, f, ensure_ascii=False, indent=2)
+
+    print(f"✅ {len(features):,} объектов за {time.time() - start:.2f}с → {output_path}")
+    for zone_type, count in sorted(counts.items()):
+        print(f"   • {zone_type}: {count:,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Зоны ограничений для точки или GeoJSON-файла')
+    parser.add_argument('lon', nargs='?', type=float, help='Долгота точки')
+    parser.add_argument('lat', nargs='?', type=float, help='Широта точки')
+    parser.add_argument('--geojson', type=str, help='Пометить точки GeoJSON-файла (zones, zone_types, speed_limit)')
+    parser.add_argument('-o', '--output', type=str, help='Куда сохранить для --geojson (по умолчанию: на место)')
+    parser.add_argument('--zones', type=str, default=str(ZONES_GEOJSON_PATH),
+                        help='Файл зон (по умолчанию: output/zones.geojson)')
+    args = parser.parse_args()
+
+    if not args.geojson and (args.lon is None or args.lat is None):
+        parser.print_help()
+        sys.exit(1)
+
+    start = time.time()
+    index = ZoneIndex.load(args.zones)
+    print(f"🗺️  Индекс: {index.size:,} зон за {time.time() - start:.2f}с")
+
+    if args.geojson:
+        tag_geojson(index, Path(args.geojson), Path(args.output or args.geojson))
+    else:
+        lookup_point(index, args.lon, args.lat)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except YandexParserError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
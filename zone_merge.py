@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Инкрементальное объединение output/city_zones/*.geojson в zones.geojson.
+
+Полное объединение разбирает все файлы городов, даже если запуск обновил
+один город. Манифест (zones.manifest.json рядом с результатом) хранит для
+каждого файла mtime, размер, sha256 и id его зон. Объединённый файл пишется
+потоково по одной зоне на строку, сгруппированно по файлам городов в
+порядке имён, поэтому при следующем объединении:
+- файлы с прежними mtime/размером (или хешем) не разбираются, их строки
+  копируются из прежнего zones.geojson без разбора JSON;
+- разбираются только новые и изменённые файлы, а также файлы, у которых
+  изменился набор собственных зон после дедупликации.
+
+Дубликат зоны (одинаковый id в нескольких городах) принадлежит файлу,
+первому по имени, поэтому результат не зависит от того, какие файлы
+обновлялись.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+MANIFEST_VERSION = 1
+
+# Объединённый файл: заголовок, по зоне на строку, закрывающая строка
+HEADER = '{"type":"FeatureCollection","features":[\n'
+FOOTER = '\n]}\n'
+
+
+def manifest_path_for(output_path):
+    """Путь к манифесту объединённого файла: zones.geojson → zones.manifest.json."""
+    output_path = Path(output_path)
+    return output_path.with_name(f'{output_path.stem}.manifest.json')
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _owners(files):
+    """id зоны → файл-владелец (первый по имени из содержащих её)."""
+    owners = {}
+    for name in sorted(files):
+        for feature_id in files[name]['ids']:
+            owners.setdefault(feature_id, name)
+    return owners
+
+
+def _owned_ids(name, ids, owners):
+    """id зон, которые файл name пишет в результат (по одной на id, в порядке файла)."""
+    owned, seen = [], set()
+    for feature_id in ids:
+        if owners.get(feature_id) == name and feature_id not in seen:
+            seen.add(feature_id)
+            owned.append(feature_id)
+    return owned
+
+
+def load_manifest(path, params):
+    """Прежний манифест или None (нет файла, другая версия или другие параметры объединения)."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('params') != params:
+        return None
+    return manifest
+
+
+def _read_previous_lines(output_path, previous):
+    """
+    Строки зон прежнего объединённого файла по файлам городов или None,
+    если файл не в потоковом формате или не совпадает с манифестом.
+    """
+    output_path = Path(output_path)
+    if previous is None or not output_path.exists():
+        return None
+    with open(output_path, 'r', encoding='utf-8') as f:
+        lines = f.read().rstrip('\n').split('\n')
+    # Формат: заголовок, по строке на зону, закрывающая строка
+    if lines[0] != HEADER.rstrip('\n') or lines[-1] != FOOTER.strip('\n'):
+        return None
+    body = [line for line in lines[1:-1] if line]
+    owners = _owners(previous['files'])
+    segments, position = {}, 0
+    for name in sorted(previous['files']):
+        count = len(_owned_ids(name, previous['files'][name]['ids'], owners))
+        segments[name] = [line.rstrip(',') for line in body[position:position + count]]
+        position += count
+    if position != len(body):
+        return None
+    return segments
+
+
+def merge_city_zones(city_zones_dir, output_path, simplifier=None, full=False, log=print):
+    """
+    Объединение файлов зон городов с дедупликацией по id.
+
+    Args:
+        city_zones_dir: Path, директория с файлами городов
+        output_path: Path, объединённый GeoJSON
+        simplifier: GeometrySimplifier или None - упростить геометрию разобранных файлов
+        full: True - разобрать все файлы, не используя манифест
+        log: функция вывода предупреждений
+
+    Returns:
+        dict {cities_count, total_features, zone_types, duplicates, parsed, copied}
+        или None, если файлов нет
+    """
+    city_zones_dir, output_path = Path(city_zones_dir), Path(output_path)
+    geojson_files = sorted(city_zones_dir.glob('*.geojson'))
+    if not geojson_files:
+        return None
+
+    params = [simplifier.tolerance_m, simplifier.precision] if simplifier is not None else None
+    manifest_path = manifest_path_for(output_path)
+    previous = None if full else load_manifest(manifest_path, params)
+    previous_lines = _read_previous_lines(output_path, previous)
+    if previous_lines is None:
+        previous = None
+    previous_files = previous['files'] if previous else {}
+
+    # 1. Какие файлы изменились: mtime и размер, при расхождении - хеш
+    files, parsed = {}, {}
+    for path in geojson_files:
+        stat = path.stat()
+        entry = previous_files.get(path.name)
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            files[path.name] = entry
+            continue
+        sha256 = file_sha256(path)
+        if entry and entry['sha256'] == sha256:
+            files[path.name] = {**entry, 'mtime': stat.st_mtime, 'size': stat.st_size}
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                features = json.load(f).get('features', [])
+        except (OSError, json.JSONDecodeError) as e:
+            log(f"   ⚠️  Ошибка при чтении {path.name}: {e}")
+            continue
+        parsed[path.name] = features
+        files[path.name] = {
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'sha256': sha256,
+            'ids': [feature.get('id') for feature in features]
+        }
+
+    # 2. Дедупликация по индексу id; файлы, чей набор зон изменился, разбираются заново
+    owners = _owners(files)
+    previous_owners = _owners(previous_files)
+    for name in sorted(files):
+        if name in parsed:
+            continue
+        owned = _owned_ids(name, files[name]['ids'], owners)
+        if previous_lines is None or name not in previous_lines or owned != _owned_ids(name, files[name]['ids'], previous_owners):
+            with open(city_zones_dir / name, 'r', encoding='utf-8') as f:
+                parsed[name] = json.load(f).get('features', [])
+
+    # 3. Потоковая запись: по зоне на строку, файлы городов в порядке имён
+    zone_types_total = {}
+    total = 0
+    tmp_path = output_path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        out.write(HEADER)
+        for name in sorted(files):
+            entry = files[name]
+            owned = set(_owned_ids(name, entry['ids'], owners))
+            if name in parsed:
+                lines, types = [], {}
+                written = set()
+                selected = []
+                for feature in parsed[name]:
+                    feature_id = feature.get('id')
+                    if feature_id not in owned or feature_id in written:
+                        continue
+                    written.add(feature_id)
+                    selected.append(feature)
+                if simplifier is not None:
+                    # Зоны города упрощаются вместе: общие границы соседей - одна дуга
+                    simplifier.features(selected)
+                for feature in selected:
+                    zone_type = (feature.get('properties') or {}).get('type')
+                    if zone_type:
+                        types[zone_type] = types.get(zone_type, 0) + 1
+                    lines.append(json.dumps(feature, ensure_ascii=False, separators=(',', ':')))
+                entry['zone_types'] = types
+            else:
+                lines = previous_lines[name]
+            for line in lines:
+                out.write((',\n' if total else '') + line)
+                total += 1
+            for zone_type, count in entry.get('zone_types', {}).items():
+                zone_types_total[zone_type] = zone_types_total.get(zone_type, 0) + count
+        out.write(FOOTER)
+    tmp_path.replace(output_path)
+
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'params': params, 'files': files}, f, ensure_ascii=False)
+
+    return {
+        'cities_count': len(files),
+        'total_features': total,
+        'zone_types': zone_types_total,
+        'duplicates': sum(len(entry['ids']) for entry in files.values()) - total,
+        'parsed': len(parsed),
+        'copied': len(files) - len(parsed)
+    }
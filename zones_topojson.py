@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Перевод слоя зон между GeoJSON и TopoJSON (общие границы - одна дуга).
+
+Использование:
+    python3 zones_topojson.py  # output/zones.geojson → output/zones.topojson
+    python3 zones_topojson.py output/cities.geojson --object cities
+    python3 zones_topojson.py --decode output/zones.topojson -o zones_decoded.geojson
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from yandex_parser import topojson
+from yandex_parser.simplify import DEFAULT_PRECISION
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GeoJSON ⇄ TopoJSON для слоёв зон и городов')
+    parser.add_argument('input', nargs='?', default=str(Path(__file__).parent / 'output' / 'zones.geojson'),
+                        help='Входной файл (по умолчанию: output/zones.geojson)')
+    parser.add_argument('-o', '--output', type=str,
+                        help='Выходной файл (по умолчанию: то же имя с .topojson или .geojson)')
+    parser.add_argument('--decode', action='store_true', help='TopoJSON → GeoJSON')
+    parser.add_argument('--object', type=str, default=topojson.DEFAULT_OBJECT_NAME,
+                        help=f'Имя коллекции в TopoJSON (по умолчанию: {topojson.DEFAULT_OBJECT_NAME})')
+    parser.add_argument('--precision', type=int, default=DEFAULT_PRECISION,
+                        help=f'Знаков после запятой в координатах (по умолчанию: {DEFAULT_PRECISION})')
+    args = parser.parse_args()
+
+    input_path = Path(args.input)
+    if not input_path.exists():
+        print(f"❌ Ошибка: файл {input_path} не найден!")
+        sys.exit(1)
+    output_path = Path(args.output) if args.output else input_path.with_suffix(
+        '.geojson' if args.decode else '.topojson')
+
+    with open(input_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    start = time.time()
+    if args.decode:
+        result = topojson.decode(data, args.object if args.object in data['objects'] else None)
+        summary = f"{len(result['features']):,} объектов"
+    else:
+        result = topojson.encode(data.get('features', []), precision=args.precision, object_name=args.object)
+        summary = f"{len(data.get('features', [])):,} объектов, {len(result['arcs']):,} дуг"
+    elapsed = time.time() - start
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, separators=(',', ':'))
+
+    input_mb = input_path.stat().st_size / 1024 / 1024
+    output_mb = output_path.stat().st_size / 1024 / 1024
+    print(f"✅ {summary} за {elapsed:.2f}с")
+    print(f"   💾 {input_path.name}: {input_mb:.1f} MB → {output_path.name}: {output_mb:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()